@@ -0,0 +1,61 @@
+"""
+Benchmark parsing of an MMseqs2 <prefix>_cluster.tsv file into a
+ClusterResult against the legacy dict parser.
+
+Usage
+-----
+python benchmarks/bench_cluster.py --members 10000000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from typing import Dict
+
+import numpy as np
+
+from homolog_search_tools.similarity import ClusterResult
+
+def write_synthetic_clusters(path:str, members:int, seed:int=0) -> None:
+    "Clusters of 1 to 20 members, representative first, as MMseqs2 writes them."
+    rng = np.random.default_rng(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        i = 0
+        while i < members:
+            size = min(int(rng.integers(1, 21)), members - i)
+            representative = f"UniRef90_A{i:09d}"
+            f.write("".join(f"{representative}\tUniRef90_A{i + j:09d}\n" for j in range(size)))
+            i += size
+
+def legacy_parse(path:str) -> Dict[str, str]:
+    "readlines()-based parser, kept for comparison."
+    mapper = {}
+    with open(path, "r") as f:
+        for line in f.readlines():
+            line = line.strip().split("\t")
+            mapper[line[1]] = line[0]
+    return mapper
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--members", type=int, default=2_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "output_cluster.tsv")
+        write_synthetic_clusters(path, args.members)
+        print(f"{args.members:,} members, {os.path.getsize(path) / 1E6:,.1f} MB")
+
+        for name, parse in [("legacy dict", legacy_parse), ("ClusterResult", ClusterResult.from_tsv)]:
+            start = time.perf_counter()
+            parse(path)
+            elapsed = time.perf_counter() - start
+            print(f"{name:>14}: {elapsed:6.2f}s ({args.members / elapsed:,.0f} members/s)")
+
+        clusters = ClusterResult.from_tsv(path)
+        arrays = clusters.accessions.nbytes + clusters.representatives.nbytes
+        print(f"{'arrays':>14}: {arrays / 1E6:,.1f} MB, {clusters.n_clusters:,} clusters")
+
+if __name__ == "__main__":
+    main()
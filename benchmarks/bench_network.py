@@ -0,0 +1,57 @@
+"""
+Benchmark similarity network construction, threshold sweeps and export on
+a synthetic random graph.
+
+Usage
+-----
+python benchmarks/bench_network.py --nodes 200000 --edges 1000000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from homolog_search_tools.network import SimilarityNetwork, threshold_sweep, write_network
+
+def synthetic_hits(nodes:int, edges:int, seed:int=0) -> pd.DataFrame:
+    "Random hits in the layout of read_transform_tblastout output."
+    rng = np.random.default_rng(seed)
+    a, b = rng.integers(0, nodes, edges), rng.integers(0, nodes, edges)
+    categories = pd.Index([f"UniRef90_A{i:09d}" for i in range(nodes)])
+    return pd.DataFrame({
+        "Accession_1": pd.Categorical.from_codes(np.minimum(a, b), categories),
+        "Accession_2": pd.Categorical.from_codes(np.maximum(a, b), categories),
+        "Log_E_Value": rng.uniform(0, 100, edges).astype(np.float32),
+        "Percent_Identity": rng.uniform(20, 100, edges).astype(np.float32)})
+
+def timed(name:str, func):
+    start = time.perf_counter()
+    result = func()
+    print(f"{name:>18}: {time.perf_counter() - start:6.2f}s")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--nodes", type=int, default=200_000)
+    parser.add_argument("--edges", type=int, default=1_000_000)
+    parser.add_argument("--thresholds", type=int, default=100)
+    args = parser.parse_args()
+
+    hits = synthetic_hits(args.nodes, args.edges)
+    print(f"{args.nodes:,} nodes, {args.edges:,} hits")
+    network = timed("from_hits", lambda: SimilarityNetwork.from_hits(hits))
+    timed("adjacency", network.adjacency)
+    timed("components", network.components)
+    timed(f"sweep ({args.thresholds})",
+          lambda: threshold_sweep(network, np.linspace(0, 100, args.thresholds)))
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for output_format in ["graphml", "xgmml"]:
+            path = os.path.join(temp_dir, f"network.{output_format}")
+            timed(f"write {output_format}", lambda: write_network(network, path, output_format))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark FASTA reading throughput on a synthetic protein FASTA file.
+
+Usage
+-----
+python benchmarks/bench_read_fasta.py --sequences 1000000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from typing import List, Tuple
+
+from homolog_search_tools.utils._fasta import (
+    FastaIndex, build_fasta_index, fasta_lengths, iter_fasta
+)
+
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+
+def write_synthetic_fasta(path:str, sequences:int, seed:int=0, line_width:int=60) -> None:
+    "Writes sequences of 50 to 1000 residues wrapped at line_width."
+    rng = random.Random(seed)
+    pool = "".join(rng.choice(AMINO_ACIDS) for _ in range(100_000))
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(sequences):
+            start = rng.randrange(0, len(pool) - 1000)
+            seq = pool[start: start + rng.randint(50, 1000)]
+            lines = "\n".join(seq[j: j+line_width] for j in range(0, len(seq), line_width))
+            f.write(f">UniRef90_A{i:09d} Synthetic protein n=1 Tax=Homo sapiens\n{lines}\n")
+
+def legacy_read_fasta(path_or_buf:str) -> Tuple[List[str], List[str]]:
+    "readlines()-based reader, kept for comparison."
+    headers, seqs = [], []
+    with open(path_or_buf, "r", encoding="utf-8") as fastafile:
+        seq = []
+        for line in fastafile.readlines():
+            line = line.strip()
+            if line.startswith(">") and not seq:
+                headers.append(line[1:])
+            elif line.startswith(">"):
+                headers.append(line[1:])
+                seqs.append(''.join(seq))
+                seq = []
+            else:
+                seq.append(line)
+        seqs.append(''.join(seq))
+    return headers, seqs
+
+def timed(name:str, size_mb:float, func) -> None:
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{name:>18}: {elapsed:6.2f}s ({size_mb / elapsed:,.0f} MB/s)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sequences", type=int, default=200_000)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "synthetic.fasta")
+        write_synthetic_fasta(path, args.sequences)
+        size_mb = os.path.getsize(path) / 1E6
+        print(f"{args.sequences:,} sequences, {size_mb:,.1f} MB")
+
+        timed("legacy read_fasta", size_mb, lambda: legacy_read_fasta(path))
+        timed("iter_fasta", size_mb, lambda: sum(1 for _ in iter_fasta(path)))
+        timed("fasta_lengths", size_mb, lambda: fasta_lengths(path))
+        timed("build_fasta_index", size_mb, lambda: build_fasta_index(path))
+
+        with FastaIndex(path) as index:
+            names = random.Random(1).choices(index.names, k=args.lookups)
+            start = time.perf_counter()
+            for name in names:
+                index[name]
+            elapsed = time.perf_counter() - start
+            print(f"{'FastaIndex lookup':>18}: {elapsed:6.2f}s "
+                  f"({args.lookups / elapsed:,.0f} lookups/s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark read_transform_tblastout on a synthetic tabular (outfmt 6) file.
+
+Usage
+-----
+python benchmarks/bench_read_transform_tblastout.py --rows 10000000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from homolog_search_tools.similarity._similarity_utils import (
+    _alphabetized_accessions, _compute_log_evalue, _read_tblastout, read_transform_tblastout
+)
+
+def write_synthetic_tblastout(path:str, rows:int, accessions:int, seed:int=0,
+                              chunksize:int=1_000_000) -> None:
+    "Writes a synthetic outfmt 6 file with random hits between `accessions` sequences."
+    rng = np.random.default_rng(seed)
+    names = np.array([f"A{i:09d}" for i in range(accessions)])
+    with open(path, "w", encoding="utf-8") as f:
+        for start in range(0, rows, chunksize):
+            n = min(chunksize, rows - start)
+            length = rng.integers(50, 500, n)
+            pd.DataFrame({
+                "q": names[rng.integers(0, accessions, n)],
+                "t": names[rng.integers(0, accessions, n)],
+                "pident": rng.uniform(20, 100, n).round(3),
+                "length": length,
+                "mismatch": rng.integers(0, 50, n),
+                "gapopen": rng.integers(0, 5, n),
+                "qstart": 1, "qend": length, "sstart": 1, "send": length,
+                "evalue": 10.0 ** -rng.uniform(0, 200, n),
+                "bitscore": rng.uniform(20, 1000, n).round(1),
+            }).to_csv(f, sep="\t", header=False, index=False, float_format="%.3g")
+
+def legacy_read_transform_tblastout(path:str) -> pd.DataFrame:
+    "Row-wise implementation kept for comparison."
+    df = _read_tblastout(path)
+    df["Query_Accession"] = df["Query_Accession"].astype(str)
+    df["Target_Accession"] = df["Target_Accession"].astype(str)
+    df["Log_E_Value"] = _compute_log_evalue(df["E_Value"].to_numpy())
+    df[["Accession_1", "Accession_2"]] = df[["Query_Accession", "Target_Accession"]].apply(
+        _alphabetized_accessions, axis=1).to_list()
+    return df.sort_values("Log_E_Value", ascending=False)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--accessions", type=int, default=100_000)
+    parser.add_argument("--legacy-rows", type=int, default=200_000,
+                        help="rows used to time the legacy row-wise implementation (0 to skip).")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "synthetic.tsv")
+        write_synthetic_tblastout(path, args.rows, args.accessions)
+        size_mb = os.path.getsize(path) / 1E6
+
+        start = time.perf_counter()
+        df = read_transform_tblastout(path)
+        elapsed = time.perf_counter() - start
+        print(f"vectorized: {len(df):,} rows, {size_mb:,.1f} MB in {elapsed:.2f}s "
+              f"({len(df) / elapsed:,.0f} rows/s)")
+
+        if args.legacy_rows:
+            legacy_path = os.path.join(temp_dir, "legacy.tsv")
+            write_synthetic_tblastout(legacy_path, args.legacy_rows, args.accessions)
+            start = time.perf_counter()
+            df = legacy_read_transform_tblastout(legacy_path)
+            elapsed = time.perf_counter() - start
+            print(f"row-wise:   {len(df):,} rows in {elapsed:.2f}s "
+                  f"({len(df) / elapsed:,.0f} rows/s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark the in-process SmithWaterman engine against the command-line
+aligners on all-vs-all jobs of increasing size, to find the job size where
+shelling out becomes faster.
+
+Aligners missing from PATH are skipped. The "process floor" column is the
+fixed cost of any command-line run, which no aligner can go below: writing
+the query and target FASTA and starting two processes (as makeblastdb and
+blastp do).
+
+Usage
+-----
+python benchmarks/bench_smith_waterman.py --sizes 5 10 20 40 80 --length 300
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from homolog_search_tools.similarity import (
+    BlastP, BlastPParameters, Diamond, DiamondParameters, MMseqs2, MMseqs2Parameters,
+    SmithWaterman, SmithWatermanParameters
+)
+from homolog_search_tools.utils._utils import cmd_run, handle_sequence_data
+
+RESIDUES = np.array(list("ACDEFGHIKLMNPQRSTVWY"))
+
+def synthetic_families(n:int, length:int, family_size:int=5, seed:int=0) -> pd.DataFrame:
+    "Families of family_size sequences, each ~30% mutated from a random ancestor."
+    rng = np.random.default_rng(seed)
+    sequences = []
+    while len(sequences) < n:
+        ancestor = rng.choice(RESIDUES, length)
+        for _ in range(min(family_size, n - len(sequences))):
+            sequence = ancestor.copy()
+            mutated = rng.random(length) < 0.3
+            sequence[mutated] = rng.choice(RESIDUES, mutated.sum())
+            sequences.append("".join(sequence[rng.random(length) > 0.02]))
+    return pd.DataFrame({"Header": [f"P{i:05d}" for i in range(n)], "Sequence": sequences})
+
+def process_floor(sequences:pd.DataFrame) -> None:
+    "FASTA writing and two process starts, the fixed cost of a command-line search."
+    with tempfile.TemporaryDirectory() as temp_dir:
+        handle_sequence_data(sequences, os.path.join(temp_dir, "query.fasta"))
+        handle_sequence_data(sequences, os.path.join(temp_dir, "target.fasta"))
+        cmd_run(["true"])
+        cmd_run(["true"])
+
+def engines() -> Dict[str, Callable[[pd.DataFrame], object]]:
+    "All-vs-all search of every available engine, single-threaded."
+    out = {"SmithWaterman": SmithWaterman(SmithWatermanParameters(threads=1)).run_allvsall,
+           "process floor": process_floor}
+    if shutil.which("blastp") and shutil.which("makeblastdb"):
+        out["BlastP"] = BlastP(params=BlastPParameters(threads=1)).run_allvsall
+    if shutil.which("diamond"):
+        out["Diamond"] = Diamond(params=DiamondParameters(threads=1)).run_allvsall
+    if shutil.which("mmseqs"):
+        out["MMseqs2"] = MMseqs2(params=MMseqs2Parameters(threads=1)).run_allvsall
+    return out
+
+def best_time(func:Callable, sequences:pd.DataFrame, repeats:int) -> float:
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(sequences)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def crossover(sizes:List[int], results:Dict[str, List[float]],
+              others:List[str]) -> Optional[int]:
+    "Smallest size from which one of the `others` runs beats SmithWaterman."
+    for i, size in enumerate(sizes):
+        if min(results[name][i] for name in others) < results["SmithWaterman"][i]:
+            return size
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 10, 20, 40, 80])
+    parser.add_argument("--length", type=int, default=300)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    runs = engines()
+    print(f"all-vs-all, ~{args.length} residues per sequence, best of {args.repeats}")
+    print(f"{'sequences':>10}" + "".join(f"{name:>16}" for name in runs))
+    results = {name: [] for name in runs}
+    for size in args.sizes:
+        sequences = synthetic_families(size, args.length)
+        for name, func in runs.items():
+            results[name].append(best_time(func, sequences, args.repeats))
+        print(f"{size:>10}" + "".join(f"{results[name][-1]:>15.3f}s" for name in runs))
+
+    aligners = [name for name in runs if name not in ("SmithWaterman", "process floor")]
+    if aligners:
+        size = crossover(args.sizes, results, aligners)
+        print("SmithWaterman is the fastest at every size." if size is None else
+              f"Shelling out is faster from {size} sequences.")
+    else:
+        print("No command-line aligner found on PATH, crossover not measured.")
+    size = crossover(args.sizes, results, ["process floor"])
+    if size is not None:
+        print(f"SmithWaterman exceeds the process floor from {size} sequences.")
+
+if __name__ == "__main__":
+    main()
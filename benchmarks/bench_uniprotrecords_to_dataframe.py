@@ -0,0 +1,145 @@
+"""
+Benchmark uniprotrecords_to_dataframe on synthetic UniProt records.
+
+Usage
+-----
+python benchmarks/bench_uniprotrecords_to_dataframe.py --records 500000
+"""
+
+import argparse
+import random
+import time
+from typing import List
+
+import pandas as pd
+
+from homolog_search_tools.search._uniprot import (
+    CROSS_REFERENCE_COLUMNS, _gene_sanitize, _protein_description_sanitize,
+    uniprotrecords_to_dataframe
+)
+
+def synthetic_records(n:int, seed:int=0) -> List[dict]:
+    "Records shaped like /uniprotkb/accessions results, with ~60 cross-references each."
+    rng = random.Random(seed)
+    databases = list(CROSS_REFERENCE_COLUMNS.values()) + ["EMBL", "RefSeq", "AlphaFoldDB", "STRING"]
+    records = []
+    for i in range(n):
+        records.append({
+            "primaryAccession": f"P{i:05d}", "uniProtkbId": f"PROT{i}_HUMAN",
+            "entryAudit": {"sequenceVersion": 1}, "annotationScore": 3.0,
+            "organism": {"scientificName": "Homo sapiens", "commonName": "Human", "taxonId": 9606},
+            "proteinExistence": "1: Evidence at protein level",
+            "proteinDescription": {"recommendedName": {"fullName": {"value": "Protein"}}},
+            "genes": [{"geneName": {"value": f"GENE{i}"}}],
+            "comments": [
+                {"commentType": "FUNCTION", "texts": [{"value": "Function."}]},
+                {"commentType": "SUBUNIT", "texts": [{"value": "Homodimer."}]},
+                {"commentType": "INTERACTION", "interactions": [
+                    {"interactantTwo": {"uniProtKBAccession": f"Q{j:05d}"}} for j in range(3)]},
+                {"commentType": "SUBCELLULAR LOCATION", "subcellularLocations": [
+                    {"location": {"value": "Cytoplasm"}}]}],
+            "uniProtKBCrossReferences": [
+                {"database": rng.choice(databases), "id": f"X{j}"} for j in range(60)],
+            "sequence": {"value": "M" * 300, "length": 300, "molWeight": 33000},
+            "extraAttributes": {"uniParcId": f"UPI{i:010d}"},
+        })
+    return records
+
+def legacy_uniprotrecords_to_dataframe(records:List[dict]) -> pd.DataFrame:
+    "Implementation scanning the cross-references once per database, kept for comparison."
+    out = []
+    for record in records:
+        parsed_record = {
+            # Names & Taxonomy
+            "primaryAccession": record["primaryAccession"],
+            "uniProtkbId": record["uniProtkbId"],
+            "genes": _gene_sanitize(record),
+            "organism_scientificName": record["organism"]["scientificName"],
+            "organism_commonName": record.get("organism").get("commonName"),
+            "taxonId": record["organism"]["taxonId"],
+            "proteinDescription": _protein_description_sanitize(record),
+            # Sequences
+            "sequence": record["sequence"]["value"],
+            "sequenceLength": record["sequence"]["length"],
+            "sequencemolWeight": record["sequence"]["molWeight"],
+            "sequenceVersion": record["entryAudit"]["sequenceVersion"],
+            # Function
+            # Miscellaneous
+            "annotationScore": record["annotationScore"],
+            "proteinExistence": record["proteinExistence"],
+            "uniParcId": record["extraAttributes"]["uniParcId"],
+            # Interaction
+            "Interaction": _comment_sanitize(record, "INTERACTION"),
+            "Subunit": _comment_sanitize(record, "SUBUNIT"),
+            # Gene Ontology (GO)
+            "GO": _references_sanitize(record["uniProtKBCrossReferences"], "GO"),
+            # Subcellular location
+            "SubcellularLocation": _comment_sanitize(record, "SUBCELLULAR LOCATION"),
+            # Structure
+            "PDBAccession": _references_sanitize(record["uniProtKBCrossReferences"], "PDB"),
+            # Family and domain.
+            "CDD": _references_sanitize(record["uniProtKBCrossReferences"], "CDD"),
+            "DisProt": _references_sanitize(record["uniProtKBCrossReferences"], "DisProt"),
+            "Gene3D": _references_sanitize(record["uniProtKBCrossReferences"], "Gene3D"),
+            "HAMAP": _references_sanitize(record["uniProtKBCrossReferences"], "HAMAP"),
+            "InterPro": _references_sanitize(record["uniProtKBCrossReferences"], "InterPro"),
+            "NCBIfam": _references_sanitize(record["uniProtKBCrossReferences"], "NCBIfam"),
+            "PANTHER": _references_sanitize(record["uniProtKBCrossReferences"], "PANTHER"),
+            "Pfam": _references_sanitize(record["uniProtKBCrossReferences"], "Pfam"),
+            "PRINTS": _references_sanitize(record["uniProtKBCrossReferences"], "PRINTS"),
+            "PROSITE": _references_sanitize(record["uniProtKBCrossReferences"], "PROSITE"),
+            "SFLD": _references_sanitize(record["uniProtKBCrossReferences"], "SFLD"),
+            "SMART": _references_sanitize(record["uniProtKBCrossReferences"], "SMART"),
+            "SUPFAM": _references_sanitize(record["uniProtKBCrossReferences"], "SUPFAM"),
+        }
+        out.append(parsed_record)
+    return pd.DataFrame(out)
+
+def _references_sanitize(references, database):
+    "Sanitize references."
+    out = []
+    for reference in references:
+        if reference["database"] == database:
+            out.append(reference["id"])
+    return out
+
+def _comment_sanitize(record, comment_type):
+    "Sanitize comments."
+    out = []
+    try:
+        for comment in record["comments"]:
+            if comment_type  == "INTERACTION" and \
+                comment["commentType"] == "INTERACTION":
+                for interaction in comment["interactions"]:
+                    out.append(interaction["interactantTwo"]["uniProtKBAccession"])
+            elif comment_type  == "SUBUNIT" and \
+                comment["commentType"] == "SUBUNIT":
+                for text in comment["texts"]:
+                    out.append(text["value"])
+            elif comment_type  == "SUBCELLULAR LOCATION" and \
+                comment["commentType"] == "SUBCELLULAR LOCATION":
+                for location in comment["subcellularLocations"]:
+                    out.append(location["location"]["value"])
+    except:
+        out = None
+    return out
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--records", type=int, default=100_000)
+    args = parser.parse_args()
+
+    records = synthetic_records(args.records)
+    frames = []
+    for name, func in [("legacy", legacy_uniprotrecords_to_dataframe),
+                       ("single-pass", uniprotrecords_to_dataframe)]:
+        start = time.perf_counter()
+        df = func(records)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>11}: {len(df):,} records in {elapsed:.2f}s "
+              f"({len(df) / elapsed:,.0f} records/s)")
+        frames.append(df)
+    pd.testing.assert_frame_equal(*frames)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+"""Sequence similarity networks."""
+
+from ._export import write_network
+from ._network import SimilarityNetwork
+from ._sweep import threshold_sweep
+
+__all__ = [
+    "SimilarityNetwork",
+    "threshold_sweep",
+    "write_network",
+]
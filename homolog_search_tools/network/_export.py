@@ -0,0 +1,133 @@
+"""Streamed GraphML and XGMML export of similarity networks for Cytoscape."""
+
+import os
+from itertools import repeat
+from typing import IO, Iterator, List, Optional, Union
+from xml.sax.saxutils import escape, quoteattr
+import numpy as np
+import pandas as pd
+from ._network import SimilarityNetwork
+
+NetworkFormats = ["graphml", "xgmml"]
+
+def _escape(value:str) -> str:
+    "XML-escaped text, also valid inside double-quoted attributes."
+    return escape(value, {'"': "&quot;"})
+
+def _chunks(n:int, chunksize:int) -> Iterator[slice]:
+    for start in range(0, n, chunksize):
+        yield slice(start, min(start + chunksize, n))
+
+def _attribute_type(series:pd.Series, output_format:str) -> str:
+    "GraphML (double/long/string) or XGMML (real/integer/string) attribute type."
+    if pd.api.types.is_float_dtype(series):
+        return "double" if output_format == "graphml" else "real"
+    if pd.api.types.is_integer_dtype(series):
+        return "long" if output_format == "graphml" else "integer"
+    return "string"
+
+def _formatted(series:pd.Series) -> List[str]:
+    "Escaped attribute values; None for missing values, which are not written."
+    if pd.api.types.is_float_dtype(series):
+        values = [format(v, ".7g") for v in series.to_numpy(dtype=np.float64).tolist()]
+    else:
+        values = [_escape(str(v)) for v in series.tolist()]
+    missing = series.isna().to_numpy()
+    return [None if m else v for v, m in zip(values, missing.tolist())]
+
+def _node_attributes(network:SimilarityNetwork,
+                     node_attributes:Optional[pd.DataFrame]) -> pd.DataFrame:
+    "Node attributes aligned to the node ids."
+    if node_attributes is None:
+        return pd.DataFrame(index=pd.RangeIndex(network.n_nodes))
+    return node_attributes.reindex(network.nodes).reset_index(drop=True)
+
+def write_network(network:SimilarityNetwork, path_or_buf:Union[os.PathLike, str, IO[str]],
+                  output_format:str="graphml", node_attributes:Optional[pd.DataFrame]=None,
+                  name:str="SSN", chunksize:int=100_000) -> None:
+    """
+    Writes a network as GraphML or XGMML (Cytoscape), streaming nodes and
+    edges in chunks of formatted lines rather than building a graph object.
+
+    Parameters
+    ----------
+    - network: SimilarityNetwork
+    - path_or_buf: path | file object: output file.
+    - output_format: str: "graphml" or "xgmml". Default: "graphml".
+    - node_attributes: pd.DataFrame: node attributes indexed by accession,
+        e.g. UniProt metadata. Default: None.
+    - name: str: graph label. Default: "SSN".
+    - chunksize: int: nodes or edges formatted at a time. Default: 100,000.
+    """
+    if output_format not in NetworkFormats:
+        raise ValueError("Invalid output_format value.")
+    if hasattr(path_or_buf, "write"):
+        _write_network(network, path_or_buf, output_format, node_attributes, name, chunksize)
+        return
+    with open(path_or_buf, "w", encoding="utf-8") as f:
+        _write_network(network, f, output_format, node_attributes, name, chunksize)
+
+def _write_network(network:SimilarityNetwork, f:IO[str], output_format:str,
+                   node_attributes:Optional[pd.DataFrame], name:str, chunksize:int) -> None:
+    nodes = _node_attributes(network, node_attributes)
+    edges = network.edges.drop(columns=["Source", "Target"])
+    labels = [_escape(str(node)) for node in network.nodes.tolist()]
+    if output_format == "graphml":
+        write_node, write_edge = _graphml_header(f, nodes, edges)
+    else:
+        write_node, write_edge = _xgmml_header(f, nodes, edges, name)
+
+    for chunk in _chunks(network.n_nodes, chunksize):
+        columns = [_formatted(nodes[column].iloc[chunk]) for column in nodes.columns]
+        f.write("".join(write_node(i, label, values) for i, label, values in zip(
+            range(chunk.start, chunk.stop), labels[chunk], zip(*columns) if columns else repeat(()))))
+
+    source, target = network.edges["Source"].tolist(), network.edges["Target"].tolist()
+    for chunk in _chunks(network.n_edges, chunksize):
+        columns = [_formatted(edges[column].iloc[chunk]) for column in edges.columns]
+        f.write("".join(write_edge(s, t, values) for s, t, values in zip(
+            source[chunk], target[chunk], zip(*columns) if columns else repeat(()))))
+    f.write("</graph>\n</graphml>\n" if output_format == "graphml" else "</graph>\n")
+
+def _graphml_header(f:IO[str], nodes:pd.DataFrame, edges:pd.DataFrame):
+    "Writes the GraphML header and returns the node and edge formatters."
+    f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+            '<key id="name" for="node" attr.name="name" attr.type="string"/>\n')
+    keys = {}
+    for kind, frame in (("node", nodes), ("edge", edges)):
+        for i, column in enumerate(frame.columns):
+            key = keys[kind, column] = f"{kind[0]}{i}"
+            f.write(f'<key id="{key}" for="{kind}" attr.name={quoteattr(str(column))} '
+                    f'attr.type="{_attribute_type(frame[column], "graphml")}"/>\n')
+    f.write('<graph id="G" edgedefault="undirected">\n')
+    node_keys = [keys["node", column] for column in nodes.columns]
+    edge_keys = [keys["edge", column] for column in edges.columns]
+
+    def data(keys, values):
+        return "".join(f'<data key="{key}">{value}</data>'
+                       for key, value in zip(keys, values) if value is not None)
+    def write_node(i, label, values):
+        return f'<node id="n{i}"><data key="name">{label}</data>{data(node_keys, values)}</node>\n'
+    def write_edge(source, target, values):
+        return f'<edge source="n{source}" target="n{target}">{data(edge_keys, values)}</edge>\n'
+    return write_node, write_edge
+
+def _xgmml_header(f:IO[str], nodes:pd.DataFrame, edges:pd.DataFrame, name:str):
+    "Writes the XGMML header and returns the node and edge formatters."
+    f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+            f'<graph label={quoteattr(name)} directed="0" '
+            'xmlns="http://www.cs.rpi.edu/XGMML" '
+            'xmlns:cy="http://www.cytoscape.org">\n')
+    node_types = [(quoteattr(str(c)), _attribute_type(nodes[c], "xgmml")) for c in nodes.columns]
+    edge_types = [(quoteattr(str(c)), _attribute_type(edges[c], "xgmml")) for c in edges.columns]
+
+    def atts(types, values):
+        return "".join(f'<att name={column} type="{kind}" value="{value}"/>'
+                       for (column, kind), value in zip(types, values) if value is not None)
+    def write_node(i, label, values):
+        return f'<node id="{i}" label="{label}">{atts(node_types, values)}</node>\n'
+    def write_edge(source, target, values):
+        return (f'<edge source="{source}" target="{target}">'
+                f'{atts(edge_types, values)}</edge>\n')
+    return write_node, write_edge
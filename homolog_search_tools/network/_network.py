@@ -0,0 +1,155 @@
+"""Sparse sequence similarity networks built from pairwise alignments."""
+
+from typing import List, Optional, Sequence
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse import csgraph
+
+EDGE_ATTRIBUTES = ["Log_E_Value", "Percent_Identity"]
+COVERAGE_COLUMNS = ["Query_Coverage", "Target_Coverage"]
+
+class SimilarityNetwork:
+    """
+    Undirected sequence similarity network (SSN) with integer node ids.
+
+    Nodes are accessions, numbered by their position in `nodes`. Edges are
+    stored once per unordered pair (Source < Target) in a DataFrame with
+    their attributes, and converted to a symmetric scipy CSR adjacency
+    matrix on demand.
+    """
+
+    def __init__(self, nodes:Sequence[str], edges:pd.DataFrame) -> None:
+        """
+        Parameters
+        ----------
+        - nodes: list of str: accessions, the node id is the position.
+        - edges: pd.DataFrame: Source and Target node ids, and edge attributes.
+        """
+        self.nodes = np.asarray(nodes, dtype=object)
+        self.edges = edges.reset_index(drop=True)
+
+    @classmethod
+    def from_hits(cls, hits:pd.DataFrame, nodes:Optional[Sequence[str]]=None,
+                  min_log_evalue:Optional[float]=None, min_identity:Optional[float]=None,
+                  min_coverage:Optional[float]=None,
+                  attributes:Optional[List[str]]=None) -> "SimilarityNetwork":
+        """
+        Builds a network from read_transform_tblastout output.
+
+        Self hits are dropped and hits of the same pair are merged into one
+        edge, keeping the hit with the highest Log_E_Value.
+
+        Parameters
+        ----------
+        - hits: pd.DataFrame: hits with Accession_1 and Accession_2 columns.
+        - nodes: list of str: all the accessions, including sequences
+            without hits. Default: None, accessions of the hits.
+        - min_log_evalue: float: minimum -log10 E-value of an edge. Default: None.
+        - min_identity: float: minimum percent identity of an edge. Default: None.
+        - min_coverage: float: minimum query and target coverage of an edge,
+            requires the Query_Coverage and Target_Coverage columns. Default: None.
+        - attributes: list of str: hit columns kept as edge attributes.
+            Default: Log_E_Value, Percent_Identity and the coverage columns
+            when present.
+
+        Returns
+        -------
+        - :SimilarityNetwork
+        """
+        if attributes is None:
+            attributes = EDGE_ATTRIBUTES + [c for c in COVERAGE_COLUMNS if c in hits.columns]
+        hits = _filter_hits(hits, min_log_evalue, min_identity, min_coverage)
+
+        if nodes is not None:
+            nodes = pd.Index(nodes)
+            source = nodes.get_indexer(np.asarray(hits["Accession_1"], dtype=object))
+            target = nodes.get_indexer(np.asarray(hits["Accession_2"], dtype=object))
+            if (source == -1).any() or (target == -1).any():
+                raise ValueError("Hits contain accessions missing from nodes.")
+        else:
+            source, target, nodes = _node_ids(hits["Accession_1"], hits["Accession_2"])
+
+        edges = pd.DataFrame({"Source": np.minimum(source, target).astype(np.int32),
+                              "Target": np.maximum(source, target).astype(np.int32)})
+        for attribute in attributes:
+            edges[attribute] = hits[attribute].to_numpy(dtype=np.float32)
+        edges = edges[edges["Source"] != edges["Target"]]
+        if "Log_E_Value" in edges:
+            edges = edges.sort_values("Log_E_Value", ascending=False, kind="stable")
+        edges = edges.drop_duplicates(["Source", "Target"], keep="first")
+        return cls(np.asarray(nodes, dtype=object), edges)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.nodes)
+
+    @property
+    def n_edges(self) -> int:
+        return len(self.edges)
+
+    def filter(self, min_log_evalue:Optional[float]=None, min_identity:Optional[float]=None,
+               min_coverage:Optional[float]=None) -> "SimilarityNetwork":
+        "Network of the same nodes, keeping the edges above the thresholds."
+        return SimilarityNetwork(self.nodes, _filter_hits(self.edges, min_log_evalue,
+                                                          min_identity, min_coverage))
+
+    def adjacency(self, weight:Optional[str]="Log_E_Value") -> sparse.csr_matrix:
+        """
+        Symmetric n_nodes x n_nodes CSR adjacency matrix.
+
+        Parameters
+        ----------
+        - weight: str: edge attribute stored in the matrix. Default:
+            "Log_E_Value". None for an unweighted (1.0) matrix.
+        """
+        source, target = self.edges["Source"].to_numpy(), self.edges["Target"].to_numpy()
+        data = (np.ones(len(source), dtype=np.float32) if weight is None else
+                self.edges[weight].to_numpy(dtype=np.float32))
+        return sparse.csr_matrix(
+            (np.concatenate([data, data]),
+             (np.concatenate([source, target]), np.concatenate([target, source]))),
+            shape=(self.n_nodes, self.n_nodes))
+
+    def components(self) -> np.ndarray:
+        "Connected component label of every node."
+        _, labels = csgraph.connected_components(self.adjacency(weight=None), directed=False)
+        return labels
+
+    def edge_list(self) -> pd.DataFrame:
+        "Edges with accessions (Accession_1, Accession_2) instead of node ids."
+        edges = self.edges.drop(columns=["Source", "Target"])
+        edges.insert(0, "Accession_1", self.nodes[self.edges["Source"].to_numpy()])
+        edges.insert(1, "Accession_2", self.nodes[self.edges["Target"].to_numpy()])
+        return edges
+
+def _node_ids(accession_1:pd.Series, accession_2:pd.Series):
+    "Integer ids of two accession columns, and the accession of every id."
+    if (isinstance(accession_1.dtype, pd.CategoricalDtype) and
+            accession_1.cat.categories.equals(accession_2.cat.categories)):
+        # read_transform_tblastout output shares one category table: reuse its codes.
+        categories = accession_1.cat.categories
+        source, target = accession_1.cat.codes.to_numpy(), accession_2.cat.codes.to_numpy()
+        used = np.zeros(len(categories), dtype=bool)
+        used[source], used[target] = True, True
+        ids = np.cumsum(used) - 1
+        return ids[source], ids[target], categories[used]
+    codes, nodes = pd.factorize(np.concatenate([np.asarray(accession_1, dtype=object),
+                                                np.asarray(accession_2, dtype=object)]))
+    return codes[:len(accession_1)], codes[len(accession_1):], nodes
+
+def _filter_hits(hits:pd.DataFrame, min_log_evalue:Optional[float]=None,
+                 min_identity:Optional[float]=None,
+                 min_coverage:Optional[float]=None) -> pd.DataFrame:
+    "Hits (or edges) above the thresholds."
+    keep = np.ones(len(hits), dtype=bool)
+    if min_log_evalue is not None:
+        keep &= hits["Log_E_Value"].to_numpy() >= min_log_evalue
+    if min_identity is not None:
+        keep &= hits["Percent_Identity"].to_numpy() >= min_identity
+    if min_coverage is not None:
+        if not set(COVERAGE_COLUMNS).issubset(hits.columns):
+            raise ValueError("Coverage filtering requires Query_Coverage and Target_Coverage columns.")
+        keep &= np.minimum(hits["Query_Coverage"].to_numpy(),
+                           hits["Target_Coverage"].to_numpy()) >= min_coverage
+    return hits if keep.all() else hits[keep]
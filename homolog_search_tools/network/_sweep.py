@@ -0,0 +1,91 @@
+"""Edge and component counts of a similarity network over many thresholds."""
+
+from typing import Sequence
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse import csgraph
+from ._network import SimilarityNetwork
+
+SWEEP_COLUMNS = ["Threshold", "Edges", "Components", "Largest_Component"]
+
+def threshold_sweep(network:SimilarityNetwork, thresholds:Sequence[float],
+                    attribute:str="Log_E_Value") -> pd.DataFrame:
+    """
+    Number of edges, connected components and size of the largest component
+    of the network keeping the edges with attribute >= threshold, for every
+    threshold, in one pass over the edges.
+
+    Edges are sorted from strongest to weakest and added in that order to a
+    union-find structure, as in Kruskal's algorithm. Only edges joining two
+    components change the counts; they form the maximum spanning forest,
+    found with scipy's compiled minimum_spanning_tree over edge ranks, so
+    the Python union-find loop runs over at most n_nodes - 1 edges.
+
+    Parameters
+    ----------
+    - network: SimilarityNetwork
+    - thresholds: list of float: cutoffs, in any order.
+    - attribute: str: edge attribute compared to the cutoffs. Default: "Log_E_Value".
+
+    Returns
+    -------
+    - :pd.DataFrame: Threshold, Edges, Components and Largest_Component, by
+        decreasing threshold.
+    """
+    thresholds = np.sort(np.asarray(thresholds, dtype=np.float64))[::-1]
+    values = network.edges[attribute].to_numpy(dtype=np.float64)
+    is_valid = ~np.isnan(values)
+    values = values[is_valid]
+    source = network.edges["Source"].to_numpy()[is_valid]
+    target = network.edges["Target"].to_numpy()[is_valid]
+    n_nodes = network.n_nodes
+
+    order = np.argsort(-values, kind="stable")
+    sorted_values = values[order]
+    # Rank 1 is the strongest edge; ranks are exact in float64 and never 0,
+    # which the sparse matrix would drop.
+    ranks = np.empty(len(values), dtype=np.float64)
+    ranks[order] = np.arange(1, len(values) + 1)
+    forest = csgraph.minimum_spanning_tree(
+        sparse.csr_matrix((ranks, (source, target)), shape=(n_nodes, n_nodes))).tocoo()
+    forest_order = np.argsort(forest.data, kind="stable")
+    forest_values = sorted_values[forest.data[forest_order].astype(np.int64) - 1]
+
+    largest = _largest_component_sizes(n_nodes, forest.row[forest_order], forest.col[forest_order])
+
+    # Counts of values >= threshold in descending arrays.
+    n_edges = np.searchsorted(-sorted_values, -thresholds, side="right")
+    n_merges = np.searchsorted(-forest_values, -thresholds, side="right")
+    return pd.DataFrame({
+        "Threshold": thresholds,
+        "Edges": n_edges.astype(np.int64),
+        "Components": (n_nodes - n_merges).astype(np.int64),
+        "Largest_Component": largest[n_merges]})
+
+def _largest_component_sizes(n_nodes:int, source:np.ndarray, target:np.ndarray) -> np.ndarray:
+    """
+    Size of the largest component after each merge of a spanning forest.
+
+    Returns
+    -------
+    - :np.ndarray: len(source) + 1 sizes, starting with no edges.
+    """
+    parent = list(range(n_nodes))
+    size = [1] * n_nodes
+    largest = [1 if n_nodes else 0]
+
+    def find(node):
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for a, b in zip(source.tolist(), target.tolist()):
+        a, b = find(a), find(b)
+        if size[a] < size[b]:
+            a, b = b, a
+        parent[b] = a
+        size[a] += size[b]
+        largest.append(max(largest[-1], size[a]))
+    return np.asarray(largest, dtype=np.int64)
@@ -1,8 +1,14 @@
 """Sequence search tools."""
 
-from ._uniprot import UniProtRequest, uniprotrecords_to_dataframe
+from ._cache import UniProtCache
+from ._search_utils import BatchReport, RetryPolicy
+from ._uniprot import UniProtRequest, read_uniprot_tsv, uniprotrecords_to_dataframe
 
 __all__ = [
     "UniProtRequest",
-    "uniprotrecords_to_dataframe"
+    "uniprotrecords_to_dataframe",
+    "read_uniprot_tsv",
+    "BatchReport",
+    "RetryPolicy",
+    "UniProtCache"
 ]
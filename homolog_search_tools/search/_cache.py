@@ -0,0 +1,192 @@
+"""On-disk cache of UniProt records shared across runs and processes."""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional
+from ._search_utils import AccessionId, AccessionIds, UniProtRecord
+
+def _default_cache_path() -> str:
+    "Cache file under $HOMOLOG_SEARCH_TOOLS_CACHE, or ~/.cache/homolog_search_tools."
+    root = os.environ.get("HOMOLOG_SEARCH_TOOLS_CACHE",
+                          os.path.join(os.path.expanduser("~"), ".cache", "homolog_search_tools"))
+    return os.path.join(root, "uniprot.sqlite")
+
+def fields_key(fields:Iterable[str]) -> str:
+    "Cache key of a requested field set, independent of field order."
+    return ",".join(sorted(set(fields)))
+
+def _sequence_version(record:UniProtRecord) -> Optional[int]:
+    "entryAudit.sequenceVersion of a record, when requested."
+    return (record.get("entryAudit") or {}).get("sequenceVersion")
+
+class UniProtCache:
+    """
+    SQLite cache of UniProt records keyed by accession and requested field set.
+    Records are stored as zlib-compressed JSON under their primary accession;
+    secondary accessions they were requested by are kept as aliases.
+
+    The database runs in WAL mode with a busy timeout, so several processes
+    can read and write the same cache file. Entries older than `ttl` seconds
+    are treated as misses; the least recently used entries are evicted once
+    the stored records exceed `max_size` bytes.
+    """
+
+    def __init__(self, path:Optional[os.PathLike]=None, ttl:Optional[float]=30 * 86400,
+                 max_size:Optional[int]=None, invalidate_on_sequence_version:bool=True,
+                 timeout:float=60.0) -> None:
+        """
+        Parameters
+        ----------
+        - path: path: SQLite file. Default: $HOMOLOG_SEARCH_TOOLS_CACHE/uniprot.sqlite
+            or ~/.cache/homolog_search_tools/uniprot.sqlite.
+        - ttl: float: time to live of an entry in seconds, None to never expire.
+            Default: 30 days.
+        - max_size: int: maximum size of the stored records in bytes. Default: None, unbounded.
+        - invalidate_on_sequence_version: bool: when a fetched record has a new
+            entryAudit.sequenceVersion, drop the entries of that accession cached
+            for other field sets. Default: True.
+        - timeout: float: seconds to wait for a lock held by another process.
+        """
+        self.path = os.fspath(path) if path is not None else _default_cache_path()
+        self.ttl = ttl
+        self.max_size = max_size
+        self.invalidate_on_sequence_version = invalidate_on_sequence_version
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS records ("
+                " accession TEXT NOT NULL, fields TEXT NOT NULL, sequence_version INTEGER,"
+                " fetched_at REAL NOT NULL, accessed_at REAL NOT NULL, size INTEGER NOT NULL,"
+                " data BLOB NOT NULL, PRIMARY KEY (accession, fields))")
+            conn.execute("CREATE INDEX IF NOT EXISTS records_accessed_at ON records (accessed_at)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS aliases ("
+                " accession TEXT NOT NULL PRIMARY KEY, primary_accession TEXT NOT NULL)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        "Connection that commits on success, rolls back on error and is closed on exit."
+        conn = sqlite3.connect(self.path, timeout=self.timeout)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get_many(self, accession:AccessionIds, fields:Iterable[str]) -> Dict[AccessionId, UniProtRecord]:
+        """
+        Cached records of the accessions requested with `fields`, secondary
+        accessions resolved through their aliases. Expired entries count as misses.
+
+        Returns
+        -------
+        - :dict: requested accession to UniProtRecord, for cache hits only.
+        """
+        key = fields_key(fields)
+        now = time.time()
+        oldest = now - self.ttl if self.ttl is not None else -1.0
+        unique = list(dict.fromkeys(accession))
+        out = {}
+        with self._connect() as conn:
+            for i in range(0, len(unique), 500):
+                batch = unique[i: i+500]
+                primary = {acc: acc for acc in batch}
+                primary.update(conn.execute(
+                    f"SELECT accession, primary_accession FROM aliases"
+                    f" WHERE accession IN ({','.join('?' * len(batch))})", batch).fetchall())
+                primaries = list(set(primary.values()))
+                rows = conn.execute(
+                    f"SELECT accession, data FROM records WHERE fields = ? AND fetched_at >= ?"
+                    f" AND accession IN ({','.join('?' * len(primaries))})",
+                    [key, oldest, *primaries]).fetchall()
+                records = {acc: json.loads(zlib.decompress(data)) for acc, data in rows}
+                out.update({acc: records[primary[acc]] for acc in batch if primary[acc] in records})
+                conn.executemany("UPDATE records SET accessed_at = ? WHERE accession = ? AND fields = ?",
+                                 [(now, acc, key) for acc, _ in rows])
+        with self._lock:
+            self.hits += len(out)
+            self.misses += len(unique) - len(out)
+        return out
+
+    def put_many(self, records:List[UniProtRecord], fields:Iterable[str],
+                 aliases:Optional[Dict[AccessionId, AccessionId]]=None) -> None:
+        """
+        Stores records fetched with `fields`, keyed by their primaryAccession.
+
+        Parameters
+        ----------
+        - records: list of UniProtRecord
+        - fields: list of str: requested fields.
+        - aliases: dict: requested (secondary) accession to the primaryAccession
+            of the record returned for it. Default: None.
+        """
+        key = fields_key(fields)
+        now = time.time()
+        rows = []
+        for record in records:
+            data = zlib.compress(json.dumps(record, separators=(",", ":")).encode("utf-8"))
+            rows.append((record["primaryAccession"], key, _sequence_version(record),
+                         now, now, len(data), data))
+        with self._connect() as conn:
+            if self.invalidate_on_sequence_version:
+                conn.executemany(
+                    "DELETE FROM records WHERE accession = ? AND sequence_version IS NOT NULL"
+                    " AND sequence_version != ?",
+                    [(row[0], row[2]) for row in rows if row[2] is not None])
+            conn.executemany("INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            if aliases:
+                conn.executemany("INSERT OR REPLACE INTO aliases VALUES (?, ?)", aliases.items())
+        self.evict()
+
+    def invalidate(self, accession:Optional[AccessionIds]=None) -> None:
+        "Drops the entries of the given accessions, or every entry."
+        with self._connect() as conn:
+            if accession is None:
+                conn.execute("DELETE FROM records")
+                conn.execute("DELETE FROM aliases")
+            else:
+                conn.executemany("DELETE FROM records WHERE accession = ?",
+                                 [(acc,) for acc in accession])
+                conn.executemany("DELETE FROM aliases WHERE accession = ? OR primary_accession = ?",
+                                 [(acc, acc) for acc in accession])
+
+    def size(self) -> int:
+        "Size of the stored records in bytes."
+        with self._connect() as conn:
+            return conn.execute("SELECT COALESCE(SUM(size), 0) FROM records").fetchone()[0]
+
+    def evict(self) -> None:
+        "Drops expired entries, then least recently used entries beyond max_size."
+        with self._connect() as conn:
+            if self.ttl is not None:
+                conn.execute("DELETE FROM records WHERE fetched_at < ?", (time.time() - self.ttl,))
+            if self.max_size is None:
+                return
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM records").fetchone()[0]
+            if total <= self.max_size:
+                return
+            evicted = []
+            for acc, key, size in conn.execute(
+                    "SELECT accession, fields, size FROM records ORDER BY accessed_at"):
+                if total <= self.max_size:
+                    break
+                evicted.append((acc, key))
+                total -= size
+            conn.executemany("DELETE FROM records WHERE accession = ? AND fields = ?", evicted)
+
+    def stats(self) -> Dict[str, float]:
+        "Hit and miss counters of this instance."
+        requests = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0}
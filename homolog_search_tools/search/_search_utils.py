@@ -1,6 +1,17 @@
 """Helper functions for the search sub-module."""
 
-from typing import Callable, Dict, List, Union
+import codecs
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 AccessionId = str
 AccessionIds = List[AccessionId]
@@ -32,32 +43,284 @@ UniProtRequestFields = [
     "xref_prosite", "xref_sfld", "xref_smart", "xref_supfam"
 ]
 
-def batch_request(request_func:Callable, accession:Accession, batch_size:int=500, **kwarg):
+ACCESSION_PATTERN = re.compile(
+    r"^([OPQ][0-9][A-Z0-9]{3}[0-9]|[A-NR-Z][0-9]([A-Z][A-Z0-9]{2}[0-9]){1,2})(-[0-9]+)?$")
+
+def validate_accessions(accession:AccessionIds) -> Tuple[AccessionIds, AccessionIds]:
+    """
+    Splits accessions into well-formed and malformed UniProtKB accessions
+    (isoform suffixes such as P12345-2 are accepted).
+
+    Returns
+    -------
+    : tuple: (valid accessions, invalid accessions), both in input order.
+    """
+    valid, invalid = [], []
+    for acc in accession:
+        (valid if ACCESSION_PATTERN.match(acc) else invalid).append(acc)
+    return valid, invalid
+
+class InvalidAccessionError(Exception):
+    "Raised by request functions when the API rejects specific accessions."
+
+    def __init__(self, accessions:AccessionIds, message:str="") -> None:
+        super().__init__(message or f"Invalid accessions: {', '.join(accessions)}")
+        self.accessions = list(accessions)
+
+@dataclass
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter for transient HTTP errors.
+
+    Parameters
+    ----------
+    - max_retries: int: retries per request. Default: 5.
+    - backoff_factor: float: base delay in seconds, doubled every retry. Default: 0.5.
+    - max_backoff: float: maximum delay in seconds. Default: 60.
+    - retry_statuses: tuple of int: HTTP statuses to retry. Default: 429 and 5xx gateway errors.
+    """
+    max_retries: int = 5
+    backoff_factor: float = 0.5
+    max_backoff: float = 60.0
+    retry_statuses: Tuple[int, ...] = (429, 500, 502, 503, 504)
+
+    def should_retry(self, status_code:int, attempt:int) -> bool:
+        "Whether a response with status_code is retried after `attempt` retries."
+        return status_code in self.retry_statuses and attempt < self.max_retries
+
+    def backoff(self, attempt:int, retry_after:Optional[str]=None) -> float:
+        """
+        Delay in seconds before retry number attempt + 1. A Retry-After header,
+        in seconds or as an HTTP date, takes precedence over the backoff.
+        """
+        if retry_after:
+            try:
+                return min(self.max_backoff, max(0.0, float(retry_after)))
+            except ValueError:
+                try:
+                    retry_at = parsedate_to_datetime(retry_after).timestamp()
+                    return min(self.max_backoff, max(0.0, retry_at - time.time()))
+                except (TypeError, ValueError):
+                    pass
+        return random.uniform(0, min(self.max_backoff, self.backoff_factor * 2 ** attempt))
+
+@dataclass
+class BatchReport:
     """
-    Exectues request_func in batches. Can handle potential
-    unknown accession (404) errors.
+    Accessions that could not be fetched, with the reason.
+
+    Parameters
+    ----------
+    - invalid: list of str: malformed accessions or accessions rejected by the API.
+    - failed: dict: accession to error message, for requests that kept failing.
+    """
+    invalid: AccessionIds = field(default_factory=list)
+    failed: Dict[AccessionId, str] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        self._lock = threading.Lock()
+
+    def add_invalid(self, accession:AccessionIds) -> None:
+        "Records invalid accessions."
+        with self._lock:
+            self.invalid.extend(accession)
+
+    def add_failed(self, accession:AccessionIds, error:Exception) -> None:
+        "Records accessions whose request failed with error."
+        with self._lock:
+            for acc in accession:
+                self.failed[acc] = repr(error)
+
+    @property
+    def ok(self) -> bool:
+        "Whether every accession was fetched."
+        return not self.invalid and not self.failed
+
+def batch_request(request_func:Callable, accession:Accession, batch_size:int=500,
+                  report:Optional[BatchReport]=None, **kwarg):
+    """
+    Exectues request_func in batches.
+
+    Accessions rejected by the API (InvalidAccessionError) are excluded and
+    the rest of the batch is requested again in one pass. Other errors are
+    isolated by splitting the failing batch in halves; request_func is
+    expected to retry transient errors itself.
 
     Parameters
     ----------
     - request_func: Callable: api request function to execute in batches.
     - accession: list of accessions
     - batch_size: int: batch size. Default: 500.
+    - report: BatchReport: records invalid and failed accessions. Default: None.
 
     Reqturns
     --------
     : : concatenated output of the request function.
     """
+    report = report if report is not None else BatchReport()
     output = []
-    if len(accession) == 1:
-        try:
-            output.extend(request_func(accession, **kwarg))
-        except:
-            print(f"Unable to handle {accession}")
-    else:
-        for i in range(0, len(accession), batch_size):
-            batch = accession[i: i+batch_size]
-            try:
-                output.extend(request_func(batch, **kwarg))
-            except:
-                output.extend(batch_request(request_func, batch, batch_size//2, **kwarg))
-    return output
\ No newline at end of file
+    for i in range(0, len(accession), batch_size):
+        output.extend(_request_batch(request_func, accession[i: i+batch_size], report, **kwarg))
+    return output
+
+def _request_batch(request_func:Callable, batch:AccessionIds, report:BatchReport, **kwarg):
+    "Requests one batch, excluding rejected accessions and isolating failures."
+    try:
+        return request_func(batch, **kwarg)
+    except InvalidAccessionError as e:
+        invalid = set(e.accessions).intersection(batch)
+        if not invalid:
+            return _split_batch(request_func, batch, report, e, **kwarg)
+        report.add_invalid([acc for acc in batch if acc in invalid])
+        remaining = [acc for acc in batch if acc not in invalid]
+        return _request_batch(request_func, remaining, report, **kwarg) if remaining else []
+    except Exception as e:
+        return _split_batch(request_func, batch, report, e, **kwarg)
+
+def _split_batch(request_func:Callable, batch:AccessionIds, report:BatchReport,
+                 error:Exception, **kwarg):
+    "Requests both halves of a failed batch, recording single accessions that fail."
+    if len(batch) == 1:
+        report.add_failed(batch, error)
+        return []
+    middle = len(batch) // 2
+    return (_request_batch(request_func, batch[:middle], report, **kwarg) +
+            _request_batch(request_func, batch[middle:], report, **kwarg))
+
+def concurrent_batch_request(request_func:Callable, accession:Accession, batch_size:int=500,
+                             max_workers:int=1, **kwarg):
+    """
+    Executes batch_request on batches of accessions concurrently.
+    Output order follows the input order regardless of completion order.
+
+    Parameters
+    ----------
+    - request_func: Callable: api request function to execute in batches.
+        Must be thread-safe when max_workers > 1.
+    - accession: list of accessions
+    - batch_size: int: batch size. Default: 500.
+    - max_workers: int: maximum number of concurrent requests. Default: 1.
+
+    Returns
+    --------
+    : : concatenated output of the request function.
+    """
+    if max_workers < 1:
+        raise ValueError("Invalid max_workers value.")
+    batches = [accession[i: i+batch_size] for i in range(0, len(accession), batch_size)]
+    if max_workers == 1 or len(batches) <= 1:
+        return batch_request(request_func, accession, batch_size, **kwarg)
+
+    output = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for batch_output in executor.map(
+                lambda batch: batch_request(request_func, batch, batch_size, **kwarg), batches):
+            output.extend(batch_output)
+    return output
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter: allows `rate` acquisitions per
+    second on average, with bursts of up to `capacity`.
+    """
+
+    def __init__(self, rate:float, capacity:Optional[float]=None) -> None:
+        if rate <= 0:
+            raise ValueError("Invalid rate value.")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens:float=1.0) -> None:
+        "Blocks until `tokens` are available, then consumes them."
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+def iter_json_array(chunks:Iterable[bytes], key:str="results") -> Iterator:
+    """
+    Incrementally parses the `key` array of a JSON document received as
+    byte chunks, yielding every element as soon as it is complete, so the
+    whole document is never held in memory.
+
+    Parameters
+    ----------
+    - chunks: iterable of bytes: the JSON document, e.g. response.iter_content().
+    - key: str: name of the top-level array. Default: "results".
+
+    Returns
+    -------
+    - :Iterator: decoded elements of the array.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer, pos, in_array = "", 0, False
+    chunks = iter(chunks)
+    exhausted = False
+
+    while True:
+        if not in_array:
+            start = buffer.find(f'"{key}"')
+            bracket = buffer.find("[", start) if start != -1 else -1
+            if bracket != -1:
+                buffer, pos, in_array = buffer[bracket + 1:], 0, True
+                continue
+        else:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buffer) and buffer[pos] == "]":
+                return
+            if pos < len(buffer):
+                try:
+                    element, pos = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if exhausted:
+                        raise
+                else:
+                    yield element
+                    continue
+            buffer, pos = buffer[pos:], 0
+
+        if exhausted:
+            if in_array:
+                raise ValueError(f"Truncated JSON document: unterminated '{key}' array.")
+            return
+        chunk = next(chunks, None)
+        if chunk is None:
+            exhausted = True
+            buffer += text_decoder.decode(b"", final=True)
+        else:
+            buffer += text_decoder.decode(chunk)
+
+def gunzip_chunks(chunks:Iterable[bytes]) -> Iterator[bytes]:
+    """
+    Decompresses gzip byte chunks on the fly. Chunks that do not start with
+    the gzip magic number, e.g. already decoded by the transport, pass through.
+    """
+    chunks = iter(chunks)
+    first = next(chunks, b"")
+    while first == b"":
+        first = next(chunks, None)
+        if first is None:
+            return
+    if not first.startswith(b"\x1f\x8b"):
+        yield first
+        yield from chunks
+        return
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    for chunk in itertools.chain([first], chunks):
+        data = decompressor.decompress(chunk)
+        if data:
+            yield data
+    data = decompressor.flush()
+    if data:
+        yield data
@@ -1,120 +1,608 @@
 """Sub-module to interact with UniProt REST API."""
 
-import sys
-from typing import List
+import csv
+import gc
+import gzip
+import io
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 import requests
+import requests.adapters
 import pandas as pd
-from ._search_utils import Accession, AccessionId, UniProtRequestFields, UniProtRecord, batch_request
+from ._search_utils import (
+    Accession, AccessionId, AccessionIds, UniProtRequestFields, UniProtRecord,
+    BatchReport, InvalidAccessionError, RetryPolicy, TokenBucket, concurrent_batch_request,
+    gunzip_chunks, iter_json_array, validate_accessions
+)
+from ._cache import UniProtCache
 
 class UniProtRequest:
     "Class to interact with the UniProt REST API."
     fields = UniProtRequestFields
 
-    def __init__(self, email:str) -> None:
+    def __init__(self, email:str, max_workers:int=4, requests_per_second:float=5.0,
+                 base_url:str="https://rest.uniprot.org",
+                 retry_policy:Optional[RetryPolicy]=None,
+                 cache:Optional[UniProtCache]=None) -> None:
         """
         Initialize class to interact with the UniProt REST API.
 
         Parameters
         ----------
         - email: str: email address.
+        - max_workers: int: maximum number of concurrent requests. Default: 4.
+        - requests_per_second: float: rate limit shared by all workers. Default: 5.
+        - base_url: str: UniProt REST API root, e.g. a local stub server for testing.
+        - retry_policy: RetryPolicy: backoff for 429/5xx responses and
+            connection errors. Default: RetryPolicy().
+        - cache: UniProtCache: local record cache; only cache misses are
+            requested. Default: None.
         
         Reference
         ---------
         - https://www.uniprot.org/help/programmatic_access
         """
         self.email = email
+        self.max_workers = max_workers
+        self.base_url = base_url.rstrip("/")
+        self.rate_limiter = TokenBucket(requests_per_second, capacity=max_workers)
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.cache = cache
+        self._local = threading.local()
 
-    def fetch_records(self, accession:Accession, **kwarg) -> List[UniProtRecord]:
+    @property
+    def session(self) -> requests.Session:
+        """
+        Keep-alive session of the calling thread, so that every worker
+        reuses its own pooled connection.
+        """
+        if not hasattr(self._local, "session"):
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=1)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            self._local.session = session
+        return self._local.session
+
+    def fetch_records(self, accession:Accession, return_report:bool=False,
+                      output_format:str="json", **kwarg) -> Union[List[UniProtRecord], pd.DataFrame,
+                                        Tuple[Union[List[UniProtRecord], pd.DataFrame], BatchReport]]:
         """
         Batch fetch UniProt reccord a (or many) accession id(s).
+        Batches are requested concurrently, records keep the input order.
+
+        Malformed accessions are excluded before any request is made, and
+        accessions rejected by the API are excluded from their batch in one
+        pass; both are listed in the BatchReport. With a cache, only the
+        accessions missing from it are requested.
 
         Parameters
         ----------
         - accession: str | List[str]: UniProt accession ids.
-        - **kwarg: arguments for the batch_request function.
+        - return_report: bool: also return the BatchReport. Default: False.
+        - output_format: str: "json" for UniProtRecords, or "tsv" to request
+            gzip-compressed TSV parsed straight into the columns of
+            uniprotrecords_to_dataframe. The cache only applies to "json".
+            Default: "json".
+        - **kwarg: arguments for the concurrent_batch_request function.
+
+        Returns
+        -------
+        - : list of UniProtRecord, or a DataFrame with output_format "tsv", and the
+            BatchReport when return_report is set.
+        """
+        if output_format not in UniProtFormats:
+            raise ValueError("Invalid output_format value.")
+        if isinstance(accession, AccessionId):
+            accession = [accession]
+        report = BatchReport()
+        accession, invalid = validate_accessions(accession)
+        report.add_invalid(invalid)
+
+        kwarg.setdefault("max_workers", self.max_workers)
+        if output_format == "tsv":
+            tables = concurrent_batch_request(
+                self._request_accessions_tsv, accession=accession, **kwarg, report=report,
+                fields=[field for field, _ in UNIPROT_TSV_FIELDS]) if accession else []
+            df = read_uniprot_tsv(b"".join(tables))
+            return (df, report) if return_report else df
+
+        cached = self.cache.get_many(accession, self.fields) if self.cache is not None else {}
+        missing = [acc for acc in accession if acc not in cached]
+        records = concurrent_batch_request(
+            self._request_accessions, accession=missing, **kwarg, report=report,
+            fields=self.fields) if missing else []
+        if self.cache is not None:
+            aliases = _secondary_accessions(missing, records)
+            self.cache.put_many(records, self.fields, aliases=aliases)
+            records = _merge_records(accession, cached, records, aliases)
+        if return_report:
+            return records, report
+        return records
+
+    def search_records(self, query:str, size:int=500, compressed:bool=True,
+                       **params) -> Iterator[UniProtRecord]:
+        """
+        Yields the UniProt records matching a query from the /uniprotkb/search
+        endpoint, following the cursor of the Link header page by page.
+        Every page is parsed as its bytes arrive.
+
+        Parameters
+        ----------
+        - query: str: UniProtKB query, e.g. "family:\"ADH family\" AND reviewed:true".
+        - size: int: records per page, at most 500. Default: 500.
+        - compressed: bool: request gzip-compressed pages. Default: True.
+        - **params: additional query parameters of the endpoint.
+
+        Returns
+        -------
+        - :Iterator of UniProtRecord.
+
+        Reference
+        ---------
+        - https://www.uniprot.org/help/pagination
+        """
+        if not 1 <= size <= 500:
+            raise ValueError("Invalid size value.")
+        url = f"{self.base_url}/uniprotkb/search"
+        params = {"query": query, "fields": self.fields, "size": size, "format": "json",
+                  **params}
+        while url is not None:
+            with self._stream(url, params, compressed) as response:
+                yield from self._iter_results(response, compressed)
+                url = response.links.get("next", {}).get("url")
+            # The next link carries every query parameter.
+            params = None
+
+    def stream_records(self, query:str, compressed:bool=True, **params) -> Iterator[UniProtRecord]:
+        """
+        Yields the UniProt records matching a query from the /uniprotkb/stream
+        endpoint, which returns all results in a single response. Records are
+        parsed as the bytes arrive, so the response is never held in memory.
+
+        Parameters
+        ----------
+        - query: str: UniProtKB query.
+        - compressed: bool: request a gzip-compressed response. Default: True.
+        - **params: additional query parameters of the endpoint.
 
         Returns
         -------
-        - : list of UniProtRecord.
+        - :Iterator of UniProtRecord.
+        """
+        params = {"query": query, "fields": self.fields, "format": "json", **params}
+        with self._stream(f"{self.base_url}/uniprotkb/stream", params, compressed) as response:
+            yield from self._iter_results(response, compressed)
+
+    def _stream(self, url:str, params:Optional[dict], compressed:bool) -> requests.Response:
+        "Streamed GET of a query endpoint, raising on error statuses."
+        if params is not None and compressed:
+            params = {**params, "compressed": "true"}
+        response = self._get(url, headers={"accept": "application/json"}, params=params,
+                             stream=True, timeout=500)
+        if not response.ok:
+            response.close()
+            response.raise_for_status()
+        return response
+
+    @staticmethod
+    def _iter_results(response:requests.Response, compressed:bool,
+                      chunk_size:int=1 << 16) -> Iterator[UniProtRecord]:
+        "Records of a streamed response, gunzipped when the body is compressed."
+        chunks = response.iter_content(chunk_size)
+        if compressed:
+            chunks = gunzip_chunks(chunks)
+        return iter_json_array(chunks, "results")
+
+    def _get(self, url:str, **kwarg) -> requests.Response:
         """
+        Rate-limited GET on the thread's session. Retries 429/5xx responses
+        and connection errors following the retry policy, honoring Retry-After.
+        """
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            try:
+                response = self.session.get(url, **kwarg)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.retry_policy.max_retries:
+                    raise
+                time.sleep(self.retry_policy.backoff(attempt))
+                attempt += 1
+                continue
+            if not self.retry_policy.should_retry(response.status_code, attempt):
+                return response
+            time.sleep(self.retry_policy.backoff(attempt, response.headers.get("Retry-After")))
+            attempt += 1
 
-        def uniprot_request_function(accession, fields):
-            params = {
-                "accessions": ",".join(accession),
-                "fields": fields
+    def _request_accessions(self, accession:AccessionIds, fields:List) -> List[UniProtRecord]:
+        "Requests one batch of accessions from the /uniprotkb/accessions endpoint."
+        params = {
+            "accessions": ",".join(accession),
+            "fields": fields
+        }
+        headers = {
+            "accept": "application/json"
             }
-            headers = {
-                "accept": "application/json"
-                }
-            base_url = "https://rest.uniprot.org/uniprotkb/accessions"
+        base_url = f"{self.base_url}/uniprotkb/accessions"
 
-            response = requests.get(base_url, headers=headers, params=params, timeout=500)
-            if not response.ok:
-                response.raise_for_status()
-                sys.exit()
-            return response.json()["results"]
+        response = self._get(base_url, headers=headers, params=params, timeout=500)
+        if not response.ok:
+            rejected = _rejected_accessions(response, accession)
+            if rejected:
+                raise InvalidAccessionError(rejected)
+            response.raise_for_status()
+        return response.json()["results"]
 
-        if isinstance(accession, AccessionId):
-            accession = [accession]
-        records = batch_request(
-            uniprot_request_function, accession=accession, **kwarg, fields=self.fields)
-        return records
+    def _request_accessions_tsv(self, accession:AccessionIds, fields:List) -> List[bytes]:
+        """
+        Requests one batch of accessions as gzip-compressed TSV.
+
+        Returns
+        -------
+        - :list of bytes: the TSV rows of the batch without the header line,
+            as a single item so that batches concatenate.
+        """
+        params = {
+            "accessions": ",".join(accession),
+            "fields": ",".join(fields),
+            "format": "tsv",
+            "compressed": "true"
+        }
+        base_url = f"{self.base_url}/uniprotkb/accessions"
+
+        response = self._get(base_url, headers={"accept": "text/plain;format=tsv"},
+                             params=params, timeout=500)
+        if not response.ok:
+            rejected = _rejected_accessions(response, accession)
+            if rejected:
+                raise InvalidAccessionError(rejected)
+            response.raise_for_status()
+        content = response.content
+        if content.startswith(b"\x1f\x8b"):
+            content = gzip.decompress(content)
+        _, _, rows = content.partition(b"\n")
+        # Batches are concatenated, so each must end with a newline.
+        if rows and not rows.endswith(b"\n"):
+            rows += b"\n"
+        return [rows]
 
     def set_request_fields(self, fields:List) -> None:
         "Overwrites default request fields. Used for testing."
         self.fields = fields
 
+def _secondary_accessions(accession:AccessionIds,
+                          fetched:List[UniProtRecord]) -> Dict[AccessionId, AccessionId]:
+    """
+    Requested accessions answered by a record with another primaryAccession,
+    matched through the secondaryAccessions of the fetched records.
+
+    Returns
+    -------
+    - :dict: requested accession to primaryAccession.
+    """
+    primary = {record["primaryAccession"] for record in fetched}
+    secondary = {acc: record["primaryAccession"] for record in fetched
+                 for acc in record.get("secondaryAccessions", [])}
+    return {acc: secondary[acc] for acc in accession
+            if acc not in primary and acc in secondary}
+
+def _merge_records(accession:AccessionIds, cached:dict, fetched:List[UniProtRecord],
+                   aliases:Optional[Dict[AccessionId, AccessionId]]=None) -> List[UniProtRecord]:
+    """
+    Cached and fetched records in the order of the requested accessions,
+    secondary accessions matched through aliases. Fetched records not
+    matching a requested accession are appended.
+    """
+    aliases = aliases if aliases is not None else {}
+    by_accession = {record["primaryAccession"]: record for record in fetched}
+    out, seen = [], set()
+    for acc in accession:
+        record = cached.get(acc, by_accession.get(aliases.get(acc, acc)))
+        if record is not None:
+            out.append(record)
+            seen.add(record["primaryAccession"])
+    out.extend(record for record in fetched if record["primaryAccession"] not in seen)
+    return out
+
+def _rejected_accessions(response:requests.Response, accession:AccessionIds) -> AccessionIds:
+    """
+    Accessions of the batch quoted in the messages of a UniProt error body,
+    e.g. "Accession 'XYZ' has invalid format".
+    """
+    try:
+        messages = response.json().get("messages", [])
+    except ValueError:
+        return []
+    batch = set(accession)
+    quoted = {match for message in messages for match in re.findall(r"'([^']+)'", str(message))}
+    return [acc for acc in accession if acc in quoted and acc in batch]
+
+# Family and domain databases, also the names of their output columns.
+FAMILY_DOMAIN_DATABASES = [
+    "CDD", "DisProt", "Gene3D", "HAMAP", "InterPro", "NCBIfam", "PANTHER", "Pfam",
+    "PRINTS", "PROSITE", "SFLD", "SMART", "SUPFAM",
+]
+
+# Output column to uniProtKBCrossReferences database.
+CROSS_REFERENCE_COLUMNS = {
+    # Gene Ontology (GO)
+    "GO": "GO",
+    # Structure
+    "PDBAccession": "PDB",
+    # Family and domain.
+    **{database: database for database in FAMILY_DOMAIN_DATABASES},
+}
+
+# commentType to output column and the values of a comment.
+COMMENT_COLUMNS = {
+    "INTERACTION": ("Interaction", lambda comment: [
+        interaction["interactantTwo"]["uniProtKBAccession"]
+        for interaction in comment["interactions"]]),
+    "SUBUNIT": ("Subunit", lambda comment: [text["value"] for text in comment["texts"]]),
+    "SUBCELLULAR LOCATION": ("SubcellularLocation", lambda comment: [
+        location["location"]["value"] for location in comment["subcellularLocations"]]),
+}
+
+UNIPROT_DATAFRAME_COLUMNS = [
+    # Names & Taxonomy
+    "primaryAccession", "uniProtkbId", "genes", "organism_scientificName",
+    "organism_commonName", "taxonId", "proteinDescription",
+    # Sequences
+    "sequence", "sequenceLength", "sequencemolWeight", "sequenceVersion",
+    # Miscellaneous
+    "annotationScore", "proteinExistence", "uniParcId",
+    # Interaction
+    "Interaction", "Subunit",
+    # Gene Ontology (GO)
+    "GO",
+    # Subcellular location
+    "SubcellularLocation",
+    # Structure
+    "PDBAccession",
+    # Family and domain.
+    *FAMILY_DOMAIN_DATABASES,
+]
+
+UniProtFormats = ["json", "tsv"]
+
+# TSV return field and output column, in the order of UNIPROT_DATAFRAME_COLUMNS.
+# organism_name holds both organism_scientificName and organism_commonName.
+UNIPROT_TSV_FIELDS = [
+    # Names & Taxonomy
+    ("accession", "primaryAccession"), ("id", "uniProtkbId"), ("gene_primary", "genes"),
+    ("organism_name", "organism_name"), ("organism_id", "taxonId"),
+    ("protein_name", "proteinDescription"),
+    # Sequences
+    ("sequence", "sequence"), ("length", "sequenceLength"), ("mass", "sequencemolWeight"),
+    ("sequence_version", "sequenceVersion"),
+    # Miscellaneous
+    ("annotation_score", "annotationScore"), ("protein_existence", "proteinExistence"),
+    ("uniparc_id", "uniParcId"),
+    # Interaction
+    ("cc_interaction", "Interaction"), ("cc_subunit", "Subunit"),
+    # Gene Ontology (GO)
+    ("go_id", "GO"),
+    # Subcellular location
+    ("cc_subcellular_location", "SubcellularLocation"),
+    # Structure
+    ("xref_pdb", "PDBAccession"),
+    # Family and domain.
+    *((f"xref_{database.lower()}", database) for database in FAMILY_DOMAIN_DATABASES),
+]
+
+PROTEIN_EXISTENCE_LEVELS = {
+    "Evidence at protein level": 1, "Evidence at transcript level": 2,
+    "Inferred from homology": 3, "Predicted": 4, "Uncertain": 5,
+}
+
+# Parenthesized suffixes of an organism name that are not a common name.
+_ORGANISM_QUALIFIERS = ("strain ", "isolate ", "subsp", "serotype ", "serovar ", "biovar ",
+                        "cultivar ", "clone ", "var. ", "pathovar ")
+_EVIDENCE_PATTERN = re.compile(r"\s*\{[^{}]*\}")
+
+def read_uniprot_tsv(path_or_buff:Union[bytes, str, io.IOBase]) -> pd.DataFrame:
+    """
+    Parses UniProt TSV rows, without header, of the UNIPROT_TSV_FIELDS into
+    the columns of uniprotrecords_to_dataframe.
+
+    The TSV format drops part of the structure of the JSON records, so a few
+    columns are rebuilt from text: the common name is the parenthesized suffix
+    of the organism name, the protein description is the first protein name,
+    and comment columns are empty lists instead of None when a record has
+    no comments.
+
+    Parameters
+    ----------
+    - path_or_buff: bytes | path | buffer: TSV rows.
+
+    Returns
+    -------
+    - :pd.DataFrame
+    """
+    names = [column for _, column in UNIPROT_TSV_FIELDS]
+    if isinstance(path_or_buff, bytes):
+        if not path_or_buff.strip():
+            return _tsv_to_columns(pd.DataFrame(columns=names))
+        path_or_buff = io.BytesIO(path_or_buff)
+    df = pd.read_csv(path_or_buff, sep="\t", header=None, names=names, quoting=csv.QUOTE_NONE,
+                     dtype={"taxonId": "int64", "sequenceLength": "int64",
+                            "sequenceVersion": "int64", "annotationScore": "float64",
+                            "sequencemolWeight": "object"})
+    return _tsv_to_columns(df)
+
+def _tsv_to_columns(df:pd.DataFrame) -> pd.DataFrame:
+    "Converts the text columns of read_uniprot_tsv."
+    organism = [_split_organism_name(name) for name in df["organism_name"]]
+    out = {
+        # Names & Taxonomy
+        "primaryAccession": df["primaryAccession"].to_list(),
+        "uniProtkbId": df["uniProtkbId"].to_list(),
+        "genes": _split_values(df["genes"], "; "),
+        "organism_scientificName": [name for name, _ in organism],
+        "organism_commonName": [common_name for _, common_name in organism],
+        "taxonId": df["taxonId"].astype("int64"),
+        "proteinDescription": [_first_protein_name(name) for name in df["proteinDescription"]],
+        # Sequences
+        "sequence": df["sequence"].to_list(),
+        "sequenceLength": df["sequenceLength"].astype("int64"),
+        "sequencemolWeight": pd.to_numeric(
+            df["sequencemolWeight"].astype(str).str.replace(",", "", regex=False)).astype("int64"),
+        "sequenceVersion": df["sequenceVersion"].astype("int64"),
+        # Miscellaneous
+        "annotationScore": df["annotationScore"].astype("float64"),
+        "proteinExistence": [
+            f"{PROTEIN_EXISTENCE_LEVELS[level]}: {level}" if level in PROTEIN_EXISTENCE_LEVELS
+            else level for level in df["proteinExistence"]],
+        "uniParcId": df["uniParcId"].to_list(),
+        # Interaction
+        "Interaction": _split_values(df["Interaction"], "; "),
+        "Subunit": _comment_texts(df["Subunit"], "SUBUNIT"),
+        # Gene Ontology (GO)
+        "GO": _split_values(df["GO"], "; "),
+        # Subcellular location
+        "SubcellularLocation": _subcellular_locations(df["SubcellularLocation"]),
+        # Structure
+        "PDBAccession": _split_values(df["PDBAccession"], ";"),
+    }
+    for database in FAMILY_DOMAIN_DATABASES:
+        out[database] = _split_values(df[database], ";")
+    return pd.DataFrame(out, columns=UNIPROT_DATAFRAME_COLUMNS)
+
+def _split_values(values:pd.Series, sep:str) -> List[list]:
+    "Splits separated values into lists, empty for missing values."
+    return [[value.strip() for value in text.split(sep) if value.strip()]
+            if isinstance(text, str) else [] for text in values]
+
+def _split_organism_name(name:str) -> Tuple[str, Optional[str]]:
+    "Scientific and common name of a TSV organism name, e.g. 'Homo sapiens (Human)'."
+    if not isinstance(name, str) or not name.endswith(")") or " (" not in name:
+        return name, None
+    start = name.rindex(" (")
+    suffix = name[start + 2:-1]
+    if suffix.startswith(_ORGANISM_QUALIFIERS):
+        return name, None
+    return name[:start], suffix
+
+def _first_protein_name(names:str) -> Optional[str]:
+    "First of the TSV protein names, e.g. 'Insulin (Ins) [Cleaved into: ...]'."
+    if not isinstance(names, str):
+        return None
+    end = min(i for i in [names.find(" ("), names.find(" ["), len(names)] if i != -1)
+    return names[:end]
+
+def _comment_texts(values:pd.Series, comment_type:str) -> List[list]:
+    "Texts of TSV comments, e.g. 'SUBUNIT: Homodimer. {ECO:0000250}.', without evidence."
+    out = []
+    for text in values:
+        texts = []
+        if isinstance(text, str):
+            for part in _EVIDENCE_PATTERN.sub("", text).split(f"{comment_type}: "):
+                part = part.strip().rstrip(".").strip()
+                if part:
+                    texts.append(part)
+        out.append(texts)
+    return out
+
+def _subcellular_locations(values:pd.Series) -> List[list]:
+    """
+    Locations of TSV subcellular location comments, e.g. 'SUBCELLULAR LOCATION:
+    [Isoform 1]: Cell membrane; Single-pass membrane protein. Note=...',
+    without topologies, notes and evidence.
+    """
+    out = []
+    for text in values:
+        locations = []
+        if isinstance(text, str):
+            for part in _EVIDENCE_PATTERN.sub("", text).split("SUBCELLULAR LOCATION: "):
+                part = re.sub(r"^\[[^\]]*\]:\s*", "", part.split("Note=")[0].strip())
+                for location in part.split(". "):
+                    location = location.split(";")[0].strip().rstrip(".").strip()
+                    if location:
+                        locations.append(location)
+        out.append(locations)
+    return out
+
 def uniprotrecords_to_dataframe(records:List[UniProtRecord]) -> pd.DataFrame:
     """
     Reformats UniProtRecord(s) into flatten DataFrame.
+
+    Cross-references and comments of every record are grouped in a single
+    pass, and the output is built column-wise.
     """
-    out = []
-    for record in records:
-        parsed_record = {
-            # Names & Taxonomy
-            "primaryAccession": record["primaryAccession"],
-            "uniProtkbId": record["uniProtkbId"],
-            "genes": _gene_sanitize(record),
-            "organism_scientificName": record["organism"]["scientificName"],
-            "organism_commonName": record.get("organism").get("commonName"),
-            "taxonId": record["organism"]["taxonId"],
-            "proteinDescription": _protein_description_sanitize(record),
-            # Sequences
-            "sequence": record["sequence"]["value"],
-            "sequenceLength": record["sequence"]["length"],
-            "sequencemolWeight": record["sequence"]["molWeight"],
-            "sequenceVersion": record["entryAudit"]["sequenceVersion"],
-            # Function
-            # Miscellaneous
-            "annotationScore": record["annotationScore"],
-            "proteinExistence": record["proteinExistence"],
-            "uniParcId": record["extraAttributes"]["uniParcId"],
-            # Interaction
-            "Interaction": _comment_sanitize(record, "INTERACTION"),
-            "Subunit": _comment_sanitize(record, "SUBUNIT"),
-            # Gene Ontology (GO)
-            "GO": _references_sanitize(record["uniProtKBCrossReferences"], "GO"),
-            # Subcellular location
-            "SubcellularLocation": _comment_sanitize(record, "SUBCELLULAR LOCATION"),
-            # Structure
-            "PDBAccession": _references_sanitize(record["uniProtKBCrossReferences"], "PDB"),
-            # Family and domain.
-            "CDD": _references_sanitize(record["uniProtKBCrossReferences"], "CDD"),
-            "DisProt": _references_sanitize(record["uniProtKBCrossReferences"], "DisProt"),
-            "Gene3D": _references_sanitize(record["uniProtKBCrossReferences"], "Gene3D"),
-            "HAPMAP": _references_sanitize(record["uniProtKBCrossReferences"], "HAPMAP"),
-            "InterPro": _references_sanitize(record["uniProtKBCrossReferences"], "InterPro"),
-            "NCBIfam": _references_sanitize(record["uniProtKBCrossReferences"], "NCBIfam"),
-            "PANTHER": _references_sanitize(record["uniProtKBCrossReferences"], "PANTHER"),
-            "Pfam": _references_sanitize(record["uniProtKBCrossReferences"], "Pfam"),
-            "PRINTS": _references_sanitize(record["uniProtKBCrossReferences"], "PRINTS"),
-            "PROSITE": _references_sanitize(record["uniProtKBCrossReferences"], "PROSITE"),
-            "SFLD": _references_sanitize(record["uniProtKBCrossReferences"], "SFLD"),
-            "SMART": _references_sanitize(record["uniProtKBCrossReferences"], "SMART"),
-            "SUPFAM": _references_sanitize(record["uniProtKBCrossReferences"], "SUPFAM"),
-        }
-        out.append(parsed_record)
-    return pd.DataFrame(out)
+    return pd.DataFrame(_flatten_records(records), columns=UNIPROT_DATAFRAME_COLUMNS)
+
+def _flatten_records(records:List[UniProtRecord]) -> Dict[str, list]:
+    "Column-wise flattened records, see uniprotrecords_to_dataframe."
+    rows = []
+    with _gc_paused():
+        for record in records:
+            organism = record["organism"]
+            sequence = record["sequence"]
+            comments = _group_comments(record)
+            references = _group_references(record["uniProtKBCrossReferences"])
+            rows.append((
+                # Names & Taxonomy
+                record["primaryAccession"], record["uniProtkbId"], _gene_sanitize(record),
+                organism["scientificName"], organism.get("commonName"), organism["taxonId"],
+                _protein_description_sanitize(record),
+                # Sequences
+                sequence["value"], sequence["length"], sequence["molWeight"],
+                record["entryAudit"]["sequenceVersion"],
+                # Miscellaneous
+                record["annotationScore"], record["proteinExistence"],
+                record["extraAttributes"]["uniParcId"],
+                # Interaction, Gene Ontology (GO), Subcellular location, Structure
+                comments["Interaction"], comments["Subunit"], references["GO"],
+                comments["SubcellularLocation"], references["PDB"],
+                # Family and domain
+                *(references[database] for database in FAMILY_DOMAIN_DATABASES)))
+        columns = zip(*rows) if rows else [[] for _ in UNIPROT_DATAFRAME_COLUMNS]
+        return {column: list(values) for column, values in zip(UNIPROT_DATAFRAME_COLUMNS, columns)}
+
+@contextmanager
+def _gc_paused() -> Iterator[None]:
+    """
+    Pauses the cyclic garbage collector, which otherwise rescans the input
+    records over and over while millions of small lists are allocated.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+def _group_references(references:List[dict]) -> Dict[str, list]:
+    "Ids of the CROSS_REFERENCE_COLUMNS databases, grouped by database in one pass."
+    out = {database: [] for database in CROSS_REFERENCE_COLUMNS.values()}
+    for reference in references:
+        ids = out.get(reference["database"])
+        if ids is not None:
+            ids.append(reference["id"])
+    return out
+
+def _group_comments(record:UniProtRecord) -> Dict[str, Optional[list]]:
+    """
+    Values of the comment columns, in one pass over the comments. A column
+    is None when the record has no comments or one of its comments is malformed.
+    """
+    comments = record.get("comments")
+    out = {column: [] if comments is not None else None
+           for column, _ in COMMENT_COLUMNS.values()}
+    for comment in comments or []:
+        column, values = COMMENT_COLUMNS.get(comment.get("commentType"), (None, None))
+        if column is None or out[column] is None:
+            continue
+        try:
+            out[column].extend(values(comment))
+        except (KeyError, TypeError):
+            out[column] = None
+    return out
 
 def _gene_sanitize(record):
     "Sanitize genes."
@@ -125,38 +613,9 @@ def _gene_sanitize(record):
         ]
     return gene
 
-def _references_sanitize(references, database):
-    "Sanitize references."
-    out = []
-    for reference in references:
-        if reference["database"] == database:
-            out.append(reference["id"])
-    return out
-
 def _protein_description_sanitize(record):
     "Sanitize proteinDescription."
     protein_description = None
     if record["proteinDescription"].get("recommendedName"):
         protein_description = record["proteinDescription"]["recommendedName"]["fullName"]["value"]
     return protein_description
-
-def _comment_sanitize(record, comment_type):
-    "Sanitize comments."
-    out = []
-    try:
-        for comment in record["comments"]:
-            if comment_type  == "INTERACTION" and \
-                comment["commentType"] == "INTERACTION":
-                for interaction in comment["interactions"]:
-                    out.append(interaction["interactantTwo"]["uniProtKBAccession"])
-            elif comment_type  == "SUBUNIT" and \
-                comment["commentType"] == "SUBUNIT":
-                for text in comment["texts"]:
-                    out.append(text["value"])
-            elif comment_type  == "SUBCELLULAR LOCATION" and \
-                comment["commentType"] == "SUBCELLULAR LOCATION":
-                for location in comment["subcellularLocations"]:
-                    out.append(location["location"]["value"])
-    except:
-        out = None
-    return out
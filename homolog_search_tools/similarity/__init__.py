@@ -1,11 +1,40 @@
 """Sequence similarity tools."""
 
 from ._blastp import BlastP
+from ._cluster import ClusterHierarchy, ClusterResult
+from ._collapse import collapse_identical_sequences, expand_hits
+from ._database import DatabaseCache
 from ._diamond import Diamond
+from ._hit_store import read_hit_table, write_hit_table
+from ._incremental import SequenceDiff, diff_sequences, update_hit_table
 from ._mmseqs2 import MMseqs2
+from ._parameters import (
+    BlastPParameters, DiamondParameters, MMseqs2Parameters, SmithWatermanParameters
+)
+from ._searcher import MMseqs2Searcher
+from ._smith_waterman import SmithWaterman
+from ._similarity_utils import iter_tblastout, read_transform_tblastout
 
 __all__ = [
     "BlastP",
     "Diamond",
     "MMseqs2",
+    "MMseqs2Searcher",
+    "SmithWaterman",
+    "BlastPParameters",
+    "DiamondParameters",
+    "MMseqs2Parameters",
+    "SmithWatermanParameters",
+    "DatabaseCache",
+    "iter_tblastout",
+    "read_transform_tblastout",
+    "read_hit_table",
+    "write_hit_table",
+    "collapse_identical_sequences",
+    "expand_hits",
+    "SequenceDiff",
+    "diff_sequences",
+    "update_hit_table",
+    "ClusterResult",
+    "ClusterHierarchy",
 ]
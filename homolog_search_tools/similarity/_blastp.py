@@ -1,52 +1,40 @@
 """Sub-module to interact with blast-p via the command-line."""
 
-import tempfile
+from typing import Optional
 import os
-import pandas as pd
-from ..utils._utils import SequenceData, cmd_run, handle_sequence_data
-from ._similarity_utils import read_transform_tblastout
-
-class BlastP:
-    """Class to interact with blast-p."""
-
-    def __init__(self, path_to_binary="blastp"):
-        self.path_to_binary = path_to_binary
-
-    def run(self, query_sequences:SequenceData, target_sequences:SequenceData) -> pd.DataFrame:
-        """
-        Command wrapper for blast-p to cluster a database, 
-        or do an all-against-all pairwise alignment.
-
-        Parameters
-        ----------
-        - query_sequences: SEQUENCE_DATA
-        - target_sequences: SEQUENCE_DATA
-
-        Returns
-        -------
-        - :pd.DataFrame: pairwise alignment.
-
-        Reference
-        ---------
-        - https://github.com/bbuchfink/diamond/wiki
-        """
-        # Declare temp files.
-        with tempfile.TemporaryDirectory() as temp_dir:
-            output_file = os.path.join(temp_dir, "output_file")
-            query_db = handle_sequence_data(query_sequences,
-                                            os.path.join(temp_dir, "query_db"))
-            target_db = handle_sequence_data(target_sequences,
-                                            os.path.join(temp_dir, "target_db"))
-
-            # Run MMseqs2 commads.
-            cmd_run([self.path_to_binary, "-query", query_db, "-subject", target_db, "-outfmt", "6", "-out", output_file])
-
-            df = read_transform_tblastout(output_file)
-        return df
-
-    def run_allvsall(self, sequences:SequenceData) -> pd.DataFrame:
-        """
-        Equivalent to BlastP.run where the query and target are the same dataset.
-        BlastP.run(query_sequences=sequences, target_sequences=sequences).
-        """
-        return self.run(sequences, sequences)
+from ..utils._process import CommandLimits
+from ..utils._utils import cmd_run
+from ._database import DatabaseCache
+from ._parameters import BlastPParameters
+from ._wrapper import SimilarityWrapper
+
+class BlastP(SimilarityWrapper):
+    """
+    Class to interact with blast-p.
+
+    Targets are searched as BLAST databases built with makeblastdb, either
+    per run in a temp dir or once per target set with a DatabaseCache.
+
+    Reference
+    ---------
+    - https://www.ncbi.nlm.nih.gov/books/NBK279690/
+    """
+    engine = "blastp"
+
+    def __init__(self, path_to_binary="blastp", path_to_makeblastdb="makeblastdb",
+                 params:Optional[BlastPParameters]=None,
+                 database_cache:Optional[DatabaseCache]=None,
+                 limits:Optional[CommandLimits]=None):
+        super().__init__(path_to_binary, database_cache, limits)
+        self.path_to_makeblastdb = path_to_makeblastdb
+        self.params = params if params is not None else BlastPParameters()
+
+    def _build_database(self, fasta:os.PathLike, prefix:str) -> None:
+        cmd_run([self.path_to_makeblastdb, "-in", fasta, "-dbtype", "prot", "-out", prefix],
+                **self.limits.kwargs())
+
+    def _search(self, query_fasta:os.PathLike, target:str, output_file:str,
+                temp_dir:os.PathLike) -> None:
+        cmd_run([self.path_to_binary, "-query", query_fasta, "-db", target,
+                 *self.params.outfmt_args(), "-out", output_file, *self.params.search_args()],
+                **self.limits.kwargs())
@@ -0,0 +1,73 @@
+"""Manifest of completed stages for resumable search jobs."""
+
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Callable, List, Optional
+
+class JobManifest:
+    """
+    Records which stages of a job completed, keyed by a hash of their inputs,
+    in <work_dir>/manifest.json.
+
+    A stage is skipped on restart when the manifest holds the same input key
+    for it and its outputs still exist. Without a work_dir the manifest is
+    disabled and every stage runs.
+    """
+    filename = "manifest.json"
+
+    def __init__(self, work_dir:Optional[os.PathLike]=None) -> None:
+        self.path = os.path.join(work_dir, self.filename) if work_dir is not None else None
+        self.stages = {}
+        self._lock = threading.Lock()
+        if self.path is not None and os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.stages = json.load(f).get("stages", {})
+
+    @property
+    def enabled(self) -> bool:
+        "Whether stages are recorded."
+        return self.path is not None
+
+    @staticmethod
+    def key(*parts) -> str:
+        "Input key of a stage, the sha256 of its parts."
+        return hashlib.sha256("\0".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+
+    def is_complete(self, name:str, key:str, outputs:List[str]) -> bool:
+        """
+        Whether stage `name` completed with input key `key` and all of its
+        outputs exist. Outputs are path prefixes, as for sequence databases
+        made of several files.
+        """
+        stage = self.stages.get(name)
+        return (self.enabled and stage is not None and stage["key"] == key and
+                all(glob.glob(f"{glob.escape(output)}*") for output in outputs))
+
+    def run_stage(self, name:str, key:str, outputs:List[str], func:Callable[[], None]) -> bool:
+        """
+        Runs func unless stage `name` already completed with the same key.
+
+        Returns
+        -------
+        - :bool: whether func ran.
+        """
+        if self.is_complete(name, key, outputs):
+            return False
+        func()
+        self.complete(name, key, outputs)
+        return True
+
+    def complete(self, name:str, key:str, outputs:List[str]) -> None:
+        "Records stage `name` as completed."
+        if not self.enabled:
+            return
+        with self._lock:
+            self.stages[name] = {"key": key, "outputs": outputs, "completed_at": time.time()}
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"stages": self.stages}, f, indent=1)
+            os.replace(temp_path, self.path)
@@ -0,0 +1,331 @@
+"""Compact, array-backed sequence clustering results."""
+
+import os
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional, Union
+import numpy as np
+import pandas as pd
+from ._collapse import expand_hits
+
+CLUSTER_COLUMNS = ["Representative", "Member"]
+_ARRAYS = ["accessions", "representatives"]
+
+def _fixed_width(buffer:np.ndarray, starts:np.ndarray, ends:np.ndarray) -> np.ndarray:
+    "Byte ranges [starts, ends) of a uint8 buffer gathered into a fixed-width S array."
+    lengths = ends - starts
+    width = max(int(lengths.max()), 1)
+    columns = np.arange(width)
+    gathered = buffer[np.minimum(starts[:, None] + columns, len(buffer) - 1)]
+    gathered[columns >= lengths[:, None]] = 0
+    return gathered.view(f"S{width}").ravel()
+
+def _split_tsv(block:bytes):
+    "Representative and member columns of complete two-column TSV lines."
+    buffer = np.frombuffer(block, dtype=np.uint8)
+    ends = np.flatnonzero(buffer == ord("\n"))
+    starts = np.r_[0, ends[:-1] + 1]
+    ends = ends - (buffer[np.maximum(ends - 1, 0)] == ord("\r"))
+    is_line = ends > starts
+    starts, ends = starts[is_line], ends[is_line]
+    tabs = np.flatnonzero(buffer == ord("\t"))
+    if len(tabs) != len(starts) or ((tabs < starts) | (tabs >= ends)).any():
+        raise ValueError("Invalid cluster TSV: expected representative and member columns.")
+    return _fixed_width(buffer, starts, tabs), _fixed_width(buffer, tabs + 1, ends)
+
+def _iter_tsv_blocks(path:Union[os.PathLike, str], block_size:int):
+    "Columns of a TSV file, parsed in blocks cut at the last newline."
+    pending = b""
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            cut = block.rfind(b"\n")
+            if cut == -1:
+                pending += block
+                continue
+            text, pending = pending + block[:cut + 1], block[cut + 1:]
+            columns = _split_tsv(text)
+            if len(columns[0]):
+                yield columns
+    if pending.strip():
+        columns = _split_tsv(pending + b"\n")
+        if len(columns[0]):
+            yield columns
+
+class ClusterResult(Mapping):
+    """
+    Member to representative mapping of a clustering, backed by NumPy arrays.
+
+    Every sequence has an integer id, its position in `accessions`, an
+    interned table of fixed-width UTF-8 accessions. `representatives[id]`
+    is the id of the representative of its cluster, so member lookups by
+    id are O(1) array accesses. Clusters are also indexed as CSR offsets
+    into the member ids sorted by cluster, built on first use.
+
+    The object is a read-only Mapping of member accession to representative
+    accession, in place of the previous dict.
+    """
+
+    def __init__(self, accessions:np.ndarray, representatives:np.ndarray) -> None:
+        """
+        Parameters
+        ----------
+        - accessions: np.ndarray: bytes (S) accession of every id.
+        - representatives: np.ndarray: representative id of every id.
+        """
+        if len(accessions) != len(representatives):
+            raise ValueError("Invalid representatives value.")
+        self.accessions = accessions
+        self.representatives = representatives
+        self._index: Optional[pd.Index] = None
+        self._clusters: Optional[np.ndarray] = None
+        self._offsets: Optional[np.ndarray] = None
+        self._members: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_tsv(cls, path:Union[os.PathLike, str], block_size:int=1 << 24) -> "ClusterResult":
+        """
+        Parses the <prefix>_cluster.tsv (representative, member) file of
+        MMseqs2 easy-cluster and easy-linclust in blocks of bytes, with
+        vectorized tab and newline searches: accessions go straight from
+        the file to the fixed-width table without being decoded.
+
+        MMseqs2 writes every cluster as a block of lines starting with the
+        representative as its own member, so member ids are line numbers
+        and each block resolves its representative id from its first line,
+        without a hash table of all the accessions. Representatives found
+        elsewhere are resolved at the end.
+
+        Parameters
+        ----------
+        - path: path to the cluster TSV file.
+        - block_size: int: bytes parsed at a time. Default: 16 MiB.
+
+        Returns
+        -------
+        - :ClusterResult
+        """
+        names, representatives = [], []
+        unresolved_rows, unresolved_names = [], []
+        n_rows, last_name, last_id = 0, None, -1
+        for rep, member in _iter_tsv_blocks(path, block_size):
+            starts = np.flatnonzero(np.r_[True, rep[1:] != rep[:-1]])
+            block_ids = np.where(member[starts] == rep[starts], n_rows + starts, -1)
+            if rep[0] == last_name:
+                # The first block continues the last block of the previous chunk.
+                block_ids[0] = last_id
+            ids = np.repeat(block_ids, np.diff(np.r_[starts, len(rep)]))
+            missing = np.flatnonzero(ids == -1)
+            unresolved_rows.append(n_rows + missing)
+            unresolved_names.append(rep[missing])
+
+            names.append(member)
+            representatives.append(ids)
+            n_rows += len(rep)
+            last_name, last_id = rep[-1], ids[-1]
+
+        if not names:
+            return cls(np.array([], dtype="S1"), np.array([], dtype=np.int32))
+        accessions = np.concatenate(names)
+        id_dtype = np.int32 if n_rows < 2**31 else np.int64
+        representatives = np.concatenate(representatives).astype(id_dtype)
+        rows = np.concatenate(unresolved_rows)
+        if len(rows):
+            found = pd.Index(accessions).get_indexer(np.concatenate(unresolved_names))
+            if (found == -1).any():
+                raise ValueError("Cluster representatives missing from the members.")
+            representatives[rows] = found
+        return cls(accessions, representatives)
+
+    @classmethod
+    def from_mapping(cls, mapping:Mapping) -> "ClusterResult":
+        "ClusterResult of a member to representative mapping."
+        members = list(mapping)
+        accessions = np.char.encode(np.array(members, dtype=str), "utf-8") if members else \
+            np.array([], dtype="S1")
+        found = pd.Index(members).get_indexer(list(mapping.values()))
+        if (found == -1).any():
+            raise ValueError("Cluster representatives missing from the members.")
+        return cls(accessions, found.astype(np.int32))
+
+    # Mapping interface: member accession -> representative accession.
+    def __getitem__(self, accession:str) -> str:
+        return self.name(self.representatives[self.id_of(accession)])
+
+    def __iter__(self) -> Iterator[str]:
+        return (name.decode("utf-8") for name in self.accessions.tolist())
+
+    def __len__(self) -> int:
+        return len(self.accessions)
+
+    def __contains__(self, accession:object) -> bool:
+        return isinstance(accession, str) and self._accession_index().get_indexer(
+            [accession.encode("utf-8")])[0] != -1
+
+    def _accession_index(self) -> pd.Index:
+        "Hash index of the accessions, built on first lookup by accession."
+        if self._index is None:
+            self._index = pd.Index(self.accessions)
+        return self._index
+
+    def id_of(self, accession:str) -> int:
+        """
+        Integer id of an accession.
+
+        Raises
+        ------
+        - KeyError: unknown accession.
+        """
+        position = self._accession_index().get_indexer([accession.encode("utf-8")])[0]
+        if position == -1:
+            raise KeyError(accession)
+        return int(position)
+
+    def name(self, sequence_id:int) -> str:
+        "Accession of an integer id."
+        return self.accessions[sequence_id].decode("utf-8")
+
+    def _csr(self):
+        """
+        CSR index of the clusters, built on first use: representative ids
+        (sorted), offsets into the member ids, and member ids sorted by
+        representative.
+        """
+        if self._members is None:
+            members = np.argsort(self.representatives, kind="stable")
+            sorted_representatives = self.representatives[members]
+            starts = np.flatnonzero(np.r_[True, sorted_representatives[1:] !=
+                                          sorted_representatives[:-1]])[:len(members)]
+            self._clusters = sorted_representatives[starts]
+            self._offsets = np.r_[starts, len(members)].astype(np.int64)
+            self._members = members.astype(self.representatives.dtype)
+        return self._clusters, self._offsets, self._members
+
+    @property
+    def clusters(self) -> np.ndarray:
+        "Representative ids, sorted."
+        return self._csr()[0]
+
+    @property
+    def n_clusters(self) -> int:
+        return len(self.clusters)
+
+    def sizes(self) -> pd.Series:
+        "Number of members by representative accession, largest first."
+        clusters, offsets, _ = self._csr()
+        return pd.Series(np.diff(offsets), index=[self.name(i) for i in clusters.tolist()],
+                         name="Size").sort_values(ascending=False, kind="stable")
+
+    def member_ids(self, accession:str) -> np.ndarray:
+        "Ids of the members of the cluster of an accession (member or representative)."
+        clusters, offsets, members = self._csr()
+        k = np.searchsorted(clusters, self.representatives[self.id_of(accession)])
+        return members[offsets[k]: offsets[k + 1]]
+
+    def members(self, accession:str) -> List[str]:
+        "Accessions of the members of the cluster of an accession."
+        return [self.name(i) for i in self.member_ids(accession).tolist()]
+
+    def to_dataframe(self) -> pd.DataFrame:
+        "Representative and Member accessions, in id order."
+        accessions = pd.Series(self.accessions).str.decode("utf-8")
+        return pd.DataFrame({"Representative": accessions.to_numpy()[self.representatives],
+                             "Member": accessions.to_numpy()}, columns=CLUSTER_COLUMNS)
+
+    def compose(self, upper:"ClusterResult") -> "ClusterResult":
+        """
+        Clustering of the same members mapped to the representatives of
+        `upper`, a clustering of this result's representatives, e.g. the
+        next level of a cascaded clustering.
+
+        Raises
+        ------
+        - ValueError: representatives missing from upper.
+        """
+        clusters, inverse = np.unique(self.representatives, return_inverse=True)
+        names = self.accessions[clusters]
+        found = pd.Index(upper.accessions).get_indexer(names)
+        if (found == -1).any():
+            raise ValueError("Representatives missing from the upper clustering.")
+        upper_names = upper.accessions[upper.representatives[found]]
+        # Upper representatives are representatives of this level too.
+        upper_ids = clusters[pd.Index(names).get_indexer(upper_names)]
+        return ClusterResult(self.accessions, upper_ids[inverse].astype(self.representatives.dtype))
+
+    def save(self, path:Union[os.PathLike, str]) -> str:
+        """
+        Saves the arrays to a .npz file, or to a directory of .npy files
+        that load() can memory-map.
+
+        Returns
+        -------
+        - :str: path
+        """
+        path = os.fspath(path)
+        if path.endswith(".npz"):
+            np.savez(path, accessions=self.accessions, representatives=self.representatives)
+            return path
+        os.makedirs(path, exist_ok=True)
+        for name in _ARRAYS:
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+        return path
+
+    @classmethod
+    def load(cls, path:Union[os.PathLike, str], mmap_mode:Optional[str]="r") -> "ClusterResult":
+        """
+        Loads a ClusterResult written by save.
+
+        Parameters
+        ----------
+        - path: path to a .npz file or a directory of .npy files.
+        - mmap_mode: str: memory-map mode of .npy arrays, None to read
+            them in memory. Default: "r".
+        """
+        path = os.fspath(path)
+        if path.endswith(".npz"):
+            with np.load(path) as arrays:
+                return cls(arrays["accessions"], arrays["representatives"])
+        return cls(*(np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+                     for name in _ARRAYS))
+
+@dataclass
+class ClusterHierarchy:
+    """
+    Levels of a cascaded clustering, each clustering the representatives
+    of the previous one.
+
+    Parameters
+    ----------
+    - levels: list of ClusterResult: first level over all the sequences.
+    - identities: list of float: minimum sequence identity of every level.
+    """
+    levels: List[ClusterResult] = field(default_factory=list)
+    identities: List[float] = field(default_factory=list)
+
+    def flatten(self, level:int=-1) -> ClusterResult:
+        """
+        Every sequence mapped to its representative at `level`.
+
+        Parameters
+        ----------
+        - level: int: index of the level. Default: -1, the last one.
+        """
+        if not self.levels:
+            raise ValueError("Empty cluster hierarchy.")
+        levels = self.levels[:len(self.levels) + level + 1 if level < 0 else level + 1]
+        result = levels[0]
+        for upper in levels[1:]:
+            result = result.compose(upper)
+        return result
+
+    def representatives(self, level:int=-1) -> List[str]:
+        "Accessions of the representatives at `level`."
+        result = self.flatten(level)
+        return [result.name(i) for i in result.clusters.tolist()]
+
+    def project(self, hits:pd.DataFrame, level:int=-1) -> pd.DataFrame:
+        """
+        Expands hits between the representatives at `level` to hits between
+        all the members of their clusters, see expand_hits. The number of
+        hits grows with the product of the cluster sizes.
+        """
+        return expand_hits(hits, self.flatten(level).to_dataframe())
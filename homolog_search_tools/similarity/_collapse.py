@@ -0,0 +1,140 @@
+"""Collapsing of identical sequences before alignment and expansion of their hits."""
+
+import os
+from typing import Optional, Tuple, Union
+import numpy as np
+import pandas as pd
+from ..utils._fasta import iter_fasta
+from ..utils._utils import SequenceData
+from ._similarity_utils import (
+    TBLAST_DTYPES, _alphabetized_accession_columns, _tblastout_columns
+)
+
+MEMBER_COLUMNS = ["Representative", "Member"]
+
+def _accessions(headers:pd.Series) -> pd.Series:
+    "Accession reported by the aligners for a header: its first word."
+    return headers.astype(str).str.split(n=1).str[0]
+
+def _sequence_frame(sequences:SequenceData, header_col:str="Header",
+                    sequence_col:str="Sequence") -> pd.DataFrame:
+    "DataFrame of SEQUENCE_DATA, reading FASTA files."
+    if isinstance(sequences, pd.DataFrame):
+        return sequences
+    records = list(iter_fasta(sequences))
+    return pd.DataFrame({header_col: [header for header, _ in records],
+                         sequence_col: [sequence for _, sequence in records]})
+
+def collapse_identical_sequences(sequences:SequenceData, header_col:str="Header",
+                                 sequence_col:str="Sequence") -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Keeps one representative per distinct sequence.
+
+    Sequences are grouped with a single hash-based pd.factorize pass over the
+    sequence column, which compares the full strings, so distinct sequences
+    are never merged by a hash collision. The representative of a group is
+    its first sequence.
+
+    Parameters
+    ----------
+    - sequences: SEQUENCE_DATA: DataFrame or path to a FASTA file.
+    - header_col: str: header column. Default: "Header".
+    - sequence_col: str: sequence column. Default: "Sequence".
+
+    Returns
+    -------
+    - :tuple of pd.DataFrame: (representatives, members). Representatives
+        keep the input columns; members maps the accession of every input
+        sequence (Member) to the accession of its Representative.
+    """
+    sequences = _sequence_frame(sequences, header_col, sequence_col)
+    codes, _ = pd.factorize(sequences[sequence_col], use_na_sentinel=False)
+    first = np.unique(codes, return_index=True)[1]
+    representatives = sequences.iloc[np.sort(first)]
+
+    accessions = _accessions(sequences[header_col]).to_numpy()
+    members = pd.DataFrame({"Representative": accessions[first[codes]],
+                            "Member": accessions})
+    return representatives, members
+
+def _collapse_search_inputs(query_sequences:SequenceData, target_sequences:SequenceData
+                            ) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame, int]:
+    """
+    collapse_identical_sequences of the queries and targets of a search, the
+    targets collapsed once when they are the queries.
+
+    Returns
+    -------
+    - :tuple: (query representatives, query members, target representatives,
+        target members, residues of the uncollapsed targets). The latter is
+        the database size E-values are computed against without collapsing.
+    """
+    allvsall = target_sequences is query_sequences
+    target_sequences = _sequence_frame(target_sequences)
+    database_length = int(target_sequences["Sequence"].str.len().sum())
+    targets, target_members = collapse_identical_sequences(target_sequences)
+    if allvsall:
+        return targets, target_members, targets, target_members, database_length
+    queries, query_members = collapse_identical_sequences(query_sequences)
+    return queries, query_members, targets, target_members, database_length
+
+def expand_hits(hits:pd.DataFrame, query_members:pd.DataFrame,
+                target_members:Optional[pd.DataFrame]=None) -> pd.DataFrame:
+    """
+    Expands hits between representatives to hits between all the members
+    of their groups. Hits keep their order; every hit is repeated for each
+    pair of members.
+
+    Parameters
+    ----------
+    - hits: pd.DataFrame: hits with Query_Accession and Target_Accession
+        columns, as in tabular output, or Accession_1 and Accession_2
+        columns, as in the output of a similarity wrapper.
+    - query_members: pd.DataFrame: members of the query representatives,
+        from collapse_identical_sequences.
+    - target_members: pd.DataFrame: members of the target representatives.
+        Default: query_members, as for all-vs-all searches.
+
+    Returns
+    -------
+    - :pd.DataFrame: expanded hits, Accession_1 and Accession_2 realphabetized.
+    """
+    target_members = target_members if target_members is not None else query_members
+    if "Query_Accession" in hits.columns:
+        sides = [("Query_Accession", query_members), ("Target_Accession", target_members)]
+    else:
+        # Alphabetized pairs do not tell the query from the target.
+        members = pd.concat([query_members, target_members]).drop_duplicates("Member")
+        sides = [("Accession_1", members), ("Accession_2", members)]
+
+    columns = hits.columns
+    hits = hits.reset_index(drop=True)
+    for key, members in sides:
+        mapping = members[MEMBER_COLUMNS].rename(columns={"Representative": key,
+                                                          "Member": "_Member"})
+        mapping[key] = mapping[key].astype(object)
+        hits = hits.assign(**{key: hits[key].astype(object)}).merge(mapping, on=key, how="left",
+                                                                    sort=False)
+        # Accessions without members, e.g. from another run, are kept as is.
+        hits[key] = hits["_Member"].where(hits["_Member"].notna(), hits[key])
+        hits = hits.drop(columns="_Member")
+
+    if "Accession_1" in columns:
+        first, second = ("Query_Accession", "Target_Accession") if "Query_Accession" in columns \
+            else ("Accession_1", "Accession_2")
+        hits["Accession_1"], hits["Accession_2"] = _alphabetized_accession_columns(
+            hits[first], hits[second])
+    return hits[columns].reset_index(drop=True)
+
+def expand_tblastout(path:Union[os.PathLike, str], output:Union[os.PathLike, str],
+                     query_members:pd.DataFrame, target_members:Optional[pd.DataFrame]=None,
+                     sep:str="\t", chunksize:int=1_000_000) -> None:
+    "Streams expand_hits over a tabular (outfmt 6) file, writing the expanded file to output."
+    with open(output, "w", encoding="utf-8") as out:
+        if os.path.getsize(path) == 0:
+            return
+        columns = _tblastout_columns(path, sep)
+        for chunk in pd.read_csv(path, sep=sep, names=columns, dtype=TBLAST_DTYPES,
+                                 header=None, chunksize=chunksize):
+            expand_hits(chunk, query_members, target_members).to_csv(
+                out, sep=sep, header=False, index=False)
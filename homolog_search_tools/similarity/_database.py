@@ -0,0 +1,212 @@
+"""Persistent cache of target databases shared across runs and processes."""
+
+import fcntl
+import hashlib
+import os
+import shutil
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional, Tuple, Union
+
+DATABASE_PREFIX = "db"
+_COMPLETE_MARKER = "COMPLETE"
+
+def _default_cache_dir() -> str:
+    "Cache directory from $HOMOLOG_SEARCH_TOOLS_CACHE, or ~/.cache/homolog_search_tools."
+    root = os.environ.get("HOMOLOG_SEARCH_TOOLS_CACHE",
+                          os.path.join(os.path.expanduser("~"), ".cache", "homolog_search_tools"))
+    return os.path.join(root, "databases")
+
+def file_digest(path:Union[os.PathLike, str], block_size:int=1 << 20) -> str:
+    "sha256 hex digest of a file's content."
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _directory_size(path:str) -> int:
+    "Total size in bytes of the files under path."
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                size += os.path.getsize(os.path.join(root, name))
+            except FileNotFoundError:
+                pass
+    return size
+
+@contextmanager
+def _file_lock(path:str, shared:bool=False) -> Iterator[None]:
+    "Exclusive (or shared) inter-process lock held on `path` for the duration of the context."
+    with open(path, "a+", encoding="utf-8") as lock:
+        fcntl.flock(lock, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+@contextmanager
+def _try_file_lock(path:str) -> Iterator[bool]:
+    "Exclusive lock on `path` if no one else holds a lock on it, yields whether it was taken."
+    with open(path, "a+", encoding="utf-8") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+class DatabaseCache:
+    """
+    Content-addressed cache of target databases (makeblastdb, diamond makedb,
+    mmseqs createdb/createindex).
+
+    Databases are keyed by the sha256 of the input FASTA together with the
+    engine and build options, built once, and reused by any run or process
+    pointing at the same cache directory. The least recently used databases
+    are evicted once the cache exceeds `max_size` bytes, except those being
+    searched: databases obtained with `use` are locked against eviction until
+    the context exits, those returned by `get_or_build` are not.
+    """
+
+    def __init__(self, cache_dir:Optional[os.PathLike]=None, max_size:Optional[int]=None) -> None:
+        """
+        Parameters
+        ----------
+        - cache_dir: path: cache directory. Default: $HOMOLOG_SEARCH_TOOLS_CACHE/databases
+            or ~/.cache/homolog_search_tools/databases.
+        - max_size: int: maximum cache size in bytes. Default: None, unbounded.
+        """
+        self.cache_dir = os.fspath(cache_dir) if cache_dir is not None else _default_cache_dir()
+        self.max_size = max_size
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, engine:str, fasta:Union[os.PathLike, str], options:str="") -> str:
+        "Cache key of the database built by `engine` from `fasta` with `options`."
+        digest = hashlib.sha256()
+        digest.update(f"{engine}\0{options}\0".encode("utf-8"))
+        digest.update(file_digest(fasta).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get_or_build(self, engine:str, fasta:Union[os.PathLike, str],
+                     build:Callable[[str], None], options:str="") -> str:
+        """
+        Returns the database prefix for `fasta`, building it on a cache miss.
+        The database may be evicted by another run as soon as it is returned,
+        use `use` to search it.
+
+        Parameters
+        ----------
+        - engine: str: engine name, part of the cache key.
+        - fasta: path: FASTA file the database is built from.
+        - build: Callable: builds the database given an output prefix.
+        - options: str: build options, part of the cache key.
+
+        Returns
+        -------
+        - :str: database prefix to pass to the search command.
+        """
+        return self._get_or_build(self._entry(engine, fasta, options), build)
+
+    @contextmanager
+    def use(self, engine:str, fasta:Union[os.PathLike, str],
+            build:Callable[[str], None], options:str="") -> Iterator[str]:
+        """
+        get_or_build as a context during which the database is not evicted,
+        by this or any other process. Takes the same parameters.
+
+        Yields
+        ------
+        - :str: database prefix to pass to the search command.
+        """
+        entry = self._entry(engine, fasta, options)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        with _file_lock(f"{entry}.use", shared=True):
+            yield self._get_or_build(entry, build)
+
+    def _entry(self, engine:str, fasta:Union[os.PathLike, str], options:str) -> str:
+        "Directory of the database built by `engine` from `fasta` with `options`."
+        return os.path.join(self.cache_dir, engine, self.key(engine, fasta, options))
+
+    def _get_or_build(self, entry:str, build:Callable[[str], None]) -> str:
+        "Database prefix of entry, built on a cache miss."
+        prefix = os.path.join(entry, DATABASE_PREFIX)
+        marker = os.path.join(entry, _COMPLETE_MARKER)
+        if os.path.exists(marker):
+            os.utime(marker)
+            return prefix
+
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        with _file_lock(f"{entry}.lock"):
+            # Another process may have built it while we waited for the lock.
+            if not os.path.exists(marker):
+                staging = f"{entry}.tmp-{os.getpid()}"
+                shutil.rmtree(staging, ignore_errors=True)
+                os.makedirs(staging)
+                try:
+                    build(os.path.join(staging, DATABASE_PREFIX))
+                    with open(os.path.join(staging, _COMPLETE_MARKER), "w", encoding="utf-8"):
+                        pass
+                    shutil.rmtree(entry, ignore_errors=True)
+                    os.rename(staging, entry)
+                finally:
+                    shutil.rmtree(staging, ignore_errors=True)
+        os.utime(marker)
+        self.evict(keep=entry)
+        return prefix
+
+    def entries(self) -> List[Tuple[str, float, int]]:
+        "Cached databases as (path, last access time, size in bytes), oldest first."
+        out = []
+        for engine in sorted(os.listdir(self.cache_dir)):
+            engine_dir = os.path.join(self.cache_dir, engine)
+            if not os.path.isdir(engine_dir):
+                continue
+            for name in os.listdir(engine_dir):
+                entry = os.path.join(engine_dir, name)
+                marker = os.path.join(entry, _COMPLETE_MARKER)
+                if os.path.isdir(entry) and os.path.exists(marker):
+                    out.append((entry, os.path.getmtime(marker), _directory_size(entry)))
+        return sorted(out, key=lambda x: x[1])
+
+    def size(self) -> int:
+        "Total size of the cached databases in bytes."
+        return sum(size for _, _, size in self.entries())
+
+    def evict(self, keep:Optional[str]=None) -> None:
+        """
+        Removes least recently used databases until the cache fits in
+        max_size. Databases in use are skipped, so the cache may stay above
+        max_size while they are searched.
+        """
+        if self.max_size is None:
+            return
+        with _file_lock(os.path.join(self.cache_dir, ".evict.lock")):
+            entries = self.entries()
+            total = sum(size for _, _, size in entries)
+            for entry, _, size in entries:
+                if total <= self.max_size:
+                    break
+                if entry == keep or not self._remove(entry):
+                    continue
+                total -= size
+
+    def clear(self) -> None:
+        "Removes every cached database not in use."
+        for entry, _, _ in self.entries():
+            self._remove(entry)
+
+    @staticmethod
+    def _remove(entry:str) -> bool:
+        "Removes entry unless it is in use, returns whether it was removed."
+        with _try_file_lock(f"{entry}.use") as unused:
+            if unused:
+                with _file_lock(f"{entry}.lock"):
+                    shutil.rmtree(entry, ignore_errors=True)
+            return unused
+
+    def __repr__(self) -> str:
+        return f"DatabaseCache(cache_dir={self.cache_dir!r}, max_size={self.max_size!r})"
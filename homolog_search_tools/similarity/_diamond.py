@@ -1,52 +1,42 @@
 """Sub-module to interact with DIAMOND via the command-line."""
 
-import tempfile
+from typing import Optional
 import os
-import pandas as pd
-from ..utils._utils import SequenceData, cmd_run, handle_sequence_data
-from ._similarity_utils import read_transform_tblastout
-
-class Diamond:
-    """Class to interact with DIAMOND."""
-
-    def __init__(self, path_to_binary="diamond"):
-        self.path_to_binary = path_to_binary
-
-    def run(self, query_sequences:SequenceData, target_sequences:SequenceData) -> pd.DataFrame:
-        """
-        Command wrapper for Diamond to cluster a database, 
-        or do an all-against-all pairwise alignment.
-
-        Parameters
-        ----------
-        - query_sequences: SEQUENCE_DATA
-        - target_sequences: SEQUENCE_DATA
-
-        Returns
-        -------
-        - :pd.DataFrame: pairwise alignment.
-
-        Reference
-        ---------
-        - https://github.com/bbuchfink/diamond/wiki
-        """
-        # Declare temp files.
-        with tempfile.TemporaryDirectory() as temp_dir:
-            output_file = os.path.join(temp_dir, "output_file")
-            query_db = handle_sequence_data(query_sequences,
-                                            os.path.join(temp_dir, "query_db"))
-            target_db = handle_sequence_data(target_sequences,
-                                            os.path.join(temp_dir, "target_db"))
-
-            # Run MMseqs2 commads.
-            cmd_run([self.path_to_binary, "blastp", "--query", query_db, "--db", target_db, "--out", output_file])
-
-            df = read_transform_tblastout(output_file)
-        return df
-
-    def run_allvsall(self, sequences:SequenceData) -> pd.DataFrame:
-        """
-        Equivalent to Diamond.run where the query and target are the same dataset.
-        Diamond.run(query_sequences=sequences, target_sequences=sequences).
-        """
-        return self.run(sequences, sequences)
+from ..utils._process import CommandLimits
+from ..utils._utils import cmd_run
+from ._database import DatabaseCache
+from ._parameters import DiamondParameters, _drop_flag
+from ._wrapper import SimilarityWrapper
+
+class Diamond(SimilarityWrapper):
+    """
+    Class to interact with DIAMOND.
+
+    Without a DatabaseCache the target FASTA is passed to --db directly,
+    with one the target is built once with diamond makedb.
+
+    Reference
+    ---------
+    - https://github.com/bbuchfink/diamond/wiki
+    """
+    engine = "diamond"
+    searches_fasta = True
+
+    def __init__(self, path_to_binary="diamond", params:Optional[DiamondParameters]=None,
+                 database_cache:Optional[DatabaseCache]=None,
+                 limits:Optional[CommandLimits]=None):
+        super().__init__(path_to_binary, database_cache, limits)
+        self.params = params if params is not None else DiamondParameters()
+
+    def _build_database(self, fasta:os.PathLike, prefix:str) -> None:
+        cmd_run([self.path_to_binary, "makedb", "--in", fasta, "--db", prefix,
+                 *self.params.makedb_args()], **self.limits.kwargs())
+
+    def _database_options(self) -> str:
+        return " ".join(_drop_flag(self.params.makedb_args(), "--threads"))
+
+    def _search(self, query_fasta:os.PathLike, target:str, output_file:str,
+                temp_dir:os.PathLike) -> None:
+        cmd_run([self.path_to_binary, "blastp", "--query", query_fasta, "--db", target,
+                 "--out", output_file, *self.params.outfmt_args(), *self.params.search_args()],
+                **self.limits.kwargs())
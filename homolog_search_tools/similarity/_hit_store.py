@@ -0,0 +1,190 @@
+"""Columnar (Parquet / Arrow IPC) storage for hit tables."""
+
+import glob
+import os
+import shutil
+from typing import Iterable, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+from ._similarity_utils import FINAL_COLUMNS, iter_tblastout, read_transform_tblastout
+
+HitTableFormats = ["parquet", "arrow"]
+
+# E_Value stays float64: float32 underflows to zero below ~1E-38.
+HIT_TABLE_DTYPES = {
+    "Percent_Identity": np.float32,
+    "Alignment_Length": np.int32,
+    "Mismatches": np.int32,
+    "Gap_Openings": np.int32,
+    "Query_Start": np.int32,
+    "Query_End": np.int32,
+    "Target_Start": np.int32,
+    "Target_End": np.int32,
+    "E_Value": np.float64,
+    "Bit_Score": np.float32,
+    "Log_E_Value": np.float32,
+    "Query_Length": np.int32,
+    "Target_Length": np.int32,
+    "Query_Coverage": np.float32,
+    "Target_Coverage": np.float32,
+}
+
+_EXTENSIONS = {"parquet": "parquet", "arrow": "arrow"}
+
+def _import_pyarrow():
+    "Imports pyarrow, which is only required for columnar hit tables."
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError(
+            "pyarrow is required to read and write Parquet/Arrow hit tables: "
+            "pip install pyarrow") from e
+    return pyarrow
+
+def _hit_table_schema(pa, columns:List[str]):
+    "Arrow schema with dictionary-encoded accessions and compact numeric types."
+    fields = []
+    for column in columns:
+        if column.startswith("Accession_"):
+            fields.append(pa.field(column, pa.dictionary(pa.int32(), pa.string())))
+        else:
+            fields.append(pa.field(column, pa.from_numpy_dtype(
+                np.dtype(HIT_TABLE_DTYPES.get(column, np.float32)))))
+    return pa.schema(fields)
+
+def _compact_hit_table(df:pd.DataFrame) -> pd.DataFrame:
+    "Casts a hit table chunk to the storage dtypes."
+    dtypes = {column: dtype for column, dtype in HIT_TABLE_DTYPES.items() if column in df}
+    df = df.astype(dtypes)
+    for column in ("Accession_1", "Accession_2"):
+        if not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype("category")
+    return df
+
+def _partition_paths(path:Union[os.PathLike, str]) -> List[str]:
+    "Sorted partition files of a hit table directory."
+    paths = sorted(glob.glob(os.path.join(path, "part-*.parquet")) +
+                   glob.glob(os.path.join(path, "part-*.arrow")))
+    if not paths:
+        raise FileNotFoundError(f"No hit table partitions found in {path}.")
+    return paths
+
+def write_hit_table(chunks:Union[pd.DataFrame, Iterable[pd.DataFrame]],
+                    path:Union[os.PathLike, str], output_format:str="parquet",
+                    overwrite:bool=False) -> str:
+    """
+    Writes hit table chunks to a partitioned Parquet or Arrow IPC directory,
+    one partition file per chunk.
+
+    Accessions are dictionary-encoded, coordinates are stored as int32 and
+    scores as float32 (E_Value is kept as float64 to preserve small E-values).
+
+    Parameters
+    ----------
+    - chunks: pd.DataFrame | iterable of pd.DataFrame: read_transform_tblastout output.
+    - path: path to output directory.
+    - output_format: str: "parquet" or "arrow". Default: "parquet".
+    - overwrite: bool: replace an existing hit table at path. Default: False.
+
+    Returns
+    -------
+    - :str: path to the hit table directory.
+    """
+    if output_format not in HitTableFormats:
+        raise ValueError("Invalid output_format value.")
+    pa = _import_pyarrow()
+
+    path = os.fspath(path)
+    if os.path.exists(path) and os.listdir(path):
+        if not overwrite:
+            raise FileExistsError(f"{path} already exists, use overwrite=True to replace it.")
+        shutil.rmtree(path)
+    os.makedirs(path, exist_ok=True)
+
+    if isinstance(chunks, pd.DataFrame):
+        chunks = [chunks]
+
+    n_partitions = 0
+    for chunk in chunks:
+        _write_partition(pa, _compact_hit_table(chunk), path, n_partitions, output_format)
+        n_partitions += 1
+    if n_partitions == 0:
+        empty = pd.DataFrame({column: [] for column in FINAL_COLUMNS})
+        _write_partition(pa, _compact_hit_table(empty), path, 0, output_format)
+    return path
+
+def _write_partition(pa, df:pd.DataFrame, path:str, index:int, output_format:str) -> None:
+    "Writes one partition file."
+    table = pa.Table.from_pandas(df, schema=_hit_table_schema(pa, list(df.columns)),
+                                 preserve_index=False)
+    partition = os.path.join(path, f"part-{index:05d}.{_EXTENSIONS[output_format]}")
+    if output_format == "parquet":
+        pa.parquet.write_table(table, partition)
+    else:
+        with pa.OSFile(partition, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+def read_hit_table(path:Union[os.PathLike, str], columns:Optional[List[str]]=None,
+                   memory_map:bool=True) -> pd.DataFrame:
+    """
+    Loads a hit table written by write_hit_table.
+
+    Arrow IPC partitions are memory-mapped and read without copying;
+    Parquet partitions are decoded from memory-mapped files.
+
+    Parameters
+    ----------
+    - path: path to hit table directory.
+    - columns: list of str: subset of columns to load. Default: all.
+    - memory_map: bool: memory-map partition files. Default: True.
+
+    Returns
+    -------
+    - :pd.DataFrame: hit table with categorical accessions.
+    """
+    pa = _import_pyarrow()
+    tables = [_read_partition(pa, partition, columns, memory_map)
+              for partition in _partition_paths(path)]
+    return pa.concat_tables(tables).to_pandas()
+
+def _read_partition(pa, partition:str, columns:Optional[List[str]]=None, memory_map:bool=True):
+    "Reads one partition file into an Arrow table."
+    if partition.endswith(".parquet"):
+        return pa.parquet.read_table(partition, columns=columns, memory_map=memory_map)
+    source = pa.memory_map(partition, "r") if memory_map else pa.OSFile(partition, "rb")
+    table = pa.ipc.open_file(source).read_all()
+    return table.select(columns) if columns is not None else table
+
+def collect_tblastout(path_or_buff, output:Optional[Union[os.PathLike, str]]=None,
+                      output_format:str="parquet", chunksize:int=1_000_000,
+                      min_coverage:Optional[float]=None,
+                      **kwarg) -> Union[pd.DataFrame, str]:
+    """
+    Loads tblastout produced by a similarity wrapper.
+
+    Without `output`, returns read_transform_tblastout(path_or_buff). Otherwise
+    streams the hits into a hit table at `output` without materializing them.
+
+    Parameters
+    ----------
+    - path_or_buff: path to tblastout file.
+    - output: path: hit table directory. Default: None.
+    - output_format: str: "parquet" or "arrow". Default: "parquet".
+    - chunksize: int: rows per partition. Default: 1,000,000.
+    - min_coverage: float: minimum query and target coverage of the hits,
+        applied while parsing. Default: None.
+    - **kwarg: arguments for iter_tblastout.
+
+    Returns
+    -------
+    - :pd.DataFrame | str: pairwise alignment, or path to the hit table.
+    """
+    if output is None:
+        return read_transform_tblastout(path_or_buff, min_coverage=min_coverage,
+                                        chunksize=chunksize)
+    return write_hit_table(iter_tblastout(path_or_buff, chunksize=chunksize,
+                                          min_coverage=min_coverage, **kwarg),
+                           output, output_format=output_format)
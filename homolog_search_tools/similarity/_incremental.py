@@ -0,0 +1,139 @@
+"""Incremental update of all-vs-all hit tables when sequences are added, changed or removed."""
+
+import os
+from dataclasses import dataclass, field
+from typing import List, Optional, Set, Union
+import pandas as pd
+from ..utils._utils import SequenceData
+from ._collapse import _accessions, _sequence_frame
+from ._hit_store import (
+    _compact_hit_table, _import_pyarrow, _partition_paths, _read_partition, _write_partition
+)
+
+@dataclass
+class SequenceDiff:
+    """
+    Accessions of a new sequence set compared to an old one.
+
+    Parameters
+    ----------
+    - added: list of str: accessions only in the new set.
+    - changed: list of str: accessions in both sets whose sequence (or version) changed.
+    - removed: list of str: accessions only in the old set.
+    - unchanged: list of str: accessions in both sets with the same sequence.
+    """
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+
+    @property
+    def stale(self) -> Set[str]:
+        "Accessions whose stored hits are no longer valid."
+        return set(self.changed) | set(self.removed)
+
+    @property
+    def fresh(self) -> List[str]:
+        "Accessions to search: changed, then added."
+        return self.changed + self.added
+
+def diff_sequences(old_sequences:SequenceData, new_sequences:SequenceData,
+                   header_col:str="Header", sequence_col:str="Sequence",
+                   version_col:Optional[str]=None) -> SequenceDiff:
+    """
+    Compares two sequence sets by accession, the first word of the header.
+
+    Sequences are compared by a 64-bit content hash (pd.util.hash_pandas_object)
+    of the sequence column, or by version_col when set, e.g. UniProt
+    sequenceVersion, which avoids hashing altogether.
+
+    Parameters
+    ----------
+    - old_sequences: SEQUENCE_DATA: sequences of the stored results.
+    - new_sequences: SEQUENCE_DATA: updated sequences.
+    - header_col: str: header column. Default: "Header".
+    - sequence_col: str: sequence column. Default: "Sequence".
+    - version_col: str: column compared instead of the sequence hash. Default: None.
+
+    Returns
+    -------
+    - :SequenceDiff
+    """
+    def fingerprints(sequences:SequenceData) -> pd.Series:
+        df = _sequence_frame(sequences, header_col, sequence_col)
+        values = (df[version_col] if version_col is not None else
+                  pd.util.hash_pandas_object(df[sequence_col].astype(str), index=False))
+        return pd.Series(values.to_numpy(), index=_accessions(df[header_col]).to_numpy())
+
+    old, new = fingerprints(old_sequences), fingerprints(new_sequences)
+    shared = new.index.isin(old.index)
+    common = new[shared]
+    same = common.to_numpy() == old.reindex(common.index).to_numpy()
+    return SequenceDiff(
+        added=new.index[~shared].to_list(),
+        changed=common.index[~same].to_list(),
+        removed=old.index[~old.index.isin(new.index)].to_list(),
+        unchanged=common.index[same].to_list())
+
+def drop_accessions(hits:pd.DataFrame, accessions:Set[str]) -> pd.DataFrame:
+    "Hits where neither accession is in `accessions`."
+    if not accessions:
+        return hits
+    accessions = list(accessions)
+    keep = ~(hits["Accession_1"].isin(accessions) | hits["Accession_2"].isin(accessions))
+    return hits[keep]
+
+def update_hit_table(store:Union[os.PathLike, str, pd.DataFrame], delta:pd.DataFrame,
+                     stale:Set[str]) -> Union[pd.DataFrame, str]:
+    """
+    Merges new hits into a stored hit table, dropping the hits of stale
+    accessions.
+
+    For a hit table directory, only the partitions holding stale accessions
+    are rewritten, each atomically; the delta is appended as new partitions.
+
+    Parameters
+    ----------
+    - store: path | pd.DataFrame: hit table directory written by
+        write_hit_table, or a DataFrame of hits.
+    - delta: pd.DataFrame: new hits, in the same columns.
+    - stale: set of str: accessions whose stored hits are dropped.
+
+    Returns
+    -------
+    - :pd.DataFrame | str: merged hits, or the path to the updated hit table.
+    """
+    if isinstance(store, pd.DataFrame):
+        merged = drop_accessions(store, stale)
+        merged = (pd.concat([merged, delta], ignore_index=True) if len(delta) else
+                  merged.reset_index(drop=True))
+        for column in ("Accession_1", "Accession_2"):
+            merged[column] = merged[column].astype(str).astype("category")
+        return merged.sort_values("Log_E_Value", ascending=False, ignore_index=True)
+
+    pa = _import_pyarrow()
+    path = os.fspath(store)
+    partitions = _partition_paths(path)
+    output_format = "arrow" if partitions[-1].endswith(".arrow") else "parquet"
+    if stale:
+        for partition in partitions:
+            hits = _read_partition(pa, partition).to_pandas()
+            kept = drop_accessions(hits, stale)
+            if len(kept) == len(hits):
+                continue
+            # Written next to the partition, then swapped in.
+            temp_dir = f"{partition}.tmp"
+            os.makedirs(temp_dir, exist_ok=True)
+            _write_partition(pa, _compact_hit_table(kept.reset_index(drop=True)), temp_dir,
+                             _partition_index(partition), output_format)
+            os.replace(os.path.join(temp_dir, os.path.basename(partition)), partition)
+            os.rmdir(temp_dir)
+
+    if len(delta):
+        _write_partition(pa, _compact_hit_table(delta.reset_index(drop=True)), path,
+                         _partition_index(partitions[-1]) + 1, output_format)
+    return path
+
+def _partition_index(partition:str) -> int:
+    "Index of a part-<index>.<ext> partition file."
+    return int(os.path.basename(partition).split(".")[0][len("part-"):])
@@ -1,151 +1,213 @@
 """Sub-module to interact with MMseqs2 via the command-line."""
 
-from typing import Dict
+from typing import Optional, Sequence, Tuple, Union
 import tempfile
 import os
+import shutil
 import pandas as pd
-from ..utils._utils import SequenceData, cmd_run, handle_sequence_data
-from ._similarity_utils import read_transform_tblastout
-
-ClusterDict = Dict[str, str]
-
-class MMseqs2:
-    """Class to interact with MMseqs."""
+from ..utils._process import CommandLimits
+from ..utils._utils import SequenceData, cmd_run, handle_sequence_data, read_fasta
+from ._checkpoint import JobManifest
+from ._cluster import ClusterHierarchy, ClusterResult
+from ._database import DatabaseCache
+from ._parameters import MMseqs2Parameters, _drop_flag, _flags
+from ._wrapper import SimilarityWrapper
+
+class MMseqs2(SimilarityWrapper):
+    """
+    Class to interact with MMseqs.
 
-    def __init__(self, path_to_binary="mmseqs"):
-        self.path_to_binary = path_to_binary
+    Targets are converted with createdb, and indexed with createindex when
+    cached with a DatabaseCache.
 
-    def run(self, query_sequences:SequenceData, target_sequences:SequenceData) -> pd.DataFrame:
+    Reference
+    ---------
+    - https://mmseqs.com/latest/userguide.pdf
+    """
+    engine = "mmseqs2"
+
+    def __init__(self, path_to_binary="mmseqs", params:Optional[MMseqs2Parameters]=None,
+                 database_cache:Optional[DatabaseCache]=None,
+                 limits:Optional[CommandLimits]=None):
+        super().__init__(path_to_binary, database_cache, limits)
+        self.params = params if params is not None else MMseqs2Parameters()
+
+    def _build_database(self, fasta:os.PathLike, prefix:str) -> None:
+        cmd_run([self.path_to_binary, "createdb", fasta, prefix], **self.limits.kwargs())
+        cmd_run([self.path_to_binary, "createindex", prefix,
+                 os.path.join(os.path.dirname(prefix), "tmp"), *self.params.createindex_args()],
+                **self.limits.kwargs())
+        shutil.rmtree(os.path.join(os.path.dirname(prefix), "tmp"), ignore_errors=True)
+
+    def _database_options(self) -> str:
+        return " ".join(_drop_flag(self.params.createindex_args(), "--threads"))
+
+    def _prepare_target(self, fasta:os.PathLike, prefix:str) -> None:
+        cmd_run([self.path_to_binary, "createdb", fasta, prefix], **self.limits.kwargs())
+
+    def _search(self, query_fasta:os.PathLike, target:str, output_file:str,
+                temp_dir:os.PathLike) -> None:
+        self._checkpointed_search(JobManifest(), "search", query_fasta, target, "",
+                                  output_file, temp_dir)
+
+    def _checkpointed_search(self, manifest:JobManifest, name:str, query_fasta:os.PathLike,
+                             target:str, target_key:str, output_file:str,
+                             temp_dir:os.PathLike) -> None:
         """
-        Command wrapper for MMseqs2 to compute pairwise alignment on databases.
-
+        Runs createdb, prefilter, align and convertalis as separate stages,
+        so a rerun resumes from the last completed one.
+        """
+        key = self._search_key(manifest, query_fasta, target_key)
+        query_db = os.path.join(temp_dir, "query_db")
+        prefilter_db = os.path.join(temp_dir, "prefilter_db")
+        alignment_db = os.path.join(temp_dir, "alignment_db")
+
+        # Run MMseqs2 commads.
+        manifest.run_stage(f"{name}/createdb", key, [query_db], lambda: cmd_run(
+            [self.path_to_binary, "createdb", query_fasta, query_db], **self.limits.kwargs()))
+        manifest.run_stage(f"{name}/prefilter", key, [prefilter_db], lambda: cmd_run(
+            [self.path_to_binary, "prefilter", query_db, target, prefilter_db,
+             *self.params.prefilter_args()], **self.limits.kwargs()))
+        manifest.run_stage(f"{name}/align", key, [alignment_db], lambda: cmd_run(
+            [self.path_to_binary, "align", query_db, target, prefilter_db, alignment_db,
+             *self.params.align_args()], **self.limits.kwargs()))
+        manifest.run_stage(name, key, [output_file], lambda: cmd_run(
+            [self.path_to_binary, "convertalis", query_db, target, alignment_db, output_file,
+             *self.params.convertalis_args()], **self.limits.kwargs()))
+
+    def run_cluster(self, sequences:SequenceData, algorithm:str="easy-cluster",
+                    min_seq_id:Optional[float]=None, coverage:Optional[float]=None,
+                    cov_mode:Optional[int]=None) -> ClusterResult:
+        """
+        Generic command wrapper for MMseqs2 to cluster databases.
+        
         Parameters
         ----------
-        - query_sequences: SEQUENCE_DATA
-        - target_sequences: SEQUENCE_DATA
+        - sequences: SEQUENCE_DATA
+        - algorithm: str: "easy-cluster" or "easy-linclust". Default: "easy-cluster".
+        - min_seq_id: float: --min-seq-id, between 0 and 1. Default: None.
+        - coverage: float: -c, minimum alignment coverage. Default: None.
+        - cov_mode: int: --cov-mode. Default: None.
 
         Returns
         -------
-        - :pd.DataFrame: pairwise alignment.
+        - :ClusterResult: maps nodes to representative node
 
         Reference
         ---------
         - https://mmseqs.com/latest/userguide.pdf
         """
-        # Declare temp files.
         with tempfile.TemporaryDirectory() as temp_dir:
-            prefilter_db = os.path.join(temp_dir, "prefilter_db")
-            alignment_db = os.path.join(temp_dir, "alignment_db")
-            output_file = os.path.join(temp_dir, "output_file")
-            query_db = handle_sequence_data(query_sequences,
-                                            os.path.join(temp_dir, "query_db"))
-            target_db = handle_sequence_data(target_sequences,
-                                            os.path.join(temp_dir, "target_db"))
-
-            # Run MMseqs2 commads.
-            cmd_run([self.path_to_binary, "createdb", query_sequences, query_db])
-            cmd_run([self.path_to_binary, "createdb", target_sequences, target_db])
-            cmd_run([self.path_to_binary, "prefilter", query_db, target_db, prefilter_db])
-            cmd_run([self.path_to_binary, "align", query_db, target_db, prefilter_db, alignment_db])
-            cmd_run([self.path_to_binary, "convertalis",
-                    query_db, target_db, alignment_db, output_file])
-
-            df = read_transform_tblastout(output_file)
-        return df
-
-    def run_allvsall(self, sequences:SequenceData) -> pd.DataFrame:
+            fasta = handle_sequence_data(sequences, os.path.join(temp_dir, "sequences.fasta"))
+            clusters, _ = self._cluster_level(fasta, os.path.join(temp_dir, "output"), algorithm,
+                                              min_seq_id, coverage, cov_mode)
+        return clusters
+
+    def _cluster_level(self, fasta:os.PathLike, output_prefix:str, algorithm:str,
+                       min_seq_id:Optional[float]=None, coverage:Optional[float]=None,
+                       cov_mode:Optional[int]=None) -> Tuple[ClusterResult, str]:
         """
-        Equivalent to MMseqs.run(query_sequences=sequences, target_sequences=sequences).
+        Runs easy-cluster or easy-linclust.
+
+        Returns
+        -------
+        - :tuple: (ClusterResult, path to the <prefix>_rep_seq.fasta representatives).
         """
-        return self.run(sequences, sequences)
-    
-    def run_cluster(self, sequences:SequenceData, algorithm:str="easy-cluster") -> ClusterDict:
+        if algorithm not in ["easy-cluster", "easy-linclust"]:
+            raise ValueError("Invalid algorithm value.")
+        if min_seq_id is not None and not 0.0 <= min_seq_id <= 1.0:
+            raise ValueError("Invalid min_seq_id value.")
+        inner_temp_dir = f"{output_prefix}_tmp"
+
+        # Run MMseqs2 commads.
+        cmd_run([self.path_to_binary, algorithm, fasta, output_prefix, inner_temp_dir,
+                 *_flags(**{"--min-seq-id": min_seq_id, "-c": coverage, "--cov-mode": cov_mode}),
+                 *self.params.cluster_args(algorithm)], **self.limits.kwargs())
+        shutil.rmtree(inner_temp_dir, ignore_errors=True)
+        clusters = parse_mmseqs_cluster_adjacency_list(f"{output_prefix}_cluster.tsv")
+        return clusters, f"{output_prefix}_rep_seq.fasta"
+
+    def run_cascaded_cluster(self, sequences:SequenceData, identities:Sequence[float]=(0.9,),
+                             coverage:Optional[float]=0.8, cov_mode:Optional[int]=None,
+                             work_dir:Optional[os.PathLike]=None
+                            ) -> Tuple[ClusterHierarchy, pd.DataFrame]:
         """
-        Generic command wrapper for MMseqs2 to cluster databases.
-        
+        Clusters sequences at descending identity levels, each level
+        clustering the representatives of the previous one.
+
+        The first level runs easy-linclust, linear in the number of
+        sequences, to collapse the redundancy at high identity; the next
+        levels run easy-cluster on the (much fewer) representatives.
+
         Parameters
         ----------
         - sequences: SEQUENCE_DATA
+        - identities: list of float: --min-seq-id of every level, descending.
+            Default: (0.9,).
+        - coverage: float: -c of every level. Default: 0.8.
+        - cov_mode: int: --cov-mode of every level. Default: None.
+        - work_dir: path: directory keeping the cluster files of every level.
+            Default: None, a temp directory.
 
         Returns
         -------
-        - :ClusterDict: maps nodes to representative node
-
-        Reference
-        ---------
-        - https://mmseqs.com/latest/userguide.pdf
+        - :tuple: (ClusterHierarchy, pd.DataFrame of the final representative
+            sequences with Header and Sequence columns).
         """
-        if algorithm not in ["easy-cluster", "easy-linclust"]:
-            raise ValueError("Invalid algorithm value.")
+        identities = list(identities)
+        if not identities or any(a < b for a, b in zip(identities, identities[1:])):
+            raise ValueError("Invalid identities value.")
+        hierarchy = ClusterHierarchy(identities=identities)
+        with self._work_dir(work_dir) as temp_dir:
+            fasta = handle_sequence_data(sequences, os.path.join(temp_dir, "sequences.fasta"))
+            for level, identity in enumerate(identities):
+                algorithm = "easy-linclust" if level == 0 else "easy-cluster"
+                clusters, fasta = self._cluster_level(
+                    fasta, os.path.join(temp_dir, f"level_{level}"), algorithm,
+                    min_seq_id=identity, coverage=coverage, cov_mode=cov_mode)
+                hierarchy.levels.append(clusters)
+            headers, seqs = read_fasta(fasta)
+        return hierarchy, pd.DataFrame({"Header": headers, "Sequence": seqs})
+
+    def run_cluster_search(self, sequences:SequenceData, identities:Sequence[float]=(0.9,),
+                           coverage:Optional[float]=0.8, cov_mode:Optional[int]=None,
+                           expand:bool=False, **kwarg
+                          ) -> Tuple[Union[pd.DataFrame, str], ClusterHierarchy]:
+        """
+        Clusters sequences with run_cascaded_cluster, then aligns the final
+        representatives all-vs-all, so the search scales with the number of
+        clusters rather than of sequences.
 
-        # Declare temp files.
-        with tempfile.TemporaryDirectory() as temp_dir:
-            output_prefix = os.path.join(temp_dir, "output")
-            adjacency_list = f"{output_prefix}_cluster.tsv"
-            inner_temp_dir = os.path.join(temp_dir, "tmp")
-
-            # Run MMseqs2 commads.
-            cmd_run([self.path_to_binary, algorithm, sequences, output_prefix, inner_temp_dir])
-
-            mmapper = parse_mmseqs_cluster_adjacency_list(adjacency_list)
-        return mmapper
-    
-    # def run_easy_cluster(self, query_sequences:SequenceData, target_sequences:SequenceData, algorithm:str="easy-cluster") -> ClusterDict:
-    #     """
-    #     Generic command wrapper for MMseqs2 to cluster databases.
-        
-    #     Parameters
-    #     ----------
-    #     - sequences: SEQUENCE_DATA
-
-    #     Returns
-    #     -------
-    #     - :ClusterDict: maps nodes to representative node
-
-    #     Reference
-    #     ---------
-    #     - https://mmseqs.com/latest/userguide.pdf
-    #     """
-    #     if algorithm not in ["easy-cluster", "easy-linclust"]:
-    #         raise ValueError("Invalid algorithm value.")
-
-    #     # Declare temp files.
-    #     with tempfile.TemporaryDirectory() as temp_dir:
-    #         output_prefix = os.path.join(temp_dir, "output")
-    #         adjacency_list = f"{output_prefix}_cluster.tsv"
-    #         inner_temp_dir = os.path.join(temp_dir, "tmp")
-
-    #         # Run MMseqs2 commads.
-    #         cmd_run([self.path_to_binary, algorithm, sequences, output_prefix, inner_temp_dir])
-
-    #         mmapper = parse_mmseqs_cluster_adjacency_list(adjacency_list)
-
-    #         prefilter_db = os.path.join(temp_dir, "prefilter_db")
-    #         alignment_db = os.path.join(temp_dir, "alignment_db")
-    #         output_file = os.path.join(temp_dir, "output_file")
-    #         query_db = handle_sequence_data(query_sequences,
-    #                                         os.path.join(temp_dir, "query_db"))
-    #         target_db = handle_sequence_data(target_sequences,
-    #                                         os.path.join(temp_dir, "target_db"))
-
-    #         # Run MMseqs2 commads.
-    #         cmd_run([self.path_to_binary, "prefilter", query_db, target_db, prefilter_db])
-    #         cmd_run([self.path_to_binary, "align", query_db, target_db, prefilter_db, alignment_db])
-    #         cmd_run([self.path_to_binary, "convertalis",
-    #                 query_db, target_db, alignment_db, output_file])
-    #     return mmapper
-
-def parse_mmseqs_cluster_adjacency_list(adjacency_list:os.PathLike | str) -> ClusterDict:
+        Parameters
+        ----------
+        - sequences: SEQUENCE_DATA
+        - identities, coverage, cov_mode: arguments for run_cascaded_cluster.
+        - expand: bool: project the hits onto every member with
+            ClusterHierarchy.project. The number of hits grows with the
+            product of the cluster sizes. Default: False.
+        - **kwarg: arguments for run_allvsall.
+
+        Returns
+        -------
+        - :tuple: (hits between representatives, or between all the members
+            when expand, and the ClusterHierarchy).
+        """
+        if expand and kwarg.get("output") is not None:
+            raise ValueError("Invalid expand value: hits written to output cannot be expanded.")
+        hierarchy, representatives = self.run_cascaded_cluster(sequences, identities, coverage,
+                                                               cov_mode)
+        hits = self.run_allvsall(representatives, **kwarg)
+        if expand:
+            hits = hierarchy.project(hits)
+        return hits, hierarchy
+
+def parse_mmseqs_cluster_adjacency_list(adjacency_list:os.PathLike | str,
+                                        block_size:int=1 << 24) -> ClusterResult:
     """
     Parses MMseqs easy-cluster and easy-linclust adjacency list outfiles.
 
     Returns
     -------
-    - Dict: maps nodes to representative node
+    - ClusterResult: maps nodes to representative node
     """
-    mapper = {}
-    with open(adjacency_list, "r") as f:
-        for line in f.readlines():
-            line = line.strip().split("\t")
-            mapper[line[1]] = line[0]
-    return mapper
\ No newline at end of file
+    return ClusterResult.from_tsv(adjacency_list, block_size=block_size)
@@ -0,0 +1,273 @@
+"""Validated command-line parameters of the similarity search wrappers."""
+
+from dataclasses import dataclass, field
+from typing import List, Optional
+from ..utils._resources import available_cpus, available_memory
+from ._scoring import BLOSUM62_GAP_COSTS
+
+DiamondSensitivities = [
+    "fast", "mid-sensitive", "sensitive", "more-sensitive", "very-sensitive", "ultra-sensitive"
+]
+
+def _validate_positive(name:str, value, integer:bool=False) -> None:
+    "Raises ValueError unless value is None or a positive (integer) number."
+    if value is None:
+        return
+    if integer and (not isinstance(value, int) or isinstance(value, bool)):
+        raise ValueError(f"Invalid {name} value.")
+    if value <= 0:
+        raise ValueError(f"Invalid {name} value.")
+
+def _flags(**flags) -> List[str]:
+    "Renders flag=value pairs, skipping unset (None) values."
+    out = []
+    for flag, value in flags.items():
+        if value is not None:
+            out.extend([flag, str(value)])
+    return out
+
+def _drop_flag(args:List[str], flag:str) -> List[str]:
+    "Removes flag and its value from rendered arguments."
+    out, skip = [], False
+    for arg in args:
+        if skip:
+            skip = False
+        elif arg == flag:
+            skip = True
+        else:
+            out.append(arg)
+    return out
+
+# outfmt 6 fields, followed by the query and target lengths in extended formats.
+BLAST_FORMAT_FIELDS = [
+    "qseqid", "sseqid", "pident", "length", "mismatch", "gapopen",
+    "qstart", "qend", "sstart", "send", "evalue", "bitscore"
+]
+MMSEQS2_FORMAT_FIELDS = [
+    "query", "target", "fident", "alnlen", "mismatch", "gapopen",
+    "qstart", "qend", "tstart", "tend", "evalue", "bits"
+]
+
+def _default_diamond_block_size() -> float:
+    """
+    DIAMOND uses roughly six times the block size (in billions of letters)
+    in GB of memory. Picks the largest block size that fits in the available
+    memory, between 0.5 and DIAMOND's default of 2.0 (larger blocks barely
+    speed up typical searches).
+    """
+    memory = available_memory()
+    if memory is None:
+        return 2.0
+    return max(0.5, min(2.0, round(memory / 1E9 / 6, 1)))
+
+def _default_mmseqs_memory_limit() -> Optional[str]:
+    "80% of the available memory, formatted for --split-memory-limit."
+    memory = available_memory()
+    if memory is None:
+        return None
+    return f"{max(1, int(memory * 0.8 / 2**20))}M"
+
+@dataclass
+class BlastPParameters:
+    """
+    blastp search parameters. Options left to None use the blastp default.
+
+    Parameters
+    ----------
+    - threads: int: -num_threads. Default: CPUs available to the process.
+    - evalue: float: -evalue.
+    - max_target_seqs: int: -max_target_seqs.
+    - dbsize: int: -dbsize, database size in residues used for E-values.
+        Default: None, the size of the target database.
+    - extended_output: bool: append the query and target lengths (qlen,
+        slen) to the tabular output, which adds coverage columns to the hits.
+        Default: False.
+    - extra_args: list of str: additional blastp arguments.
+    """
+    threads: int = field(default_factory=available_cpus)
+    evalue: Optional[float] = None
+    max_target_seqs: Optional[int] = None
+    dbsize: Optional[int] = None
+    extended_output: bool = False
+    extra_args: List[str] = field(default_factory=list)
+
+    def __post_init__(self) -> None:
+        _validate_positive("threads", self.threads, integer=True)
+        _validate_positive("evalue", self.evalue)
+        _validate_positive("max_target_seqs", self.max_target_seqs, integer=True)
+        _validate_positive("dbsize", self.dbsize, integer=True)
+
+    def search_args(self) -> List[str]:
+        "blastp arguments."
+        return _flags(**{"-num_threads": self.threads, "-evalue": self.evalue,
+                         "-max_target_seqs": self.max_target_seqs,
+                         "-dbsize": self.dbsize}) + list(self.extra_args)
+
+    def outfmt_args(self) -> List[str]:
+        "blastp tabular output format."
+        if not self.extended_output:
+            return ["-outfmt", "6"]
+        return ["-outfmt", " ".join(["6", *BLAST_FORMAT_FIELDS, "qlen", "slen"])]
+
+@dataclass
+class DiamondParameters:
+    """
+    DIAMOND search parameters. Options left to None use the DIAMOND default.
+
+    Parameters
+    ----------
+    - threads: int: --threads. Default: CPUs available to the process.
+    - sensitivity: str: one of DiamondSensitivities, e.g. "sensitive" for --sensitive.
+    - block_size: float: --block-size, in billions of sequence letters.
+        Default: sized to the available memory (cgroup limit or physical memory).
+    - index_chunks: int: --index-chunks.
+    - max_target_seqs: int: --max-target-seqs.
+    - evalue: float: --evalue.
+    - dbsize: int: --dbsize, database size in residues used for E-values.
+        Default: None, the size of the target database.
+    - extended_output: bool: append the query and target lengths (qlen,
+        slen) to the tabular output, which adds coverage columns to the hits.
+        Default: False.
+    - extra_args: list of str: additional diamond blastp arguments.
+    """
+    threads: int = field(default_factory=available_cpus)
+    sensitivity: Optional[str] = None
+    block_size: Optional[float] = field(default_factory=_default_diamond_block_size)
+    index_chunks: Optional[int] = None
+    max_target_seqs: Optional[int] = None
+    evalue: Optional[float] = None
+    dbsize: Optional[int] = None
+    extended_output: bool = False
+    extra_args: List[str] = field(default_factory=list)
+
+    def __post_init__(self) -> None:
+        _validate_positive("threads", self.threads, integer=True)
+        if self.sensitivity is not None and self.sensitivity not in DiamondSensitivities:
+            raise ValueError("Invalid sensitivity value.")
+        _validate_positive("block_size", self.block_size)
+        _validate_positive("index_chunks", self.index_chunks, integer=True)
+        _validate_positive("max_target_seqs", self.max_target_seqs, integer=True)
+        _validate_positive("evalue", self.evalue)
+        _validate_positive("dbsize", self.dbsize, integer=True)
+
+    def makedb_args(self) -> List[str]:
+        "diamond makedb arguments."
+        return _flags(**{"--threads": self.threads})
+
+    def search_args(self) -> List[str]:
+        "diamond blastp arguments."
+        out = _flags(**{"--threads": self.threads, "--block-size": self.block_size,
+                        "--index-chunks": self.index_chunks,
+                        "--max-target-seqs": self.max_target_seqs, "--evalue": self.evalue,
+                        "--dbsize": self.dbsize})
+        if self.sensitivity is not None:
+            out.append(f"--{self.sensitivity}")
+        return out + list(self.extra_args)
+
+    def outfmt_args(self) -> List[str]:
+        "diamond blastp tabular output format, the default outfmt 6 unless extended."
+        if not self.extended_output:
+            return []
+        return ["--outfmt", "6", *BLAST_FORMAT_FIELDS, "qlen", "slen"]
+
+@dataclass
+class MMseqs2Parameters:
+    """
+    MMseqs2 search parameters. Options left to None use the MMseqs2 default.
+
+    Parameters
+    ----------
+    - threads: int: --threads. Default: CPUs available to the process.
+    - sensitivity: float: -s, between 1.0 and 7.5.
+    - max_seqs: int: --max-seqs, prefilter hits kept per query.
+    - evalue: float: -e.
+    - split_memory_limit: str: --split-memory-limit, e.g. "12G".
+        Default: 80% of the available memory (cgroup limit or physical memory).
+    - db_load_mode: int: --db-load-mode of the search commands, 2 to
+        memory-map the target database and its index instead of reading them.
+    - extended_output: bool: append the query and target lengths (qlen,
+        tlen) to the convertalis output, which adds coverage columns to the
+        hits. Default: False.
+    - extra_args: list of str: additional prefilter arguments.
+    """
+    threads: int = field(default_factory=available_cpus)
+    sensitivity: Optional[float] = None
+    max_seqs: Optional[int] = None
+    evalue: Optional[float] = None
+    split_memory_limit: Optional[str] = field(default_factory=_default_mmseqs_memory_limit)
+    db_load_mode: Optional[int] = None
+    extended_output: bool = False
+    extra_args: List[str] = field(default_factory=list)
+
+    def __post_init__(self) -> None:
+        _validate_positive("threads", self.threads, integer=True)
+        if self.sensitivity is not None and not 1.0 <= self.sensitivity <= 7.5:
+            raise ValueError("Invalid sensitivity value.")
+        _validate_positive("max_seqs", self.max_seqs, integer=True)
+        _validate_positive("evalue", self.evalue)
+        if self.db_load_mode is not None and self.db_load_mode not in range(4):
+            raise ValueError("Invalid db_load_mode value.")
+
+    def createindex_args(self) -> List[str]:
+        "mmseqs createindex arguments."
+        return _flags(**{"--threads": self.threads, "-s": self.sensitivity,
+                         "--split-memory-limit": self.split_memory_limit})
+
+    def prefilter_args(self) -> List[str]:
+        "mmseqs prefilter arguments."
+        return _flags(**{"--threads": self.threads, "-s": self.sensitivity,
+                         "--max-seqs": self.max_seqs,
+                         "--split-memory-limit": self.split_memory_limit,
+                         "--db-load-mode": self.db_load_mode}) + list(self.extra_args)
+
+    def align_args(self) -> List[str]:
+        "mmseqs align arguments."
+        return _flags(**{"--threads": self.threads, "-e": self.evalue,
+                         "--db-load-mode": self.db_load_mode})
+
+    def convertalis_args(self) -> List[str]:
+        "mmseqs convertalis arguments."
+        out = _flags(**{"--threads": self.threads, "--db-load-mode": self.db_load_mode})
+        if self.extended_output:
+            out += ["--format-output", ",".join([*MMSEQS2_FORMAT_FIELDS, "qlen", "tlen"])]
+        return out
+
+    def cluster_args(self, algorithm:str="easy-cluster") -> List[str]:
+        "mmseqs easy-cluster and easy-linclust arguments."
+        if algorithm == "easy-linclust":
+            return _flags(**{"--threads": self.threads})
+        return _flags(**{"--threads": self.threads, "-s": self.sensitivity,
+                         "--max-seqs": self.max_seqs,
+                         "--split-memory-limit": self.split_memory_limit})
+
+@dataclass
+class SmithWatermanParameters:
+    """
+    In-process Smith-Waterman search parameters, BLOSUM62 with affine gap costs.
+
+    Parameters
+    ----------
+    - threads: int: worker processes aligning batches of pairs; a single
+        batch is aligned in-process. Default: CPUs available to the process.
+    - gap_open: int: gap opening cost, a gap of length L costs
+        gap_open + L * gap_extend. Default: 11, as blastp.
+    - gap_extend: int: gap extension cost. Default: 1, as blastp.
+    - evalue: float: keep hits with E_Value <= evalue. Default: 10.0, as blastp.
+    - max_cells: int: dynamic programming cells of a batch of pairs. The
+        traceback of a batch takes one byte per cell. Default: 2**24.
+    - extended_output: bool: add the query and target lengths and the
+        coverage columns to the hits. Default: False.
+    """
+    threads: int = field(default_factory=available_cpus)
+    gap_open: int = 11
+    gap_extend: int = 1
+    evalue: float = 10.0
+    max_cells: int = 1 << 24
+    extended_output: bool = False
+
+    def __post_init__(self) -> None:
+        _validate_positive("threads", self.threads, integer=True)
+        if (self.gap_open, self.gap_extend) not in BLOSUM62_GAP_COSTS:
+            raise ValueError("Invalid gap_open, gap_extend value.")
+        _validate_positive("evalue", self.evalue)
+        _validate_positive("max_cells", self.max_cells, integer=True)
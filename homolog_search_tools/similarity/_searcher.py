@@ -0,0 +1,203 @@
+"""Long-lived MMseqs2 searcher micro-batching small query batches against one target."""
+
+import contextlib
+import dataclasses
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from ..utils._utils import SequenceData, cmd_run, handle_sequence_data
+from ._collapse import _accessions, _sequence_frame
+from ._mmseqs2 import MMseqs2
+from ._similarity_utils import (
+    EXTENDED_TBLAST_COLUMNS, TBLAST_COLUMNS, TBLAST_DTYPES, _read_tblastout,
+    _transform_tblastout
+)
+
+class MMseqs2Searcher:
+    """
+    Searches query batches against a fixed target set with MMseqs2, paying
+    the target setup once.
+
+    The target database and its index are built once (createdb and
+    createindex, or taken from the DatabaseCache of `mmseqs`), loaded into
+    the page cache with `mmseqs touchdb`, and memory-mapped by every search
+    (--db-load-mode 2) instead of being read from disk.
+
+    Requests are queued and served by one worker thread, which merges the
+    requests arriving within `max_wait` seconds of each other, up to
+    `max_batch_size` query sequences, into a single search: the process
+    startup and query createdb are paid once per batch rather than once
+    per request.
+
+    Usage
+    -----
+    with MMseqs2Searcher(target_df) as searcher:
+        futures = [searcher.submit(batch) for batch in query_batches]
+        hits = [future.result() for future in futures]
+    """
+
+    def __init__(self, target_sequences:SequenceData, mmseqs:Optional[MMseqs2]=None,
+                 max_batch_size:int=1000, max_wait:float=0.05, touch:bool=True,
+                 work_dir:Optional[os.PathLike]=None) -> None:
+        """
+        Parameters
+        ----------
+        - target_sequences: SEQUENCE_DATA
+        - mmseqs: MMseqs2: binary, parameters and database cache. The
+            db_load_mode of its parameters defaults to 2 (mmap).
+            Default: MMseqs2().
+        - max_batch_size: int: query sequences per search. Default: 1000.
+        - max_wait: float: seconds the first request of a batch waits for
+            others to join it, the queueing part of its latency. Default: 0.05.
+        - touch: bool: preload the target with mmseqs touchdb. Default: True.
+        - work_dir: path: directory of the target database and the batches.
+            Default: None, a temp directory removed by close().
+        """
+        if max_batch_size < 1:
+            raise ValueError("Invalid max_batch_size value.")
+        if max_wait < 0:
+            raise ValueError("Invalid max_wait value.")
+        mmseqs = mmseqs if mmseqs is not None else MMseqs2()
+        if mmseqs.params.db_load_mode is None:
+            mmseqs = MMseqs2(mmseqs.path_to_binary,
+                             dataclasses.replace(mmseqs.params, db_load_mode=2),
+                             mmseqs.database_cache, mmseqs.limits)
+        self.mmseqs = mmseqs
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.stats: Dict[str, float] = {"requests": 0, "batches": 0, "queries": 0,
+                                        "search_time": 0.0}
+
+        self._temp_dir = tempfile.TemporaryDirectory() if work_dir is None else None
+        self.work_dir = self._temp_dir.name if work_dir is None else os.fspath(work_dir)
+        os.makedirs(self.work_dir, exist_ok=True)
+        target_fasta = handle_sequence_data(target_sequences,
+                                            os.path.join(self.work_dir, "target.fasta"))
+        # Holds a cached target database in use until close().
+        self._target_database = contextlib.ExitStack()
+        self.target = self._target_database.enter_context(
+            mmseqs.target_database(target_fasta, self.work_dir, prebuilt=True))
+        if touch:
+            cmd_run([mmseqs.path_to_binary, "touchdb", self.target,
+                     "--threads", str(mmseqs.params.threads)], **mmseqs.limits.kwargs())
+
+        self._queue: "queue.Queue[Optional[Tuple[pd.DataFrame, Future]]]" = queue.Queue()
+        self._closed = False
+        self._worker = threading.Thread(target=self._serve, daemon=True)
+        self._worker.start()
+
+    def submit(self, query_sequences:SequenceData) -> "Future[pd.DataFrame]":
+        """
+        Queues a search of query_sequences against the target.
+
+        Returns
+        -------
+        - :Future: resolves to the hits of these queries, as returned by
+            MMseqs2.run.
+        """
+        if self._closed:
+            raise RuntimeError("Searcher is closed.")
+        future: Future = Future()
+        self._queue.put((_sequence_frame(query_sequences), future))
+        return future
+
+    def search(self, query_sequences:SequenceData, timeout:Optional[float]=None) -> pd.DataFrame:
+        "Searches query_sequences against the target and waits for the hits."
+        return self.submit(query_sequences).result(timeout=timeout)
+
+    def _serve(self) -> None:
+        "Worker loop: collects a batch of requests, then searches it."
+        stop = False
+        while not stop:
+            request = self._queue.get()
+            if request is None:
+                return
+            batch, n_queries = [request], len(request[0])
+            deadline = time.monotonic() + self.max_wait
+            while n_queries < self.max_batch_size:
+                try:
+                    request = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if request is None:
+                    stop = True
+                    break
+                batch.append(request)
+                n_queries += len(request[0])
+            self._search_batch(batch)
+
+    def _search_batch(self, batch:List[Tuple[pd.DataFrame, Future]]) -> None:
+        "Searches the queries of several requests at once and splits the hits."
+        batch = [(queries, future) for queries, future in batch
+                 if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        start = time.perf_counter()
+        batch_dir = tempfile.mkdtemp(prefix="batch_", dir=self.work_dir)
+        try:
+            results, error = self._search_requests([queries for queries, _ in batch], batch_dir), None
+        except Exception as e:
+            results, error = None, e
+        finally:
+            shutil.rmtree(batch_dir, ignore_errors=True)
+        # Stats are updated before the requests are resolved.
+        self.stats["requests"] += len(batch)
+        self.stats["batches"] += 1
+        self.stats["queries"] += sum(len(queries) for queries, _ in batch)
+        self.stats["search_time"] += time.perf_counter() - start
+        for i, (_, future) in enumerate(batch):
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(results[i])
+
+    def _search_requests(self, requests:List[pd.DataFrame], batch_dir:str) -> List[pd.DataFrame]:
+        "Hits of every request, from one search of all their queries."
+        # Queries are renamed q<position>, so requests may share accessions.
+        sizes = np.array([len(queries) for queries in requests])
+        names = pd.concat([_accessions(queries["Header"]) for queries in requests],
+                          ignore_index=True)
+        renamed = pd.DataFrame({
+            "Header": [f"q{i}" for i in range(len(names))],
+            "Sequence": pd.concat([queries["Sequence"] for queries in requests],
+                                  ignore_index=True)})
+        query_fasta = handle_sequence_data(renamed, os.path.join(batch_dir, "query.fasta"))
+        output_file = os.path.join(batch_dir, "output_file")
+        self.mmseqs._search(query_fasta, self.target, output_file, batch_dir)
+
+        if os.path.getsize(output_file):
+            hits = _read_tblastout(output_file)
+        else:
+            columns = (EXTENDED_TBLAST_COLUMNS if self.mmseqs.params.extended_output
+                       else TBLAST_COLUMNS)
+            hits = pd.DataFrame({column: pd.Series(dtype=TBLAST_DTYPES[column])
+                                 for column in columns})
+        positions = hits["Query_Accession"].astype(str).str[1:].astype(np.int64).to_numpy()
+        hits["Query_Accession"] = names.to_numpy(dtype=object)[positions]
+        request_of_hit = np.searchsorted(np.cumsum(sizes), positions, side="right")
+        return [_transform_tblastout(hits[request_of_hit == i].reset_index(drop=True))
+                .sort_values("Log_E_Value", ascending=False) for i in range(len(requests))]
+
+    def close(self) -> None:
+        "Serves the queued requests, stops the worker and removes the temp directory."
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join()
+        self._target_database.close()
+        if self._temp_dir is not None:
+            self._temp_dir.cleanup()
+
+    def __enter__(self) -> "MMseqs2Searcher":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,91 @@
+"""Sharded execution of searches over a bounded pool of subprocesses."""
+
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Union
+
+def split_fasta(fasta:Union[os.PathLike, str], shard_dir:Union[os.PathLike, str],
+                shard_size:int) -> List[str]:
+    """
+    Splits a FASTA file into shards of at most shard_size sequences,
+    streaming it line by line.
+
+    Parameters
+    ----------
+    - fasta: path to FASTA file.
+    - shard_dir: path: directory for the shard files.
+    - shard_size: int: maximum number of sequences per shard.
+
+    Returns
+    -------
+    - :list of str: shard paths, in input order.
+    """
+    if shard_size < 1:
+        raise ValueError("Invalid shard_size value.")
+    os.makedirs(shard_dir, exist_ok=True)
+
+    shards, shard, n_sequences = [], None, 0
+    with open(fasta, "r", encoding="utf-8") as fastafile:
+        for line in fastafile:
+            if line.startswith(">"):
+                if shard is None or n_sequences == shard_size:
+                    if shard is not None:
+                        shard.close()
+                    shards.append(os.path.join(shard_dir, f"shard_{len(shards):05d}.fasta"))
+                    shard = open(shards[-1], "w", encoding="utf-8")
+                    n_sequences = 0
+                n_sequences += 1
+            if shard is not None:
+                shard.write(line)
+    if shard is not None:
+        shard.close()
+    return shards
+
+def concatenate_files(paths:List[str], output:Union[os.PathLike, str],
+                      buffer_size:int=1 << 20) -> None:
+    "Concatenates files in order into output, streaming them in fixed-size blocks."
+    with open(output, "wb") as out:
+        for path in paths:
+            with open(path, "rb") as f:
+                shutil.copyfileobj(f, out, buffer_size)
+
+def run_shards(search:Callable[[str, str], None], shards:List[str], outputs:List[str],
+               max_workers:int=1, retries:int=1) -> None:
+    """
+    Runs search(shard, output) for every shard with at most max_workers
+    searches at a time.
+
+    Each search spawns its own aligner subprocess, so a thread pool is enough
+    to bound the number of concurrent processes. A shard whose search fails,
+    or does not produce its output, is retried alone up to `retries` times.
+
+    Parameters
+    ----------
+    - search: Callable: runs one shard, writes tabular hits to output.
+    - shards: list of str: shard FASTA paths.
+    - outputs: list of str: output path of each shard.
+    - max_workers: int: maximum number of concurrent searches. Default: 1.
+    - retries: int: retries per failed shard. Default: 1.
+    """
+    if max_workers < 1:
+        raise ValueError("Invalid max_workers value.")
+
+    def run_shard(shard:str, output:str) -> None:
+        for attempt in range(retries + 1):
+            if attempt and os.path.exists(output):
+                os.remove(output)
+            try:
+                search(shard, output)
+                if not os.path.exists(output):
+                    raise RuntimeError(f"Search produced no output for shard {shard}.")
+                return
+            except Exception:
+                if attempt == retries:
+                    raise
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(run_shard, shard, output)
+                   for shard, output in zip(shards, outputs)]
+        for future in futures:
+            future.result()
@@ -1,11 +1,14 @@
 """Helper functions for the similarity sub-module."""
 
-from typing import Dict, Tuple
+import os
+from typing import Dict, Iterator, List, Optional, Tuple
 
 import pandas as pd
 import numpy as np
+from ._streaming import external_sort, hash_partition
 
-def _compute_log_evalue(evalues:np.ndarray, epsilon:float=1E-300) -> np.ndarray:
+def _compute_log_evalue(evalues:np.ndarray, epsilon:float=1E-300,
+                        smallest_nonzero:Optional[float]=None) -> np.ndarray:
     """
     Apply -log10 transformation to E-values.
     E-values with value 0, replace with smallest non-zero E-value, 
@@ -16,16 +19,24 @@ def _compute_log_evalue(evalues:np.ndarray, epsilon:float=1E-300) -> np.ndarray:
     E-values : np.array: float: E-values.
     epsilon : float: safety lower bound for valid E-values when all 
         E-values are zero or negative.
+    smallest_nonzero : float: replacement for zero E-values. Default: computed
+        from `evalues`. Chunked readers pass the file-wide value so that every
+        chunk is transformed consistently.
 
     Returns
     -------
     : np.array: float: -log10 E-values
     """
-    smallest_nonzero = np.min(evalues[evalues > 0.0]) if np.any(evalues > 0.0) else epsilon
+    if smallest_nonzero is None:
+        smallest_nonzero = _smallest_nonzero(evalues, epsilon)
     positive_evalues = np.where(evalues < 0.0, np.nan, evalues)
     safe_evalues = np.where(positive_evalues == 0.0, smallest_nonzero, positive_evalues)
     return -np.log10(safe_evalues)
 
+def _smallest_nonzero(evalues:np.ndarray, epsilon:float=1E-300) -> float:
+    "Smallest positive E-value, or epsilon when there is none."
+    return np.min(evalues[evalues > 0.0]) if np.any(evalues > 0.0) else epsilon
+
 def _alphabetized_accessions(accessions:Dict[str,str]) -> Tuple[str,str]:
     """
     For a pair of query and target accesssions, return alphabetized tuple.
@@ -38,7 +49,96 @@ def _alphabetized_accessions(accessions:Dict[str,str]) -> Tuple[str,str]:
     _max = max(query_accession, target_accession)
     return (_min, _max)
 
-def _read_tblastout(path_or_buff, sep:str="\t") -> pd.DataFrame:
+TBLAST_COLUMNS = [
+    "Query_Accession", "Target_Accession", "Percent_Identity", "Alignment_Length",
+    "Mismatches", "Gap_Openings", "Query_Start", "Query_End", "Target_Start", "Target_End",
+    "E_Value", "Bit_Score"
+]
+
+TBLAST_DTYPES = {
+    "Query_Accession": object,
+    "Target_Accession": object,
+    "Percent_Identity": np.float64,
+    "Alignment_Length": np.int64,
+    "Mismatches": np.int64,
+    "Gap_Openings": np.int64,
+    "Query_Start": np.int64,
+    "Query_End": np.int64,
+    "Target_Start": np.int64,
+    "Target_End": np.int64,
+    "E_Value": np.float64,
+    "Bit_Score": np.float64,
+    "Query_Length": np.int64,
+    "Target_Length": np.int64,
+}
+
+# Extended output formats append the query and target lengths (qlen, slen).
+LENGTH_COLUMNS = ["Query_Length", "Target_Length"]
+EXTENDED_TBLAST_COLUMNS = TBLAST_COLUMNS + LENGTH_COLUMNS
+
+CollapseModes = ["bit_score", "evalue"]
+
+FINAL_COLUMNS = [
+    "Accession_1", "Accession_2", "Percent_Identity", "Alignment_Length",
+    "Mismatches", "Gap_Openings", "Query_Start", "Query_End", "Target_Start", "Target_End",
+    "E_Value", "Bit_Score", "Log_E_Value"
+]
+
+EXTENDED_FINAL_COLUMNS = FINAL_COLUMNS + LENGTH_COLUMNS + ["Query_Coverage", "Target_Coverage"]
+
+def _alphabetized_accession_columns(query_accessions:pd.Series,
+                                    target_accessions:pd.Series) -> Tuple[pd.Categorical, pd.Categorical]:
+    """
+    Vectorized equivalent of _alphabetized_accessions over two accession columns.
+    Both columns are encoded against one sorted category table, so the
+    alphabetical min/max reduces to an integer min/max over category codes.
+
+    Parameters
+    ----------
+    - query_accessions: pd.Series: query accessions.
+    - target_accessions: pd.Series: target accessions.
+
+    Returns
+    -------
+    : tuple of pd.Categorical: (Accession_1, Accession_2) sharing the same categories.
+    """
+    n_rows = len(query_accessions)
+    codes, categories = pd.factorize(
+        np.concatenate([np.asarray(query_accessions, dtype=object),
+                        np.asarray(target_accessions, dtype=object)]),
+        sort=True)
+    query_codes, target_codes = codes[:n_rows], codes[n_rows:]
+    accession_1 = pd.Categorical.from_codes(np.minimum(query_codes, target_codes), categories)
+    accession_2 = pd.Categorical.from_codes(np.maximum(query_codes, target_codes), categories)
+    return accession_1, accession_2
+
+def _tblastout_columns(path_or_buff, sep:str="\t") -> List[str]:
+    """
+    Columns of tblastout, TBLAST_COLUMNS or EXTENDED_TBLAST_COLUMNS, from the
+    number of fields of its first line. Buffers are rewound after the first
+    line; non-seekable buffers are assumed to hold the classic 12 columns.
+    """
+    if isinstance(path_or_buff, (str, os.PathLike)):
+        with open(path_or_buff, encoding="utf-8") as f:
+            line = f.readline()
+    elif hasattr(path_or_buff, "seekable") and path_or_buff.seekable():
+        position = path_or_buff.tell()
+        line = path_or_buff.readline()
+        path_or_buff.seek(position)
+    else:
+        return TBLAST_COLUMNS
+    if isinstance(line, bytes):
+        line = line.decode("utf-8")
+    line = line.rstrip("\r\n")
+    if not line:
+        return TBLAST_COLUMNS
+    n_fields = len(line.split(sep))
+    for columns in (TBLAST_COLUMNS, EXTENDED_TBLAST_COLUMNS):
+        if n_fields == len(columns):
+            return columns
+    raise ValueError(f"Unrecognized tblastout format with {n_fields} columns.")
+
+def _read_tblastout(path_or_buff, sep:str="\t", columns:Optional[List[str]]=None) -> pd.DataFrame:
     """
     Parses blast standard output.
 
@@ -46,39 +146,227 @@ def _read_tblastout(path_or_buff, sep:str="\t") -> pd.DataFrame:
     ----------
     - path_or_buff: path to tblastout file. 
     - sep: str: separator character.
+    - columns: list of str: TBLAST_COLUMNS or EXTENDED_TBLAST_COLUMNS.
+        Default: None, detected from the first line.
 
     Returns
     -------
-    pd.DataFrame: 
-    """
-    tblast_columns = [
-        "Query_Accession", "Target_Accession", "Percent_Identity", "Alignment_Length",
-        "Mismatches", "Gap_Openings", "Query_Start", "Query_End", "Target_Start", "Target_End",
-        "E_Value", "Bit_Score"
-    ]
-    tblast_columns_float = [
-        "Percent_Identity", "E_Value", "Bit_Score"
-    ]
-    tblast_columns_int = [
-        "Alignment_Length", "Mismatches", "Gap_Openings", "Query_Start", "Query_End", 
-        "Target_Start", "Target_End"
-    ]
-    df = pd.read_csv(path_or_buff, sep=sep, names=tblast_columns)
-    df[tblast_columns_float] = df[tblast_columns_float].astype(float)
-    df[tblast_columns_int] = df[tblast_columns_int].astype(int)
-    return df
+    pd.DataFrame: numeric columns are parsed directly to their final dtypes.
+    """
+    if columns is None:
+        columns = _tblastout_columns(path_or_buff, sep)
+    return pd.read_csv(path_or_buff, sep=sep, names=columns, dtype=TBLAST_DTYPES,
+                       header=None)
+
+def _coverages(df:pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fraction of the query and of the target covered by each alignment,
+    from the alignment coordinates and the Query_Length/Target_Length
+    columns of extended outputs.
+    """
+    if not set(LENGTH_COLUMNS).issubset(df.columns):
+        raise ValueError("Coverage requires the Query_Length and Target_Length columns "
+                         "of an extended output format.")
+    query = ((np.abs(df["Query_End"].to_numpy() - df["Query_Start"].to_numpy()) + 1)
+             / df["Query_Length"].to_numpy())
+    target = ((np.abs(df["Target_End"].to_numpy() - df["Target_Start"].to_numpy()) + 1)
+              / df["Target_Length"].to_numpy())
+    return query, target
 
-def read_transform_tblastout(path_or_buff, sep:str="\t") -> pd.DataFrame:
+def _transform_tblastout(df:pd.DataFrame, smallest_nonzero:Optional[float]=None) -> pd.DataFrame:
+    """
+    Adds Log_E_Value and alphabetized Accession_1/Accession_2 columns
+    to parsed tblastout, and Query_Coverage/Target_Coverage to extended
+    tblastout.
+    """
+    df["Log_E_Value"] = _compute_log_evalue(df["E_Value"].to_numpy(),
+                                            smallest_nonzero=smallest_nonzero)
+    df["Accession_1"], df["Accession_2"] = _alphabetized_accession_columns(
+        df["Query_Accession"], df["Target_Accession"])
+    if "Query_Length" not in df:
+        return df[FINAL_COLUMNS]
+    df["Query_Coverage"], df["Target_Coverage"] = _coverages(df)
+    return df[EXTENDED_FINAL_COLUMNS]
+
+def read_transform_tblastout(path_or_buff, sep:str="\t", collapse:Optional[str]=None,
+                             min_coverage:Optional[float]=None,
+                             chunksize:int=1_000_000) -> pd.DataFrame:
     """
     Read and transform tblastout.
+
+    Accession_1 and Accession_2 are returned as categoricals sharing
+    one alphabetically sorted category table. Extended outputs, with the
+    query and target lengths, also get Query_Length, Target_Length,
+    Query_Coverage and Target_Coverage columns.
+
+    Parameters
+    ----------
+    - path_or_buff: path to tblastout file.
+    - sep: str: separator character.
+    - collapse: str: drop self hits and keep the best hit per unordered
+        accession pair, "bit_score" (max Bit_Score) or "evalue" (min E_Value).
+        Default: None, keep every hit.
+    - min_coverage: float: keep hits covering at least this fraction of
+        both the query and the target, requires an extended output format.
+        The file is then parsed `chunksize` rows at a time and filtered
+        chunk by chunk. Default: None.
+    - chunksize: int: rows parsed at a time when filtering. Default: 1,000,000.
+    """
+    columns = _tblastout_columns(path_or_buff, sep)
+    if min_coverage is None:
+        df = _transform_tblastout(_read_tblastout(path_or_buff, sep, columns))
+    else:
+        # Zero E-values still take the smallest non-zero E-value of the whole file.
+        chunks, smallest = [], np.inf
+        with pd.read_csv(path_or_buff, sep=sep, names=columns, dtype=TBLAST_DTYPES,
+                         header=None, chunksize=chunksize) as reader:
+            for chunk in reader:
+                smallest = min(smallest, _smallest_nonzero(chunk["E_Value"].to_numpy(), np.inf))
+                chunks.append(_filter_tblastout(chunk, min_coverage=min_coverage))
+        df = _transform_tblastout(pd.concat(chunks, ignore_index=True),
+                                  smallest if np.isfinite(smallest) else None)
+    if collapse is not None:
+        df = _collapse_hits(df, collapse)
+    return df.sort_values("Log_E_Value", ascending=False)
+
+def _collapse_hits(df:pd.DataFrame, collapse:str) -> pd.DataFrame:
     """
-    final_columns = [
-        "Accession_1", "Accession_2", "Percent_Identity", "Alignment_Length",
-        "Mismatches", "Gap_Openings", "Query_Start", "Query_End", "Target_Start", "Target_End",
-        "E_Value", "Bit_Score", "Log_E_Value"
-    ]
-    df = _read_tblastout(path_or_buff, sep)
-    df["Log_E_Value"] = _compute_log_evalue(df["E_Value"])
-    df[["Accession_1", "Accession_2"]] = df[["Query_Accession", "Target_Accession"]].apply(
-        _alphabetized_accessions, axis=1).to_list()
-    return df.sort_values("Log_E_Value", ascending=False)[final_columns]
+    Drops self hits and keeps the best hit per unordered accession pair.
+    Ties on the primary criterion are broken by the other one.
+
+    Parameters
+    ----------
+    - df: pd.DataFrame: transformed tblastout.
+    - collapse: str: "bit_score" or "evalue".
+    """
+    if collapse not in CollapseModes:
+        raise ValueError("Invalid collapse value.")
+    df = _drop_self_hits(df)
+    if collapse == "bit_score":
+        order = df.sort_values(["Bit_Score", "E_Value"], ascending=[False, True], kind="stable")
+    else:
+        order = df.sort_values(["E_Value", "Bit_Score"], ascending=[True, False], kind="stable")
+    df = order.drop_duplicates(["Accession_1", "Accession_2"], keep="first")
+    df = df.copy()
+    df["Accession_1"], df["Accession_2"] = _alphabetized_accession_columns(
+        df["Accession_1"], df["Accession_2"])
+    return df
+
+def _drop_self_hits(df:pd.DataFrame) -> pd.DataFrame:
+    "Drops hits where both accessions are the same."
+    is_self = (np.asarray(df["Accession_1"], dtype=object) ==
+               np.asarray(df["Accession_2"], dtype=object))
+    return df[~is_self]
+
+def _filter_tblastout(df:pd.DataFrame, max_evalue:Optional[float]=None,
+                      min_bit_score:Optional[float]=None,
+                      min_identity:Optional[float]=None,
+                      min_coverage:Optional[float]=None) -> pd.DataFrame:
+    """
+    Drops hits failing the E-value, bit score, percent identity or coverage
+    thresholds. Thresholds set to None are ignored. `min_coverage` applies
+    to both the query and the target coverage.
+    """
+    mask = np.ones(len(df), dtype=bool)
+    if max_evalue is not None:
+        mask &= df["E_Value"].to_numpy() <= max_evalue
+    if min_bit_score is not None:
+        mask &= df["Bit_Score"].to_numpy() >= min_bit_score
+    if min_identity is not None:
+        mask &= df["Percent_Identity"].to_numpy() >= min_identity
+    if min_coverage is not None:
+        query_coverage, target_coverage = _coverages(df)
+        mask &= np.minimum(query_coverage, target_coverage) >= min_coverage
+    return df if mask.all() else df[mask]
+
+def _scan_smallest_nonzero(path_or_buff, sep:str="\t", chunksize:int=1_000_000,
+                           epsilon:float=1E-300) -> Optional[float]:
+    """
+    Computes the file-wide smallest non-zero E-value reading only the E-value column.
+    Returns None when the input cannot be read twice (non-seekable buffers).
+    """
+    position = None
+    if not isinstance(path_or_buff, (str, os.PathLike)):
+        if not (hasattr(path_or_buff, "seekable") and path_or_buff.seekable()):
+            return None
+        position = path_or_buff.tell()
+
+    smallest = np.inf
+    with pd.read_csv(path_or_buff, sep=sep, header=None, usecols=[10], names=["E_Value"],
+                     dtype={"E_Value": np.float64}, chunksize=chunksize) as reader:
+        for chunk in reader:
+            evalues = chunk["E_Value"].to_numpy()
+            evalues = evalues[evalues > 0.0]
+            if len(evalues):
+                smallest = min(smallest, evalues.min())
+
+    if position is not None:
+        path_or_buff.seek(position)
+    return smallest if np.isfinite(smallest) else epsilon
+
+def iter_tblastout(path_or_buff, chunksize:int=1_000_000, sep:str="\t",
+                   max_evalue:Optional[float]=None, min_bit_score:Optional[float]=None,
+                   min_identity:Optional[float]=None, min_coverage:Optional[float]=None,
+                   collapse:Optional[str]=None, num_partitions:int=64, sort:bool=False,
+                   temp_dir:Optional[os.PathLike]=None) -> Iterator[pd.DataFrame]:
+    """
+    Streams tblastout as parsed and transformed chunks with bounded memory.
+
+    Thresholds are applied to every chunk as soon as it is parsed, so filtered
+    hits are never materialized. Zero E-values are replaced by the file-wide
+    smallest non-zero E-value, which costs one extra pass over the E-value
+    column; inputs that cannot be re-read fall back to the per-chunk value.
+
+    Parameters
+    ----------
+    - path_or_buff: path to tblastout file.
+    - chunksize: int: number of rows parsed at a time. Default: 1,000,000.
+    - sep: str: separator character.
+    - max_evalue: float: keep hits with E_Value <= max_evalue.
+    - min_bit_score: float: keep hits with Bit_Score >= min_bit_score.
+    - min_identity: float: keep hits with Percent_Identity >= min_identity.
+    - min_coverage: float: keep hits with Query_Coverage and Target_Coverage
+        >= min_coverage, requires an extended output format.
+    - collapse: str: drop self hits and keep the best hit per unordered
+        accession pair, "bit_score" (max Bit_Score) or "evalue" (min E_Value).
+        Chunks are hash-partitioned on the accession pair and spilled to
+        `temp_dir`, so every partition is reduced independently. Default: None.
+    - num_partitions: int: number of hash partitions used by `collapse`.
+        Default: 64.
+    - sort: bool: yield hits ordered by descending Log_E_Value, as
+        read_transform_tblastout does, using an external merge sort that
+        spills sorted runs to `temp_dir` and buffers about `chunksize` rows
+        while merging them. Default: False.
+    - temp_dir: path: directory for spilled runs and partitions.
+        Default: system temp dir.
+
+    Yields
+    ------
+    - :pd.DataFrame: chunk with the read_transform_tblastout columns.
+    """
+    columns = _tblastout_columns(path_or_buff, sep)
+    smallest_nonzero = _scan_smallest_nonzero(path_or_buff, sep, chunksize)
+    chunks = _iter_filtered_chunks(path_or_buff, chunksize, sep, smallest_nonzero, columns,
+                                   max_evalue=max_evalue, min_bit_score=min_bit_score,
+                                   min_identity=min_identity, min_coverage=min_coverage)
+    if collapse is not None:
+        if collapse not in CollapseModes:
+            raise ValueError("Invalid collapse value.")
+        chunks = (_collapse_hits(partition, collapse) for partition in hash_partition(
+            (_drop_self_hits(chunk) for chunk in chunks), ["Accession_1", "Accession_2"],
+            num_partitions=num_partitions, temp_dir=temp_dir))
+    if sort:
+        chunks = external_sort(chunks, "Log_E_Value", ascending=False,
+                               block_rows=chunksize, temp_dir=temp_dir)
+    yield from chunks
+
+def _iter_filtered_chunks(path_or_buff, chunksize:int, sep:str,
+                          smallest_nonzero:Optional[float], columns:List[str],
+                          **thresholds) -> Iterator[pd.DataFrame]:
+    "Parses, filters and transforms tblastout one chunk at a time."
+    with pd.read_csv(path_or_buff, sep=sep, names=columns, dtype=TBLAST_DTYPES,
+                     header=None, chunksize=chunksize) as reader:
+        for chunk in reader:
+            chunk = _filter_tblastout(chunk, **thresholds)
+            if len(chunk):
+                yield _transform_tblastout(chunk.copy(), smallest_nonzero)
@@ -0,0 +1,335 @@
+"""
+In-process Smith-Waterman search with NumPy, for jobs too small to amortize
+the startup of a command-line aligner.
+
+Pairs of sequences are aligned in batches: the dynamic programming matrices
+of every pair of a batch are computed together, one query row at a time,
+with the Gotoh recurrences for affine gaps (a gap of length L costs
+gap_open + L * gap_extend). Within a row, the vertical gap (F) and diagonal
+terms only depend on the previous row, and the horizontal gap (E) term
+
+    E[j] = max over k < j of H[k] - gap_open - gap_extend * (j - k)
+
+is a prefix maximum of H[k] + gap_extend * k, one np.maximum.accumulate
+over the row. E is computed from the row without horizontal gaps, which
+gives the same scores as long as gap_open >= 0: extending a gap is never
+worse than closing it and opening another one.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import os
+from typing import Dict, List, Optional, Tuple, Union
+import numpy as np
+import pandas as pd
+from ..utils._utils import SequenceData
+from ._collapse import _accessions, _collapse_search_inputs, _sequence_frame, expand_hits
+from ._hit_store import write_hit_table
+from ._parameters import SmithWatermanParameters
+from ._scoring import (
+    BLOSUM62, BLOSUM62_ALPHABET, BLOSUM62_GAP_COSTS, bit_scores, encode_sequence, evalues,
+    score_cutoffs
+)
+from ._similarity_utils import _filter_tblastout, _transform_tblastout
+from ._wrapper import SimilarityWrapper
+
+# Padding residue, scored low enough that no alignment goes through it.
+_PAD = len(BLOSUM62_ALPHABET)
+_MATRIX = np.full((_PAD + 1, _PAD + 1), -(1 << 20), dtype=np.int32)
+_MATRIX[:_PAD, :_PAD] = BLOSUM62
+_NEG = -(1 << 28)
+
+# Traceback bits of a cell: source of H (0: start, 1: diagonal, 2: E,
+# 3: F), and whether E and F open a gap rather than extend one.
+_E_OPEN, _F_OPEN = 4, 8
+
+class SmithWaterman(SimilarityWrapper):
+    """
+    In-process local aligner with the interface of BlastP, Diamond and
+    MMseqs2: vectorized Smith-Waterman over BLOSUM62 with affine gaps, and
+    Karlin-Altschul E-values and bit scores.
+
+    Nothing is written to disk and no process is started for a single
+    batch of pairs, which makes it faster than the command-line aligners for
+    small jobs (tens of sequences); larger jobs are split into batches
+    aligned by a process pool. Every query-target pair is aligned, so the
+    cost grows with the product of the query and target lengths.
+
+    Hits follow blastp tabular output: one hit per pair, Percent_Identity
+    in percent, 1-based inclusive coordinates. E-values use the total
+    length of the target sequences as database size, without BLAST's edge
+    length correction.
+    """
+    engine = "smith-waterman"
+
+    def __init__(self, params:Optional[SmithWatermanParameters]=None):
+        super().__init__(path_to_binary="", database_cache=None)
+        self.params = params if params is not None else SmithWatermanParameters()
+
+    def run(self, query_sequences:SequenceData, target_sequences:SequenceData,
+            output:Optional[os.PathLike]=None, output_format:str="parquet",
+            collapse_identical:bool=False,
+            min_coverage:Optional[float]=None) -> Union[pd.DataFrame, str]:
+        """
+        Computes pairwise alignments of query sequences against target sequences.
+
+        Parameters
+        ----------
+        - query_sequences: SEQUENCE_DATA
+        - target_sequences: SEQUENCE_DATA
+        - output: path: write hits to a partitioned hit table directory
+            instead of returning a DataFrame. Default: None.
+        - output_format: str: hit table format, "parquet" or "arrow".
+            Default: "parquet".
+        - collapse_identical: bool: align one representative per distinct
+            sequence, then expand the hits to every sequence sharing it.
+            E-values are still computed against the uncollapsed targets.
+            Default: False.
+        - min_coverage: float: keep hits covering at least this fraction of
+            both the query and the target. Requires extended_output in the
+            parameters. Default: None.
+
+        Returns
+        -------
+        - :pd.DataFrame | str: pairwise alignment, or path to the hit table
+            when `output` is set.
+        """
+        if min_coverage is not None and not self.params.extended_output:
+            raise ValueError("Coverage filtering requires extended_output in the engine parameters.")
+        query_members, target_members, database_length = None, None, None
+        if collapse_identical:
+            (query_sequences, query_members, target_sequences, target_members,
+             database_length) = _collapse_search_inputs(query_sequences, target_sequences)
+
+        queries, targets = _sequence_frame(query_sequences), _sequence_frame(target_sequences)
+        df = self._search_frames(queries, targets, database_length)
+        if collapse_identical:
+            df = expand_hits(df, query_members, target_members)
+        df = _filter_tblastout(df, min_coverage=min_coverage)
+        df = _transform_tblastout(df.reset_index(drop=True)).sort_values(
+            "Log_E_Value", ascending=False)
+        if output is None:
+            return df
+        return write_hit_table(df, output, output_format=output_format)
+
+    def _search_frames(self, queries:pd.DataFrame, targets:pd.DataFrame,
+                       database_length:Optional[int]=None) -> pd.DataFrame:
+        """
+        Tabular hits (TBLAST_COLUMNS) of queries against targets, with
+        E-values computed against database_length residues. Default: the
+        residues of targets.
+        """
+        query_codes = [encode_sequence(s) for s in queries["Sequence"].astype(str).tolist()]
+        target_codes = [encode_sequence(s) for s in targets["Sequence"].astype(str).tolist()]
+        query_lengths = np.array([len(c) for c in query_codes], dtype=np.int64)
+        target_lengths = np.array([len(c) for c in target_codes], dtype=np.int64)
+        query_index, target_index = _pairs(len(query_codes), len(target_codes))
+        lambda_, k = BLOSUM62_GAP_COSTS[self.params.gap_open, self.params.gap_extend]
+        if database_length is None:
+            database_length = int(target_lengths.sum())
+        # Alignments are only traced back for scores that may pass the E-value cutoff.
+        cutoffs = np.floor(score_cutoffs(query_lengths[query_index], database_length,
+                                         self.params.evalue, lambda_, k))
+
+        batches = _batches(query_lengths[query_index], target_lengths[target_index],
+                           self.params.max_cells)
+        query_jobs, target_jobs, slot_jobs = [], [], []
+        for batch in batches:
+            targets_of_batch, slots = np.unique(target_index[batch], return_inverse=True)
+            query_jobs.append([query_codes[i] for i in query_index[batch].tolist()])
+            target_jobs.append([target_codes[i] for i in targets_of_batch.tolist()])
+            slot_jobs.append(slots)
+        args = (query_jobs, target_jobs, slot_jobs, (cutoffs[batch] for batch in batches),
+                repeat(self.params.gap_open), repeat(self.params.gap_extend))
+        if self.params.threads == 1 or len(batches) <= 1:
+            results = list(map(_align_pairs, *args))
+        else:
+            with ProcessPoolExecutor(max_workers=min(self.params.threads, len(batches))) as executor:
+                results = list(executor.map(_align_pairs, *args))
+
+        order = np.concatenate(batches) if batches else np.zeros(0, dtype=np.int64)
+        hits = {key: np.concatenate([result[key] for result in results]) if results else
+                np.zeros(0, dtype=np.int64) for key in _ALIGNMENT_FIELDS}
+        query_index, target_index = query_index[order], target_index[order]
+
+        scores = hits["Score"].astype(np.float64)
+        evalue = evalues(scores, query_lengths[query_index], database_length, lambda_, k)
+        keep = (hits["Score"] > 0) & (evalue <= self.params.evalue)
+        query_index, target_index = query_index[keep], target_index[keep]
+        hits = {key: values[keep] for key, values in hits.items()}
+
+        df = pd.DataFrame({
+            "Query_Accession": _accessions(queries["Header"]).to_numpy(dtype=object)[query_index],
+            "Target_Accession": _accessions(targets["Header"]).to_numpy(dtype=object)[target_index],
+            "Percent_Identity": 100.0 * hits["Identities"] / np.maximum(hits["Alignment_Length"], 1),
+            "Alignment_Length": hits["Alignment_Length"],
+            "Mismatches": hits["Mismatches"],
+            "Gap_Openings": hits["Gap_Openings"],
+            "Query_Start": hits["Query_Start"],
+            "Query_End": hits["Query_End"],
+            "Target_Start": hits["Target_Start"],
+            "Target_End": hits["Target_End"],
+            "E_Value": evalue[keep],
+            "Bit_Score": bit_scores(scores[keep], lambda_, k),
+        })
+        if self.params.extended_output:
+            df["Query_Length"] = query_lengths[query_index]
+            df["Target_Length"] = target_lengths[target_index]
+        return df
+
+_ALIGNMENT_FIELDS = [
+    "Score", "Identities", "Mismatches", "Gap_Openings", "Alignment_Length",
+    "Query_Start", "Query_End", "Target_Start", "Target_End"
+]
+
+def _pairs(n_queries:int, n_targets:int):
+    "Query and target index of every query-target pair."
+    return (np.repeat(np.arange(n_queries), n_targets),
+            np.tile(np.arange(n_targets), n_queries))
+
+def _batches(query_lengths:np.ndarray, target_lengths:np.ndarray,
+             max_cells:int) -> List[np.ndarray]:
+    """
+    Splits pairs into batches of at most max_cells padded cells. Pairs are
+    sorted by query then target length, so pairs of a batch have similar
+    lengths and little padding.
+    """
+    order = np.lexsort((target_lengths, query_lengths))
+    batches, start, max_m, max_n = [], 0, 0, 0
+    for position, pair in enumerate(order.tolist()):
+        m, n = max(max_m, int(query_lengths[pair])), max(max_n, int(target_lengths[pair]))
+        if position > start and (position - start + 1) * m * (n + 1) > max_cells:
+            batches.append(order[start:position])
+            start, m, n = position, int(query_lengths[pair]), int(target_lengths[pair])
+        max_m, max_n = m, n
+    if len(order):
+        batches.append(order[start:])
+    return batches
+
+def _padded(codes:List[np.ndarray]) -> np.ndarray:
+    "Residue codes of sequences padded to the longest one."
+    out = np.full((len(codes), max((len(c) for c in codes), default=0)), _PAD, dtype=np.uint8)
+    for row, c in zip(out, codes):
+        row[:len(c)] = c
+    return out
+
+def _align_pairs(queries:List[np.ndarray], targets:List[np.ndarray], target_slots:np.ndarray,
+                 min_scores:np.ndarray, gap_open:int, gap_extend:int) -> Dict[str, np.ndarray]:
+    """
+    Best local alignment of queries[k] against targets[target_slots[k]], for
+    every k. Alignments scoring below min_scores[k] are not traced back,
+    their statistics other than Score are 0.
+
+    Returns
+    -------
+    - :dict of np.ndarray: _ALIGNMENT_FIELDS of every pair, coordinates
+        1-based and inclusive.
+    """
+    padded_queries, padded_targets = _padded(queries), _padded(targets)
+    directions, best, best_i, best_j = _score_pairs(padded_queries, padded_targets, target_slots,
+                                                    gap_open, gap_extend)
+    out = {key: np.zeros(len(queries), dtype=np.int64) for key in _ALIGNMENT_FIELDS}
+    out["Score"] = best
+    for pair in np.flatnonzero((best > 0) & (best >= min_scores)).tolist():
+        statistics = _traceback(directions, pair, queries[pair].tobytes(),
+                                targets[target_slots[pair]].tobytes(),
+                                int(best_i[pair]), int(best_j[pair]))
+        for key, value in zip(_ALIGNMENT_FIELDS[1:], statistics):
+            out[key][pair] = value
+    return out
+
+def _score_pairs(queries:np.ndarray, targets:np.ndarray, target_slots:np.ndarray,
+                 gap_open:int, gap_extend:int):
+    """
+    Fills the dynamic programming matrices of every pair, row by row.
+
+    Substitution scores come from a profile of every target, the score of
+    each residue type against each target position, so that the scores of
+    a row are a gather of whole profile rows.
+
+    Returns
+    -------
+    - directions: np.ndarray: uint8 traceback bits, (query row, pair, target column).
+    - best, best_i, best_j: np.ndarray: best local score of every pair and its cell.
+    """
+    b, m = queries.shape
+    n = targets.shape[1]
+    profile = np.ascontiguousarray(_MATRIX[:, targets].transpose(1, 0, 2))
+    gap_first = gap_open + gap_extend
+    offsets = np.arange(n + 1, dtype=np.int32) * gap_extend
+    pairs = np.arange(b)
+    h = np.zeros((b, n + 1), dtype=np.int32)
+    f = np.full((b, n + 1), _NEG, dtype=np.int32)
+    hp = np.zeros((b, n + 1), dtype=np.int32)
+    diag = np.full((b, n + 1), _NEG, dtype=np.int32)
+    e = np.full((b, n + 1), _NEG, dtype=np.int32)
+    e_open = np.zeros((b, n + 1), dtype=bool)
+    directions = np.zeros((m, b, n + 1), dtype=np.uint8)
+    best = np.zeros(b, dtype=np.int32)
+    best_i, best_j = np.zeros(b, dtype=np.int64), np.zeros(b, dtype=np.int64)
+
+    for i in range(m):
+        np.add(h[:, :-1], profile[target_slots, queries[:, i]], out=diag[:, 1:])
+        h_open, f_extend = h - gap_first, f - gap_extend
+        f_open = h_open >= f_extend
+        np.maximum(h_open, f_extend, out=f)
+        np.maximum(diag, f, out=hp)
+        np.maximum(hp, 0, out=hp)
+        hp[:, 0] = 0
+        scan = np.maximum.accumulate(hp + offsets, axis=1)
+        np.subtract(scan[:, :-1], offsets[1:] + gap_open, out=e[:, 1:])
+        np.greater(hp[:, :-1] - gap_first, e[:, :-1] - gap_extend, out=e_open[:, 1:])
+        h = np.maximum(hp, e)
+
+        # 0 when H is 0, else 1 from the diagonal, else 2 from E, else 3 from F.
+        code = np.uint8(3) - (h == e).view(np.uint8)
+        code -= (h == diag).view(np.uint8) * (code - np.uint8(1))
+        code *= (h != 0).view(np.uint8)
+        code |= e_open.view(np.uint8) * np.uint8(_E_OPEN)
+        code |= f_open.view(np.uint8) * np.uint8(_F_OPEN)
+        directions[i] = code
+
+        j = h.argmax(axis=1)
+        score = h[pairs, j]
+        is_better = score > best
+        best[is_better], best_i[is_better], best_j[is_better] = score[is_better], i + 1, j[is_better]
+    return directions, best, best_i, best_j
+
+def _traceback(directions:np.ndarray, pair:int, query:bytes, target:bytes,
+               i:int, j:int) -> Tuple[int, ...]:
+    """
+    Follows the traceback bits of a pair from its best cell (i, j) back to
+    the start of its alignment.
+
+    Returns
+    -------
+    - :tuple of int: _ALIGNMENT_FIELDS after Score.
+    """
+    end_i, end_j = i, j
+    identities = mismatches = gap_openings = length = 0
+    state = 0  # 0: H, 1: E (gap in the query), 2: F (gap in the target)
+    while i > 0 and j > 0:
+        bits = int(directions[i - 1, pair, j])
+        if state == 0:
+            source = bits & 3
+            if source == 0:
+                break
+            if source > 1:
+                state = source - 1
+                continue
+            if query[i - 1] == target[j - 1]:
+                identities += 1
+            else:
+                mismatches += 1
+            length += 1
+            i, j = i - 1, j - 1
+            continue
+        length += 1
+        if state == 1:
+            j, opens = j - 1, bits & _E_OPEN
+        else:
+            i, opens = i - 1, bits & _F_OPEN
+        if opens:
+            gap_openings += 1
+            state = 0
+    return (identities, mismatches, gap_openings, length, i + 1, end_i, j + 1, end_j)
@@ -0,0 +1,156 @@
+"""Out-of-core helpers for streaming hit tables in bounded memory."""
+
+import os
+import tempfile
+from typing import Iterable, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Smallest block read back per run by the merge, so that merging many runs
+# does not degrade into reading tiny files.
+_MIN_MERGE_ROWS = 1024
+
+class _SpilledRun:
+    """
+    A sorted run spilled to disk as a sequence of pickled blocks,
+    read back one block at a time.
+    """
+
+    def __init__(self, paths:List[str]) -> None:
+        self.paths = paths
+        self._next = 0
+
+    def has_next(self) -> bool:
+        "Whether blocks remain on disk."
+        return self._next < len(self.paths)
+
+    def load_next(self) -> pd.DataFrame:
+        "Loads and deletes the next block."
+        path = self.paths[self._next]
+        self._next += 1
+        block = pd.read_pickle(path)
+        os.remove(path)
+        return block
+
+def _spill(df:pd.DataFrame, prefix:str, block_rows:int) -> List[str]:
+    "Pickles df in blocks of block_rows rows and returns the block paths."
+    paths = []
+    for i, start in enumerate(range(0, len(df), block_rows)):
+        path = f"{prefix}_{i:06d}.pkl"
+        df.iloc[start: start + block_rows].to_pickle(path)
+        paths.append(path)
+    return paths
+
+def external_sort(chunks:Iterable[pd.DataFrame], key:str, ascending:bool=True,
+                  block_rows:int=1_000_000,
+                  temp_dir:Optional[os.PathLike]=None) -> Iterator[pd.DataFrame]:
+    """
+    Sorts a stream of DataFrame chunks by one column without holding all rows in memory.
+
+    Every chunk is sorted and spilled to disk as a run. Once the number of runs
+    is known, each run is split into blocks of block_rows // n_runs rows (at
+    least 1,024), and runs are merged block-wise: at each step, every buffered
+    row that cannot be preceded by a row still on disk is emitted. Memory is
+    bounded by the largest chunk while spilling and by about block_rows rows
+    while merging. Rows with a missing key are emitted last, as
+    DataFrame.sort_values does.
+
+    Parameters
+    ----------
+    - chunks: iterable of pd.DataFrame: chunks sharing the same columns.
+    - key: str: column to sort by.
+    - ascending: bool: sort order. Default: True.
+    - block_rows: int: rows buffered by the merge, across all runs. Default: 1,000,000.
+    - temp_dir: path: directory for spilled runs. Default: system temp dir.
+
+    Yields
+    ------
+    - :pd.DataFrame: sorted chunks.
+    """
+    with tempfile.TemporaryDirectory(dir=temp_dir) as spill_dir:
+        sorted_runs, missing = [], []
+        for i, chunk in enumerate(chunks):
+            is_missing = chunk[key].isna().to_numpy()
+            if is_missing.any():
+                missing.extend(_spill(chunk[is_missing], os.path.join(spill_dir, f"missing_{i:06d}"),
+                                      block_rows))
+                chunk = chunk[~is_missing]
+            chunk = chunk.sort_values(key, ascending=ascending, kind="stable")
+            path = os.path.join(spill_dir, f"sorted_{i:06d}.pkl")
+            chunk.to_pickle(path)
+            sorted_runs.append(path)
+
+        # Split the runs so that one block per run fits in block_rows.
+        run_rows = max(block_rows // max(len(sorted_runs), 1), _MIN_MERGE_ROWS)
+        runs = []
+        for i, path in enumerate(sorted_runs):
+            run = pd.read_pickle(path)
+            os.remove(path)
+            runs.append(_SpilledRun(_spill(run, os.path.join(spill_dir, f"run_{i:06d}"), run_rows)))
+            del run
+
+        # Sign flip so that the merge always works in descending order.
+        sign = -1.0 if ascending else 1.0
+        buffers = [None] * len(runs)
+        while True:
+            for i, run in enumerate(runs):
+                if (buffers[i] is None or buffers[i].empty) and run.has_next():
+                    buffers[i] = run.load_next()
+            active = [i for i, buffer in enumerate(buffers) if buffer is not None and not buffer.empty]
+            if not active:
+                break
+
+            # Rows still on disk for run i are bounded by the last buffered row of run i.
+            pending = [sign * buffers[i][key].iloc[-1] for i in active if runs[i].has_next()]
+            threshold = max(pending) if pending else -np.inf
+
+            emitted = []
+            for i in active:
+                keys = sign * buffers[i][key].to_numpy()
+                n_safe = int(np.sum(keys >= threshold))
+                emitted.append(buffers[i].iloc[:n_safe])
+                buffers[i] = buffers[i].iloc[n_safe:]
+            out = pd.concat(emitted)
+            yield out.sort_values(key, ascending=ascending, kind="stable")
+
+        for path in missing:
+            yield pd.read_pickle(path)
+
+def hash_partition(chunks:Iterable[pd.DataFrame], keys:List[str], num_partitions:int=64,
+                   temp_dir:Optional[os.PathLike]=None) -> Iterator[pd.DataFrame]:
+    """
+    Regroups a stream of DataFrame chunks so that all rows sharing the same
+    `keys` values end up in the same partition.
+
+    Rows are assigned to partitions by hashing the key columns and spilled to
+    disk; partitions are then loaded one at a time. Memory is bounded by the
+    largest chunk or partition, whichever is larger.
+
+    Parameters
+    ----------
+    - chunks: iterable of pd.DataFrame: chunks sharing the same columns.
+    - keys: list of str: columns to group by.
+    - num_partitions: int: number of partitions. Default: 64.
+    - temp_dir: path: directory for spilled partitions. Default: system temp dir.
+
+    Yields
+    ------
+    - :pd.DataFrame: one partition at a time, empty partitions are skipped.
+    """
+    with tempfile.TemporaryDirectory(dir=temp_dir) as spill_dir:
+        partitions = [[] for _ in range(num_partitions)]
+        for i, chunk in enumerate(chunks):
+            hashes = pd.util.hash_pandas_object(chunk[keys], index=False).to_numpy()
+            partition_ids = hashes % np.uint64(num_partitions)
+            for partition_id in np.unique(partition_ids):
+                path = os.path.join(spill_dir, f"partition_{partition_id:05d}_{i:06d}.pkl")
+                chunk[partition_ids == partition_id].to_pickle(path)
+                partitions[partition_id].append(path)
+
+        for paths in partitions:
+            if paths:
+                partition = pd.concat(pd.read_pickle(path) for path in paths)
+                for path in paths:
+                    os.remove(path)
+                yield partition
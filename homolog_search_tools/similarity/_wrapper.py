@@ -0,0 +1,293 @@
+"""Shared workflow of the command-line similarity search wrappers."""
+
+from contextlib import contextmanager
+import copy
+import dataclasses
+from typing import Iterator, Optional, Union
+import tempfile
+import os
+import shutil
+import pandas as pd
+from ..utils._process import CommandLimits
+from ..utils._utils import SequenceData, handle_sequence_data
+from ._checkpoint import JobManifest
+from ._collapse import (
+    _accessions, _collapse_search_inputs, _sequence_frame, expand_tblastout
+)
+from ._database import DatabaseCache, file_digest
+from ._hit_store import collect_tblastout
+from ._incremental import diff_sequences, update_hit_table
+from ._sharding import concatenate_files, run_shards, split_fasta
+from ._similarity_utils import FINAL_COLUMNS
+
+class SimilarityWrapper:
+    """
+    Base class for BlastP, Diamond and MMseqs2.
+
+    Subclasses implement how a target database is built (_build_database),
+    how a target is prepared when no database cache is configured
+    (_prepare_target) and how a single search is run (_search). Every
+    command they run is subject to the wrapper's CommandLimits.
+    """
+    engine = ""
+    # Whether the engine searches a FASTA target without building a database.
+    searches_fasta = False
+
+    def __init__(self, path_to_binary:str, database_cache:Optional[DatabaseCache]=None,
+                 limits:Optional[CommandLimits]=None) -> None:
+        self.path_to_binary = path_to_binary
+        self.database_cache = database_cache
+        self.limits = limits if limits is not None else CommandLimits()
+
+    def run(self, query_sequences:SequenceData, target_sequences:SequenceData,
+            output:Optional[os.PathLike]=None, output_format:str="parquet",
+            shard_size:Optional[int]=None, max_workers:int=1, shard_retries:int=1,
+            work_dir:Optional[os.PathLike]=None, collapse_identical:bool=False,
+            min_coverage:Optional[float]=None) -> Union[pd.DataFrame, str]:
+        """
+        Computes pairwise alignments of query sequences against target sequences.
+
+        Parameters
+        ----------
+        - query_sequences: SEQUENCE_DATA
+        - target_sequences: SEQUENCE_DATA
+        - output: path: write hits to a partitioned hit table directory
+            instead of returning a DataFrame. Default: None.
+        - output_format: str: hit table format, "parquet" or "arrow".
+            Default: "parquet".
+        - shard_size: int: split the queries into shards of shard_size sequences
+            searched concurrently against one prebuilt target database.
+            Default: None, a single search.
+        - max_workers: int: maximum number of concurrent shard searches.
+            Each search uses the threads set in the engine parameters. Default: 1.
+        - shard_retries: int: retries of a failed shard. Default: 1.
+        - work_dir: path: persistent working directory. Completed stages are
+            recorded in <work_dir>/manifest.json and skipped when the job is
+            rerun with the same inputs. Default: None, a temp directory.
+        - collapse_identical: bool: align one representative per distinct
+            sequence, then expand the hits to every sequence sharing it.
+            BlastP and Diamond compute E-values against the residues of the
+            uncollapsed targets (-dbsize, --dbsize) unless dbsize is set in
+            their parameters. MMseqs2 cannot: its E-values are computed
+            against the collapsed targets, so they shrink by the fraction of
+            target residues that were collapsed away, and its E-value cutoff
+            keeps correspondingly more hits. Default: False.
+        - min_coverage: float: keep hits covering at least this fraction of
+            both the query and the target, applied while the output is parsed.
+            Requires extended_output in the engine parameters. Default: None.
+
+        Returns
+        -------
+        - :pd.DataFrame | str: pairwise alignment, or path to the hit table
+            when `output` is set.
+        """
+        if min_coverage is not None and not getattr(self.params, "extended_output", False):
+            raise ValueError("Coverage filtering requires extended_output in the engine parameters.")
+        engine, query_members, target_members = self, None, None
+        if collapse_identical:
+            (query_sequences, query_members, target_sequences, target_members,
+             database_length) = _collapse_search_inputs(query_sequences, target_sequences)
+            engine = self._with_database_length(database_length)
+
+        # Declare temp files.
+        with self._work_dir(work_dir) as temp_dir:
+            manifest = JobManifest(work_dir)
+            output_file = os.path.join(temp_dir, "output_file")
+            query_fasta = handle_sequence_data(query_sequences,
+                                               os.path.join(temp_dir, "query.fasta"))
+            target_fasta = handle_sequence_data(target_sequences,
+                                                os.path.join(temp_dir, "target.fasta"))
+            target_key = file_digest(target_fasta) if manifest.enabled else ""
+            with engine.target_database(target_fasta, temp_dir, prebuilt=shard_size is not None,
+                                        manifest=manifest, target_key=target_key) as target_db:
+                if shard_size is None:
+                    engine._checkpointed_search(manifest, "search", query_fasta, target_db,
+                                                target_key, output_file, temp_dir)
+                else:
+                    engine._search_shards(query_fasta, target_db, output_file, temp_dir,
+                                          shard_size, max_workers, shard_retries,
+                                          manifest=manifest, target_key=target_key)
+
+            if collapse_identical:
+                expanded_file = os.path.join(temp_dir, "expanded_output_file")
+                expand_tblastout(output_file, expanded_file, query_members, target_members)
+                output_file = expanded_file
+            df = collect_tblastout(output_file, output, output_format,
+                                   min_coverage=min_coverage)
+        return df
+
+    def run_allvsall(self, sequences:SequenceData, **kwarg) -> Union[pd.DataFrame, str]:
+        """
+        Equivalent to run where the query and target are the same dataset.
+        run(query_sequences=sequences, target_sequences=sequences).
+        """
+        return self.run(sequences, sequences, **kwarg)
+
+    def run_allvsall_incremental(self, store:Union[os.PathLike, str, pd.DataFrame],
+                                 old_sequences:SequenceData, new_sequences:SequenceData,
+                                 version_col:Optional[str]=None, symmetric:bool=True,
+                                 **kwarg) -> Union[pd.DataFrame, str]:
+        """
+        Updates an all-vs-all result of old_sequences to new_sequences without
+        recomputing the pairs of unchanged sequences.
+
+        Sequences are matched by accession and compared by content hash, or
+        by version_col (e.g. sequenceVersion). Hits of removed and changed
+        sequences are dropped from the store; added and changed sequences are
+        searched against the whole new set, and, when symmetric, the unchanged
+        sequences are searched against them. E-values of the new hits reflect
+        the size of the new set, those of the stored hits the old one.
+
+        Parameters
+        ----------
+        - store: path | pd.DataFrame: hit table directory, updated in place,
+            or DataFrame returned by run_allvsall.
+        - old_sequences: SEQUENCE_DATA: sequences of the stored result.
+        - new_sequences: SEQUENCE_DATA: updated sequences.
+        - version_col: str: column compared instead of the sequence hash. Default: None.
+        - symmetric: bool: also search the unchanged sequences against the new
+            ones, as run_allvsall does. Default: True.
+        - **kwarg: arguments for run, except output.
+
+        Returns
+        -------
+        - :pd.DataFrame | str: merged hits, or the path to the hit table.
+        """
+        diff = diff_sequences(old_sequences, new_sequences, version_col=version_col)
+        new_sequences = _sequence_frame(new_sequences, "Header", "Sequence")
+        is_fresh = _accessions(new_sequences["Header"]).isin(diff.fresh).to_numpy()
+        fresh = new_sequences[is_fresh]
+
+        deltas = []
+        if len(fresh):
+            deltas.append(self.run(fresh, new_sequences, **kwarg))
+            if symmetric and diff.unchanged:
+                deltas.append(self.run(new_sequences[~is_fresh], fresh, **kwarg))
+        delta = (pd.concat(deltas, ignore_index=True) if deltas else
+                 pd.DataFrame(columns=FINAL_COLUMNS))
+        return update_hit_table(store, delta, diff.stale)
+
+    @contextmanager
+    def target_database(self, target_fasta:os.PathLike, temp_dir:os.PathLike,
+                        prebuilt:bool=False, manifest:Optional[JobManifest]=None,
+                        target_key:str="") -> Iterator[str]:
+        """
+        Yields the target to search against: a cached database when a
+        DatabaseCache is configured, locked against eviction until the
+        context exits, otherwise a target prepared in temp_dir (always a
+        database when prebuilt is set).
+        """
+        if self.database_cache is not None:
+            with self.database_cache.use(
+                    self.engine, target_fasta,
+                    lambda prefix: self._build_database(target_fasta, prefix),
+                    options=self._database_options()) as prefix:
+                yield prefix
+            return
+        if self.searches_fasta and not prebuilt:
+            yield target_fasta
+            return
+
+        manifest = manifest if manifest is not None else JobManifest()
+        prefix = os.path.join(temp_dir, "target_db")
+        if prebuilt:
+            build = lambda: self._build_database(target_fasta, prefix)
+        else:
+            build = lambda: self._prepare_target(target_fasta, prefix)
+        manifest.run_stage("target_db", manifest.key(target_key, prebuilt, self._signature()),
+                           [prefix], build)
+        yield prefix
+
+    @staticmethod
+    @contextmanager
+    def _work_dir(work_dir:Optional[os.PathLike]) -> Iterator[str]:
+        "Persistent work_dir when set, otherwise a temp directory removed on exit."
+        if work_dir is None:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                yield temp_dir
+        else:
+            os.makedirs(work_dir, exist_ok=True)
+            yield os.fspath(work_dir)
+
+    def _signature(self) -> str:
+        "Binary and parameters of the wrapper, part of every stage key."
+        return f"{self.engine}:{self.path_to_binary}:{getattr(self, 'params', None)!r}"
+
+    def _search_key(self, manifest:JobManifest, query_fasta:os.PathLike, target_key:str) -> str:
+        "Input key of a search of query_fasta against the target."
+        if not manifest.enabled:
+            return ""
+        return manifest.key(file_digest(query_fasta), target_key, self._signature())
+
+    def _checkpointed_search(self, manifest:JobManifest, name:str, query_fasta:os.PathLike,
+                             target:str, target_key:str, output_file:str,
+                             temp_dir:os.PathLike) -> None:
+        """
+        Runs _search as stage `name` of the manifest. Engines with several
+        commands per search override it to checkpoint every command.
+        """
+        key = self._search_key(manifest, query_fasta, target_key)
+        manifest.run_stage(name, key, [output_file],
+                           lambda: self._search(query_fasta, target, output_file, temp_dir))
+
+    def _search_shards(self, query_fasta:os.PathLike, target:str, output_file:str,
+                       temp_dir:os.PathLike, shard_size:int, max_workers:int,
+                       retries:int, manifest:Optional[JobManifest]=None,
+                       target_key:str="") -> None:
+        """
+        Splits query_fasta into shards, searches them concurrently against
+        target and concatenates the shard outputs in shard order, which
+        reproduces the output of a single search. Shards completed by a
+        previous run of the same job are skipped.
+        """
+        manifest = manifest if manifest is not None else JobManifest()
+        shard_dir = os.path.join(temp_dir, "shards")
+        shards = split_fasta(query_fasta, shard_dir, shard_size)
+        outputs = [f"{shard}.out" for shard in shards]
+
+        def search(shard:str, shard_output:str) -> None:
+            name = os.path.basename(shard)
+            if manifest.is_complete(name, self._search_key(manifest, shard, target_key),
+                                    [shard_output]):
+                return
+            if os.path.exists(shard_output):
+                os.remove(shard_output)
+            shard_temp_dir = f"{shard}.tmp"
+            os.makedirs(shard_temp_dir, exist_ok=True)
+            self._checkpointed_search(manifest, name, shard, target, target_key,
+                                      shard_output, shard_temp_dir)
+            shutil.rmtree(shard_temp_dir, ignore_errors=True)
+
+        run_shards(search, shards, outputs, max_workers=max_workers, retries=retries)
+        concatenate_files(outputs, output_file)
+
+    def _build_database(self, fasta:os.PathLike, prefix:str) -> None:
+        "Builds a target database at prefix from fasta."
+        raise NotImplementedError
+
+    def _with_database_length(self, database_length:int) -> "SimilarityWrapper":
+        """
+        The wrapper searching with database_length residues as database size,
+        for engines whose parameters have a dbsize left unset, otherwise self.
+        """
+        if not hasattr(self.params, "dbsize") or self.params.dbsize is not None:
+            return self
+        engine = copy.copy(self)
+        engine.params = dataclasses.replace(self.params, dbsize=database_length)
+        return engine
+
+    def _database_options(self) -> str:
+        """
+        Build options of the target database, part of the DatabaseCache key.
+        Thread counts do not change the database and are left out.
+        """
+        return ""
+
+    def _prepare_target(self, fasta:os.PathLike, prefix:str) -> None:
+        "Prepares an uncached target database at prefix."
+        self._build_database(fasta, prefix)
+
+    def _search(self, query_fasta:os.PathLike, target:str, output_file:str,
+                temp_dir:os.PathLike) -> None:
+        "Searches query_fasta against target and writes tabular hits to output_file."
+        raise NotImplementedError
@@ -1,8 +1,28 @@
 """Common utility functions."""
 
-from ._utils import read_fasta, write_fasta
+from ._fasta import FastaIndex, build_fasta_index, fasta_lengths, iter_fasta
+from ._process import (
+    CommandError, CommandFailedError, CommandLimits, CommandNotFoundError, CommandResult,
+    CommandTimeoutError, cmd_stream
+)
+from ._resources import available_cpus, available_memory
+from ._utils import fasta_pipe, read_fasta, write_fasta
 
 __all__ =[
+    "available_cpus",
+    "available_memory",
     "read_fasta",
-    "write_fasta"
+    "write_fasta",
+    "fasta_pipe",
+    "iter_fasta",
+    "fasta_lengths",
+    "build_fasta_index",
+    "FastaIndex",
+    "cmd_stream",
+    "CommandResult",
+    "CommandLimits",
+    "CommandError",
+    "CommandNotFoundError",
+    "CommandFailedError",
+    "CommandTimeoutError",
 ]
@@ -0,0 +1,270 @@
+"""Streaming and indexed access to FASTA files."""
+
+import gzip
+import mmap
+import os
+from typing import IO, Dict, Iterator, List, Optional, Tuple, Union
+import pandas as pd
+
+FastaPath = Union[os.PathLike, str]
+
+GZIP_EXTENSIONS = (".gz", ".bgz")
+FAI_COLUMNS = ["Name", "Length", "Offset", "Line_Bases", "Line_Width"]
+
+def is_gzipped(path:FastaPath) -> bool:
+    "Whether a FASTA path is gzip (or bgzip) compressed, by its extension."
+    return os.fspath(path).endswith(GZIP_EXTENSIONS)
+
+def open_fasta(path:FastaPath, mode:str="r") -> IO:
+    "Opens a plain or gzip/bgzip compressed FASTA file in text ('r') or binary ('rb') mode."
+    if mode not in ["r", "rb"]:
+        raise ValueError("Invalid mode value.")
+    if is_gzipped(path):
+        return gzip.open(path, "rt", encoding="utf-8") if mode == "r" else gzip.open(path, "rb")
+    if mode == "r":
+        return open(path, "r", encoding="utf-8")
+    return open(path, "rb")
+
+def _iter_raw_records(fastafile:IO, block_size:int=1 << 22) -> Iterator[Tuple[int, Union[str, bytes]]]:
+    """
+    Splits a FASTA file object (text or binary) into records, reading it in
+    blocks of block_size and cutting them on newline + '>'.
+
+    Returns
+    -------
+    - :Iterator of (offset, record): offset of the record after its '>', and
+        the record text: header line and sequence lines.
+    """
+    empty = fastafile.read(0)
+    sep = "\n>" if isinstance(empty, str) else b"\n>"
+    newline, start = sep[:1], sep[1:]
+    pending, base = [], 0
+
+    def split(text, base):
+        parts = text.split(sep)
+        pos = base
+        for i, part in enumerate(parts):
+            if i > 0:
+                yield pos, part
+            elif part.startswith(start):
+                yield pos + 1, part[1:]
+            # Lines before the first header are ignored.
+            pos += len(part) + len(sep)
+
+    for block in iter(lambda: fastafile.read(block_size), empty):
+        cut = block.rfind(sep)
+        if cut == -1:
+            if pending and pending[-1].endswith(newline) and block.startswith(start):
+                text = empty.join(pending)
+                yield from split(text, base)
+                base += len(text)
+                pending = [block]
+            else:
+                pending.append(block)
+            continue
+        text = empty.join(pending) + block[:cut]
+        yield from split(text, base)
+        base += len(text) + 1
+        pending = [block[cut + 1:]]
+    yield from split(empty.join(pending), base)
+
+def _parse_record(record:Union[str, bytes]) -> Tuple[str, str]:
+    "Header and sequence of a raw (text or binary) record, without whitespace."
+    if isinstance(record, bytes):
+        record = record.decode("utf-8")
+    header, _, sequence = record.partition("\n")
+    return header.strip(), "".join(sequence.split())
+
+def iter_fasta(path_or_buf:Union[FastaPath, IO], block_size:int=1 << 22) -> Iterator[Tuple[str, str]]:
+    """
+    Streams the records of a FASTA file without loading it in memory.
+
+    Parameters
+    ----------
+    - path_or_buf: path | file object: FASTA file, gzip/bgzip compressed
+        when its name ends with .gz or .bgz. File objects may be text or
+        binary, binary records are decoded as UTF-8.
+    - block_size: int: characters read at a time. Default: 4 Mi.
+
+    Returns
+    -------
+    - :Iterator of (header, sequence).
+    """
+    if hasattr(path_or_buf, "read"):
+        for _, record in _iter_raw_records(path_or_buf, block_size):
+            yield _parse_record(record)
+        return
+    with open_fasta(path_or_buf) as fastafile:
+        for _, record in _iter_raw_records(fastafile, block_size):
+            yield _parse_record(record)
+
+def fasta_lengths(path_or_buf:Union[FastaPath, IO], block_size:int=1 << 22) -> pd.DataFrame:
+    """
+    Sequence length of every record, without joining the sequence lines.
+
+    Returns
+    -------
+    - :pd.DataFrame: columns Header and Length.
+    """
+    def lengths(fastafile):
+        for _, record in _iter_raw_records(fastafile, block_size):
+            if isinstance(record, bytes):
+                header, _, sequence = record.partition(b"\n")
+                header = header.decode("utf-8")
+                whitespace = (b"\n", b"\r", b" ")
+            else:
+                header, _, sequence = record.partition("\n")
+                whitespace = ("\n", "\r", " ")
+            yield header.strip(), len(sequence) - sum(map(sequence.count, whitespace))
+
+    # Binary mode avoids decoding the sequences; only headers are decoded.
+    if hasattr(path_or_buf, "read"):
+        records = list(lengths(path_or_buf))
+    else:
+        with open_fasta(path_or_buf, "rb") as fastafile:
+            records = list(lengths(fastafile))
+    return pd.DataFrame({"Header": [header for header, _ in records],
+                         "Length": pd.array([length for _, length in records], dtype="int64")})
+
+def build_fasta_index(fasta:FastaPath, index_path:Optional[FastaPath]=None,
+                      block_size:int=1 << 22) -> str:
+    """
+    Writes a samtools-compatible .fai index of an uncompressed FASTA file:
+    name (first word of the header), length, byte offset of the sequence,
+    bases per line and bytes per line of every record.
+
+    Parameters
+    ----------
+    - fasta: path: uncompressed FASTA file.
+    - index_path: path: index file. Default: <fasta>.fai.
+    - block_size: int: bytes read at a time. Default: 4 MiB.
+
+    Returns
+    -------
+    - :str: path to the index.
+    """
+    if is_gzipped(fasta):
+        raise ValueError("Indexed access requires an uncompressed FASTA file.")
+    index_path = os.fspath(index_path) if index_path is not None else f"{os.fspath(fasta)}.fai"
+    temp_path = f"{index_path}.tmp"
+    names = set()
+    with open(fasta, "rb") as fastafile, open(temp_path, "w", encoding="utf-8") as index:
+        for offset, record in _iter_raw_records(fastafile, block_size):
+            name, entry = _index_record(offset, record)
+            if name in names:
+                raise ValueError(f"Duplicate sequence name in FASTA file: {name}")
+            names.add(name)
+            index.write("\t".join([name, *map(str, entry)]) + "\n")
+    os.replace(temp_path, index_path)
+    return index_path
+
+def _index_record(offset:int, record:bytes) -> Tuple[str, Tuple[int, int, int, int]]:
+    "Index entry of a raw record: name and (length, offset, line bases, line width)."
+    header_end = record.find(b"\n")
+    header = record if header_end == -1 else record[:header_end]
+    fields = header.split()
+    if not fields:
+        raise ValueError(f"Empty FASTA header at byte {offset}.")
+    name = fields[0].decode("utf-8")
+    if header_end == -1:
+        return name, (0, offset + len(record), 0, 0)
+
+    # Uniform lines have their newlines every `width` bytes, checked with a
+    # strided slice rather than by splitting the record into lines.
+    body = record[header_end + 1:].rstrip(b"\r\n")
+    if not body:
+        return name, (0, offset + header_end + 1, 0, 0)
+    n_lines = body.count(b"\n") + 1
+    first = body.find(b"\n")
+    width = first + 1 if first != -1 else len(body) + 1
+    bases = width - 1 - (body[width - 2: width - 1] == b"\r")
+    last = body[(n_lines - 1) * width:]
+    if n_lines > 1 and (body[width - 1::width][:n_lines - 1] != b"\n" * (n_lines - 1) or
+                        len(last) > width - 1):
+        raise ValueError(f"Different line lengths in FASTA record {name}.")
+    length = (n_lines - 1) * bases + len(last.rstrip(b"\r"))
+    return name, (length, offset + header_end + 1, bases, width)
+
+def read_fasta_index(index_path:FastaPath) -> pd.DataFrame:
+    "Reads a .fai index into a DataFrame with the FAI_COLUMNS."
+    return pd.read_csv(index_path, sep="\t", header=None, names=FAI_COLUMNS, usecols=range(5),
+                       dtype={"Name": str, "Length": "int64", "Offset": "int64",
+                              "Line_Bases": "int64", "Line_Width": "int64"})
+
+class FastaIndex:
+    """
+    Random access to the sequences of an uncompressed FASTA file through its
+    .fai index and a read-only memory map: a lookup costs one dict access
+    and one slice of the mapped file, whatever the size of the file.
+
+    The index is built next to the FASTA file when missing or older than it.
+    """
+
+    def __init__(self, fasta:FastaPath, index_path:Optional[FastaPath]=None) -> None:
+        """
+        Parameters
+        ----------
+        - fasta: path: uncompressed FASTA file.
+        - index_path: path: .fai index. Default: <fasta>.fai.
+        """
+        self.fasta = os.fspath(fasta)
+        self.index_path = os.fspath(index_path) if index_path is not None else f"{self.fasta}.fai"
+        if (not os.path.exists(self.index_path) or
+                os.path.getmtime(self.index_path) < os.path.getmtime(self.fasta)):
+            build_fasta_index(self.fasta, self.index_path)
+        index = read_fasta_index(self.index_path)
+        self._entries: Dict[str, Tuple[int, int, int, int]] = dict(zip(
+            index["Name"], zip(*(index[column].to_list() for column in FAI_COLUMNS[1:]))))
+        self._file = open(self.fasta, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, name:str) -> bool:
+        return name in self._entries
+
+    def __getitem__(self, name:str) -> str:
+        return self.fetch(name)
+
+    @property
+    def names(self) -> List[str]:
+        "Sequence names, in file order."
+        return list(self._entries)
+
+    def lengths(self) -> pd.Series:
+        "Sequence length by name, read from the index only."
+        return pd.Series({name: entry[0] for name, entry in self._entries.items()}, dtype="int64")
+
+    def fetch(self, name:str, start:int=0, end:Optional[int]=None) -> str:
+        """
+        Sequence of `name`, or its 0-based half-open [start, end) slice.
+
+        Raises
+        ------
+        - KeyError: unknown name.
+        """
+        length, offset, bases, width = self._entries[name]
+        end = length if end is None else min(end, length)
+        start = max(0, start)
+        if start >= end:
+            return ""
+        first = offset + start // bases * width + start % bases
+        last = offset + (end - 1) // bases * width + (end - 1) % bases + 1
+        data = self._mmap[first:last]
+        if width > bases:
+            data = data.replace(b"\n", b"").replace(b"\r", b"")
+        return data.decode("utf-8")
+
+    def close(self) -> None:
+        "Releases the memory map and the file."
+        if isinstance(self._mmap, mmap.mmap):
+            self._mmap.close()
+        self._file.close()
+
+    def __enter__(self) -> "FastaIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,252 @@
+"""Streaming execution of external commands with limits and resource accounting."""
+
+import json
+import logging
+import os
+import resource
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import IO, Any, Callable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+STDERR_TAIL_LINES = 20
+
+@dataclass
+class CommandResult:
+    """
+    Outcome and resource usage of a command.
+
+    Parameters
+    ----------
+    - args: list of str: command arguments.
+    - returncode: int: exit code, or -N when killed by signal N.
+    - wall_time: float: elapsed seconds.
+    - user_time: float: user CPU seconds.
+    - system_time: float: system CPU seconds.
+    - max_rss: int: peak resident set size in bytes.
+    - stdout: any: value returned by the stdout consumer. Default: None.
+    """
+    args: List[str]
+    returncode: int
+    wall_time: float
+    user_time: float
+    system_time: float
+    max_rss: int
+    stdout: Any = None
+
+    @property
+    def cpu_time(self) -> float:
+        "User and system CPU seconds."
+        return self.user_time + self.system_time
+
+@dataclass
+class CommandLimits:
+    """
+    Limits and stderr handling applied to every command of a wrapper.
+
+    Parameters
+    ----------
+    - timeout: float: wall-clock seconds before a command is killed. Default: None.
+    - memory_limit: int: address space limit (RLIMIT_AS) of a command in bytes. Default: None.
+    - cpu_time_limit: int: CPU seconds limit (RLIMIT_CPU) of a command. Default: None.
+    - on_stderr: callable: called with every stderr line. Default: None, logged.
+    """
+    timeout: Optional[float] = None
+    memory_limit: Optional[int] = None
+    cpu_time_limit: Optional[int] = None
+    on_stderr: Optional[Callable[[str], None]] = None
+
+    def __post_init__(self) -> None:
+        for name in ["timeout", "memory_limit", "cpu_time_limit"]:
+            value = getattr(self, name)
+            if value is not None and value <= 0:
+                raise ValueError(f"Invalid {name} value.")
+
+    def kwargs(self) -> dict:
+        "cmd_stream arguments of the set limits."
+        return {name: value for name, value in vars(self).items() if value is not None}
+
+class CommandError(RuntimeError):
+    "A command did not complete successfully."
+
+    def __init__(self, message:str, result:Optional[CommandResult]=None, stderr:str="") -> None:
+        super().__init__(f"{message}\n{stderr}" if stderr else message)
+        self.result = result
+        self.stderr = stderr
+
+class CommandNotFoundError(CommandError, FileNotFoundError):
+    "The executable of a command was not found."
+
+class CommandFailedError(CommandError):
+    "A command exited with a non-zero status or was killed by a signal."
+
+class CommandTimeoutError(CommandError):
+    "A command exceeded its wall-clock timeout or CPU time limit."
+
+def _rlimits(memory_limit:Optional[int],
+             cpu_time_limit:Optional[int]) -> List[Tuple[int, Tuple[int, int]]]:
+    "(resource, (soft, hard)) pairs of the requested limits."
+    out = []
+    if memory_limit is not None:
+        out.append((resource.RLIMIT_AS, (memory_limit, memory_limit)))
+    if cpu_time_limit is not None:
+        # SIGXCPU at the soft limit; the hard limit would send SIGKILL.
+        out.append((resource.RLIMIT_CPU, (cpu_time_limit, cpu_time_limit + 1)))
+    return out
+
+# Applies rlimits and execs the command, for platforms without prlimit.
+_RLIMIT_WRAPPER = (
+    "import json, os, resource, sys\n"
+    "for limit, values in json.loads(sys.argv[1]):\n"
+    "    resource.setrlimit(limit, tuple(values))\n"
+    "os.execv(sys.argv[2], sys.argv[2:])\n")
+
+def _spawn(args:List[str], limits:List[Tuple[int, Tuple[int, int]]],
+           **kwarg) -> subprocess.Popen:
+    """
+    Starts args with rlimits. preexec_fn is not safe when the parent runs
+    threads, so limits are set on the running child with prlimit, or, where
+    prlimit is not available, by a Python wrapper that execs the command.
+    """
+    if limits and not hasattr(resource, "prlimit"):
+        executable = shutil.which(args[0])
+        if executable is None:
+            raise FileNotFoundError(args[0])
+        args = [sys.executable, "-c", _RLIMIT_WRAPPER, json.dumps(limits), executable, *args[1:]]
+    process = subprocess.Popen(args, **kwarg)
+    if limits and hasattr(resource, "prlimit"):
+        try:
+            for limit, values in limits:
+                resource.prlimit(process.pid, limit, values)
+        except ProcessLookupError:
+            pass
+    return process
+
+def _max_rss_bytes(ru_maxrss:int) -> int:
+    "ru_maxrss is in KiB on Linux, in bytes on macOS."
+    return ru_maxrss if os.uname().sysname == "Darwin" else ru_maxrss * 1024
+
+def _kill_group(pid:int) -> None:
+    "Kills the process group of a command started in its own session."
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+def cmd_stream(cmd:Sequence[str], stdout:Optional[Callable[[IO[bytes]], Any]]=None,
+               on_stderr:Optional[Callable[[str], None]]=None, timeout:Optional[float]=None,
+               memory_limit:Optional[int]=None, cpu_time_limit:Optional[int]=None,
+               cwd:Optional[os.PathLike]=None) -> CommandResult:
+    """
+    Runs a command with its output streamed through pipes rather than
+    buffered in memory.
+
+    stderr is read line by line as it is written, so progress reports of
+    DIAMOND or MMseqs2 reach on_stderr (by default the module logger, at
+    DEBUG level) while the command runs. stdout is handed, as a binary
+    pipe, to the `stdout` consumer, e.g. a tabular parser reading hits
+    straight from the aligner without an intermediate file.
+
+    Wall time, CPU time and peak RSS of the command are taken from the
+    rusage of its own process (os.wait4), which, unlike
+    resource.getrusage(RUSAGE_CHILDREN), is not mixed with concurrent commands.
+
+    Parameters
+    ----------
+    - cmd: list of str: command arguments.
+    - stdout: callable: consumer of the stdout pipe, its return value is
+        stored in CommandResult.stdout. Default: None, stdout is discarded.
+    - on_stderr: callable: called with every stderr line. Default: None, logged.
+    - timeout: float: wall-clock seconds before the command is killed. Default: None.
+    - memory_limit: int: address space limit (RLIMIT_AS) of the command in
+        bytes; allocations beyond it fail. Default: None.
+    - cpu_time_limit: int: CPU seconds limit (RLIMIT_CPU). Default: None.
+    - cwd: path: working directory. Default: None.
+
+    Returns
+    -------
+    - :CommandResult
+
+    Raises
+    ------
+    - CommandNotFoundError: the executable does not exist.
+    - CommandTimeoutError: timeout or cpu_time_limit exceeded.
+    - CommandFailedError: non-zero exit status or killed by a signal.
+    """
+    if timeout is not None and timeout <= 0:
+        raise ValueError("Invalid timeout value.")
+    args = [os.fspath(arg) for arg in cmd]
+    on_stderr = on_stderr if on_stderr is not None else (lambda line: logger.debug("%s", line))
+
+    start = time.perf_counter()
+    try:
+        process = _spawn(
+            args, _rlimits(memory_limit, cpu_time_limit), stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE if stdout is not None else subprocess.DEVNULL,
+            stderr=subprocess.PIPE, cwd=cwd, start_new_session=True)
+    except FileNotFoundError as e:
+        raise CommandNotFoundError(f"Command not found: {args[0]}") from e
+
+    tail = deque(maxlen=STDERR_TAIL_LINES)
+    def read_stderr():
+        for line in iter(process.stderr.readline, b""):
+            line = line.decode("utf-8", errors="replace").rstrip("\r\n")
+            tail.append(line)
+            on_stderr(line)
+    stderr_reader = threading.Thread(target=read_stderr, daemon=True)
+    stderr_reader.start()
+
+    timed_out = threading.Event()
+    def kill():
+        timed_out.set()
+        _kill_group(process.pid)
+    watchdog = threading.Timer(timeout, kill) if timeout is not None else None
+    if watchdog is not None:
+        watchdog.start()
+
+    output, consumer_error = None, None
+    try:
+        if stdout is not None:
+            try:
+                output = stdout(process.stdout)
+            except BaseException as e:
+                consumer_error = e
+                _kill_group(process.pid)
+            finally:
+                # A consumer stopping early leaves the command writing to a closed pipe.
+                process.stdout.close()
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+    finally:
+        if watchdog is not None:
+            watchdog.cancel()
+    stderr_reader.join()
+    process.stderr.close()
+
+    result = CommandResult(args=args, returncode=process.returncode,
+                           wall_time=time.perf_counter() - start,
+                           user_time=usage.ru_utime, system_time=usage.ru_stime,
+                           max_rss=_max_rss_bytes(usage.ru_maxrss), stdout=output)
+    logger.info("%s: exit %d, %.2fs wall, %.2fs CPU, %.1f MiB peak RSS", args[0],
+                result.returncode, result.wall_time, result.cpu_time, result.max_rss / 2**20)
+    if consumer_error is not None:
+        raise consumer_error
+
+    stderr = "\n".join(tail)
+    if timed_out.is_set():
+        raise CommandTimeoutError(f"Command timed out after {timeout}s: {args[0]}", result, stderr)
+    if process.returncode == -signal.SIGXCPU:
+        raise CommandTimeoutError(
+            f"Command exceeded its CPU time limit of {cpu_time_limit}s: {args[0]}", result, stderr)
+    if process.returncode != 0:
+        raise CommandFailedError(
+            f"Command failed with exit status {process.returncode}: {' '.join(args)}",
+            result, stderr)
+    return result
@@ -0,0 +1,76 @@
+"""Detection of the CPU and memory available to the current process."""
+
+import math
+import os
+from typing import Optional
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+
+def _read_first_line(path:str) -> Optional[str]:
+    "First line of a file, or None when it cannot be read."
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.readline().strip()
+    except OSError:
+        return None
+
+def _cgroup_cpu_limit(cgroup_root:str=CGROUP_ROOT) -> Optional[float]:
+    """
+    CPU quota of the cgroup in number of CPUs (cgroup v2 cpu.max, or
+    cgroup v1 cpu.cfs_quota_us / cpu.cfs_period_us). None when unlimited.
+    """
+    cpu_max = _read_first_line(os.path.join(cgroup_root, "cpu.max"))
+    if cpu_max:
+        quota, _, period = cpu_max.partition(" ")
+        if quota != "max" and period:
+            return int(quota) / int(period)
+        return None
+    quota = _read_first_line(os.path.join(cgroup_root, "cpu", "cpu.cfs_quota_us"))
+    period = _read_first_line(os.path.join(cgroup_root, "cpu", "cpu.cfs_period_us"))
+    if quota and period and int(quota) > 0:
+        return int(quota) / int(period)
+    return None
+
+def _cgroup_memory_limit(cgroup_root:str=CGROUP_ROOT) -> Optional[int]:
+    """
+    Memory limit of the cgroup in bytes (cgroup v2 memory.max, or
+    cgroup v1 memory.limit_in_bytes). None when unlimited.
+    """
+    memory_max = _read_first_line(os.path.join(cgroup_root, "memory.max"))
+    if memory_max:
+        return None if memory_max == "max" else int(memory_max)
+    limit = _read_first_line(os.path.join(cgroup_root, "memory", "memory.limit_in_bytes"))
+    # cgroup v1 reports "unlimited" as a huge page-aligned number.
+    if limit and int(limit) < 1 << 60:
+        return int(limit)
+    return None
+
+def _physical_memory() -> Optional[int]:
+    "Total physical memory in bytes."
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+def available_cpus(cgroup_root:str=CGROUP_ROOT) -> int:
+    """
+    Number of CPUs the process may use: the CPU affinity mask
+    (os.sched_getaffinity) capped by the cgroup CPU quota.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = _cgroup_cpu_limit(cgroup_root)
+    if quota is not None:
+        cpus = min(cpus, max(1, math.floor(quota)))
+    return max(1, cpus)
+
+def available_memory(cgroup_root:str=CGROUP_ROOT) -> Optional[int]:
+    """
+    Memory in bytes the process may use: physical memory capped by the
+    cgroup memory limit. None when it cannot be determined.
+    """
+    limits = [limit for limit in (_physical_memory(), _cgroup_memory_limit(cgroup_root))
+              if limit is not None]
+    return min(limits) if limits else None
@@ -1,32 +1,38 @@
 """General (helper) functions for module and sub-modules."""
 
-import subprocess
+import gzip
 import os
+import tempfile
+import threading
+from contextlib import contextmanager
 from io import StringIO
-from typing import List, Tuple, Union
+from typing import IO, Iterator, List, Optional, Tuple, Union
 import pandas as pd
+from ._fasta import is_gzipped, iter_fasta, open_fasta
+from ._process import cmd_stream
 
 Fasta = Union[os.PathLike, str, StringIO]
 SequenceData = Union[Fasta, pd.DataFrame]
 
-def cmd_run(cmd:List[str]):
+def cmd_run(cmd:List[str], **kwarg) -> str:
     """
-    Streamlines error handling of subprocess comands.
+    Runs a command, streaming its stderr to the log, and returns its stdout.
 
     Parameters
     ----------
     - cmd: list of str: list of command arguments.
+    - **kwarg: arguments for cmd_stream: on_stderr, timeout, memory_limit,
+        cpu_time_limit, cwd.
 
     Returns
     -------
     - : stdout: output of cmd.
+
+    Raises
+    ------
+    - CommandError: the command was not found, failed or timed out.
     """
-    try:
-        output = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        return output.stdout
-    except subprocess.CalledProcessError as e:
-        print("Status : FAIL", e.returncode, e.output)
-        return e.output
+    return cmd_stream(cmd, stdout=lambda pipe: pipe.read().decode("utf-8"), **kwarg).stdout
 
 def handle_sequence_data(path_or_dataframe:SequenceData, temp_path:Fasta,
                          **kwarg
@@ -45,31 +51,116 @@ def handle_sequence_data(path_or_dataframe:SequenceData, temp_path:Fasta,
         )
 
 def write_fasta(df:pd.DataFrame, path_or_buf:Fasta,
-                header_col:str='Header', sequence_col:str='Sequence'
-                ) -> None:
+                header_col:str='Header', sequence_col:str='Sequence',
+                line_width:Optional[int]=None, chunksize:int=100_000,
+                compresslevel:int=6) -> None:
     """
     Writes fasta file from DataFrame.
+
+    Records are formatted column-wise and written in chunks of `chunksize`
+    records, one write per chunk.
+
+    Parameters
+    ----------
+    - df: pd.DataFrame: sequence data.
+    - path_or_buf: path | file object: output, e.g. StringIO or a named pipe.
+        Paths ending with .gz or .bgz are gzip compressed.
+    - header_col: str: header column. Default: "Header".
+    - sequence_col: str: sequence column. Default: "Sequence".
+    - line_width: int: wrap sequences at line_width residues. Default: None, no wrapping.
+    - chunksize: int: records per write. Default: 100000.
+    - compresslevel: int: gzip compression level. Default: 6.
     """
-    with open(path_or_buf, "w+", encoding="utf-8") as fastafile:
-        for _, row in df.iterrows():
-            fastafile.write(f">{row[header_col]}\n{row[sequence_col]}\n")
+    if line_width is not None and line_width < 1:
+        raise ValueError("Invalid line_width value.")
+    if chunksize < 1:
+        raise ValueError("Invalid chunksize value.")
+    if hasattr(path_or_buf, "write"):
+        _write_fasta_chunks(df, path_or_buf, header_col, sequence_col, line_width, chunksize)
+        return
+    if is_gzipped(path_or_buf):
+        fastafile = gzip.open(path_or_buf, "wt", encoding="utf-8", compresslevel=compresslevel)
+    else:
+        fastafile = open(path_or_buf, "w+", encoding="utf-8")
+    with fastafile:
+        _write_fasta_chunks(df, fastafile, header_col, sequence_col, line_width, chunksize)
+
+def _write_fasta_chunks(df:pd.DataFrame, fastafile:IO, header_col:str, sequence_col:str,
+                        line_width:Optional[int], chunksize:int) -> None:
+    "Formats and writes df in chunks of chunksize records."
+    for start in range(0, len(df), chunksize):
+        chunk = df.iloc[start: start+chunksize]
+        headers, sequences = chunk[header_col].astype(str), chunk[sequence_col].astype(str)
+        if line_width is None:
+            fastafile.write((">" + headers + "\n" + sequences + "\n").str.cat())
+        else:
+            records = zip(headers.tolist(), sequences.tolist())
+            fastafile.write("".join([f">{header}\n{_wrap(sequence, line_width)}\n"
+                                     for header, sequence in records]))
+
+def _wrap(sequence:str, line_width:int) -> str:
+    "Sequence with a newline every line_width residues."
+    if len(sequence) <= line_width:
+        return sequence
+    return "\n".join([sequence[i: i+line_width] for i in range(0, len(sequence), line_width)])
+
+@contextmanager
+def fasta_pipe(df:pd.DataFrame, **kwarg) -> Iterator[str]:
+    """
+    Named pipe streaming df as FASTA, to feed a DataFrame to an aligner
+    without writing a temp file to disk. The pipe is written by a background
+    thread once a reader opens it, and removed on exit.
+
+    The reader must consume the pipe once, sequentially: tools that seek in
+    or reread their input (e.g. to build a database in several passes)
+    need a regular file.
+
+    Parameters
+    ----------
+    - df: pd.DataFrame: sequence data.
+    - **kwarg: arguments for the write_fasta function.
+
+    Returns
+    -------
+    - :str: path to the named pipe.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "sequences.fasta")
+        os.mkfifo(path)
+        errors = []
+
+        def write() -> None:
+            try:
+                with open(path, "w", encoding="utf-8") as pipe:
+                    write_fasta(df, pipe, **kwarg)
+            except BrokenPipeError:
+                pass
+            except Exception as e:
+                errors.append(e)
+
+        writer = threading.Thread(target=write, daemon=True)
+        writer.start()
+        try:
+            yield path
+        finally:
+            writer.join(timeout=0.1)
+            while writer.is_alive():
+                # Unblocks a writer still waiting for a reader, or left by one
+                # that stopped reading: its writes then fail with EPIPE.
+                os.close(os.open(path, os.O_RDONLY | os.O_NONBLOCK))
+                writer.join(timeout=0.1)
+        if errors:
+            raise errors[0]
 
 def read_fasta(path_or_buf:Fasta) -> Tuple[List[str], List[str]]:
     """
     Reads fasta file into two list: a headers list and a sequence list.
+    Files ending with .gz or .bgz are decompressed on the fly. Use iter_fasta
+    to stream the records of large files instead.
     """
     headers, seqs = [], []
-    with open(path_or_buf, "r", encoding="utf-8") as fastafile:
-        seq = []
-        for line in fastafile.readlines():
-            line = line.strip()
-            if line.startswith(">") and not seq:
-                headers.append(line[1:])
-            elif line.startswith(">"):
-                headers.append(line[1:])
-                seqs.append(''.join(seq))
-                seq = []
-            else:
-                seq.append(line)
-        seqs.append(''.join(seq))
+    with open_fasta(path_or_buf) as fastafile:
+        for header, seq in iter_fasta(fastafile):
+            headers.append(header)
+            seqs.append(seq)
     return headers, seqs
@@ -8,6 +8,7 @@ setup(
    author_email="cnguyen11@luc.edu",
    packages=[
       "homolog_search_tools",
+      "homolog_search_tools.network",
       "homolog_search_tools.search",
       "homolog_search_tools.similarity",
       "homolog_search_tools.utils"
@@ -0,0 +1,84 @@
+from io import StringIO
+import xml.etree.ElementTree as ET
+import numpy as np
+import pandas as pd
+import pytest
+from homolog_search_tools.network import SimilarityNetwork, threshold_sweep, write_network
+from homolog_search_tools.similarity._similarity_utils import _alphabetized_accession_columns
+
+def fake_hits(pairs):
+    "Hits for (query, target, log_evalue, identity) tuples."
+    df = pd.DataFrame(pairs, columns=["Query", "Target", "Log_E_Value", "Percent_Identity"])
+    df["Accession_1"], df["Accession_2"] = _alphabetized_accession_columns(df["Query"], df["Target"])
+    return df.drop(columns=["Query", "Target"])
+
+HITS = fake_hits([
+    ("A", "B", 50.0, 90.0), ("B", "A", 40.0, 80.0), ("A", "A", 100.0, 100.0),
+    ("B", "C", 20.0, 60.0), ("D", "E", 30.0, 70.0), ("C", "E", 5.0, 30.0),
+])
+
+def test_SimilarityNetwork_from_hits():
+    network = SimilarityNetwork.from_hits(HITS)
+    assert list(network.nodes) == ["A", "B", "C", "D", "E"]
+    # assert self hits are dropped and the best hit of a pair is kept
+    assert network.n_edges == 4
+    assert network.edge_list().iloc[0].to_list()[:3] == ["A", "B", 50.0]
+
+    adjacency = network.adjacency()
+    assert adjacency.shape == (5, 5)
+    assert (adjacency != adjacency.T).nnz == 0
+    assert adjacency[0, 1] == 50.0 and adjacency[4, 2] == 5.0
+    assert len(set(network.components())) == 1
+
+    strict = network.filter(min_log_evalue=10, min_identity=65)
+    assert strict.n_nodes == 5 and strict.n_edges == 2
+    assert len(set(strict.components())) == 3
+
+def test_SimilarityNetwork_nodes():
+    # assert sequences without hits become singletons
+    network = SimilarityNetwork.from_hits(HITS, nodes=["E", "D", "C", "B", "A", "F"])
+    assert network.n_nodes == 6
+    assert network.adjacency()[4, 3] == 50.0
+    assert len(set(network.components())) == 2
+
+    with pytest.raises(ValueError):
+        SimilarityNetwork.from_hits(HITS, nodes=["A", "B"])
+    with pytest.raises(ValueError, match="Coverage"):
+        SimilarityNetwork.from_hits(HITS, min_coverage=0.8)
+
+def test_threshold_sweep():
+    rng = np.random.default_rng(0)
+    n_nodes, n_edges = 60, 150
+    pairs = [(f"S{a}", f"S{b}", float(rng.integers(0, 40)), 50.0)
+             for a, b in rng.integers(0, n_nodes, size=(n_edges, 2)) if a != b]
+    network = SimilarityNetwork.from_hits(fake_hits(pairs), nodes=[f"S{i}" for i in range(n_nodes)])
+    thresholds = [0, 10, 35.5, 20, 41]
+    sweep = threshold_sweep(network, thresholds)
+
+    assert sweep["Threshold"].to_list() == [41, 35.5, 20, 10, 0]
+    # assert every row matches a network filtered at its threshold
+    for row in sweep.itertuples():
+        filtered = network.filter(min_log_evalue=row.Threshold)
+        sizes = np.bincount(filtered.components())
+        assert (row.Edges, row.Components, row.Largest_Component) == (
+            filtered.n_edges, len(sizes), sizes.max())
+
+@pytest.mark.parametrize("output_format", ["graphml", "xgmml"])
+def test_write_network(output_format):
+    network = SimilarityNetwork.from_hits(HITS)
+    metadata = pd.DataFrame({"Organism": ['Homo "sapiens"', "E. coli & co"], "Length": [10, 20]},
+                            index=["A", "C"])
+    buffer = StringIO()
+    write_network(network, buffer, output_format, node_attributes=metadata, chunksize=2)
+
+    root = ET.fromstring(buffer.getvalue())
+    namespace = root.tag.partition("}")[0] + "}"
+    graph = root if output_format == "xgmml" else root.find(f"{namespace}graph")
+    nodes = graph.findall(f"{namespace}node")
+    edges = graph.findall(f"{namespace}edge")
+    assert (len(nodes), len(edges)) == (5, 4)
+    text = buffer.getvalue()
+    assert "Homo &quot;sapiens&quot;" in text and "E. coli &amp; co" in text
+
+    with pytest.raises(ValueError):
+        write_network(network, StringIO(), "gml")
@@ -0,0 +1,67 @@
+from unittest.mock import patch
+
+from homolog_search_tools.search._cache import UniProtCache, fields_key
+
+def record(accession, sequence_version=1):
+    return {"primaryAccession": accession, "entryAudit": {"sequenceVersion": sequence_version}}
+
+def test_fields_key():
+    assert fields_key(["sequence", "accession"]) == fields_key(["accession", "sequence", "accession"])
+
+def test_UniProtCache_get_many_put_many(tmp_path):
+    cache = UniProtCache(tmp_path / "uniprot.sqlite")
+    cache.put_many([record("P01308"), record("P05067")], ["accession"])
+
+    assert cache.get_many(["P01308", "Q8PZ49"], ["accession"]) == {"P01308": record("P01308")}
+    # assert entries are keyed by field set
+    assert cache.get_many(["P01308"], ["accession", "sequence"]) == {}
+    assert cache.stats() == {"hits": 1, "misses": 2, "hit_rate": 1 / 3}
+
+    # assert the cache is shared by instances on the same file
+    assert UniProtCache(tmp_path / "uniprot.sqlite").get_many(["P05067"], ["accession"])
+
+def test_UniProtCache_ttl(tmp_path):
+    cache = UniProtCache(tmp_path / "uniprot.sqlite", ttl=60)
+    with patch("time.time", return_value=1000.0):
+        cache.put_many([record("P01308")], ["accession"])
+    with patch("time.time", return_value=1059.0):
+        assert cache.get_many(["P01308"], ["accession"])
+    with patch("time.time", return_value=1061.0):
+        assert cache.get_many(["P01308"], ["accession"]) == {}
+
+def test_UniProtCache_max_size(tmp_path):
+    cache = UniProtCache(tmp_path / "uniprot.sqlite", ttl=None)
+    with patch("time.time", return_value=1000.0):
+        cache.put_many([record("P01308")], ["accession"])
+    size = cache.size()
+
+    cache.max_size = 2 * size
+    with patch("time.time", return_value=1001.0):
+        cache.put_many([record("P05067")], ["accession"])
+    with patch("time.time", return_value=1002.0):
+        cache.get_many(["P01308"], ["accession"])
+    with patch("time.time", return_value=1003.0):
+        cache.put_many([record("Q8PZ49")], ["accession"])
+
+    # assert the least recently used entry is evicted
+    assert cache.size() <= 2 * size
+    assert set(cache.get_many(["P01308", "P05067", "Q8PZ49"], ["accession"])) == {"P01308", "Q8PZ49"}
+
+def test_UniProtCache_sequence_version(tmp_path):
+    cache = UniProtCache(tmp_path / "uniprot.sqlite")
+    cache.put_many([record("P01308", 1)], ["accession"])
+    cache.put_many([record("P01308", 1)], ["sequence"])
+    cache.put_many([record("P01308", 2)], ["accession"])
+
+    assert cache.get_many(["P01308"], ["accession"]) == {"P01308": record("P01308", 2)}
+    # assert entries of the previous sequence version are invalidated
+    assert cache.get_many(["P01308"], ["sequence"]) == {}
+
+def test_UniProtCache_aliases(tmp_path):
+    cache = UniProtCache(tmp_path / "uniprot.sqlite")
+    cache.put_many([record("P01308")], ["accession"], aliases={"Q00001": "P01308"})
+    # assert secondary accessions hit the record of their primary accession
+    assert cache.get_many(["Q00001", "P01308"], ["accession"]) == {
+        "Q00001": record("P01308"), "P01308": record("P01308")}
+    cache.invalidate(["P01308"])
+    assert cache.get_many(["Q00001"], ["accession"]) == {}
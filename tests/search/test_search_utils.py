@@ -1,4 +1,11 @@
-from homolog_search_tools.search._search_utils import batch_request
+import gzip
+import json
+import time
+import pytest
+from homolog_search_tools.search._search_utils import (
+    BatchReport, InvalidAccessionError, RetryPolicy, TokenBucket, batch_request,
+    concurrent_batch_request, gunzip_chunks, iter_json_array, validate_accessions
+)
 
 def peudo_request_func(array):
     """
@@ -15,4 +22,68 @@ def peudo_request_func(array):
 
 def test_batch_request():
     output = [x for x in range(100) if x % 10 != 0]
-    assert batch_request(peudo_request_func, list(range(100))) == output
\ No newline at end of file
+    assert batch_request(peudo_request_func, list(range(100))) == output
+
+def test_concurrent_batch_request():
+    output = [x for x in range(100) if x % 10 != 0]
+    assert concurrent_batch_request(
+        peudo_request_func, list(range(100)), batch_size=7, max_workers=4) == output
+
+def test_TokenBucket():
+    bucket = TokenBucket(rate=50, capacity=1)
+    start = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    assert time.monotonic() - start >= 0.09
+
+def test_batch_request_report():
+    report = BatchReport()
+    batch_request(peudo_request_func, list(range(25)), report=report)
+    assert sorted(report.failed) == [0, 10, 20]
+
+def test_batch_request_invalid_accession():
+    calls = []
+
+    def request_func(batch):
+        calls.append(list(batch))
+        if "BAD" in batch:
+            raise InvalidAccessionError(["BAD"])
+        return batch
+
+    report = BatchReport()
+    assert batch_request(request_func, ["A", "BAD", "B", "C"], report=report) == ["A", "B", "C"]
+    assert report.invalid == ["BAD"]
+    assert calls == [["A", "BAD", "B", "C"], ["A", "B", "C"]]
+
+def test_validate_accessions():
+    assert validate_accessions(["P05067", "A0A2U1LIM9", "P05067-2", "p05067", "XYZ"]) == (
+        ["P05067", "A0A2U1LIM9", "P05067-2"], ["p05067", "XYZ"])
+
+def test_RetryPolicy():
+    policy = RetryPolicy(max_retries=2, backoff_factor=1.0, max_backoff=3.0)
+    assert policy.should_retry(503, 0) and policy.should_retry(429, 1)
+    assert not policy.should_retry(503, 2) and not policy.should_retry(404, 0)
+    assert policy.backoff(0, retry_after="2") == 2.0
+    assert policy.backoff(0, retry_after="120") == 3.0
+    assert all(0 <= policy.backoff(5) <= 3.0 for _ in range(20))
+
+def test_iter_json_array():
+    results = [{"primaryAccession": f"P{i:05d}", "name": "é, ] {"} for i in range(50)]
+    document = json.dumps({"results": results, "next": None}).encode("utf-8")
+
+    # assert elements are decoded across arbitrary chunk boundaries
+    for size in [1, 7, len(document)]:
+        chunks = (document[i: i+size] for i in range(0, len(document), size))
+        assert list(iter_json_array(chunks)) == results
+    assert list(iter_json_array([b'{"results": []}'])) == []
+
+    with pytest.raises(ValueError):
+        list(iter_json_array([document[:len(document) // 2]]))
+
+def test_gunzip_chunks():
+    data = b'{"results": [1, 2, 3]}' * 1000
+    compressed = gzip.compress(data)
+    chunks = [compressed[i: i+100] for i in range(0, len(compressed), 100)]
+    assert b"".join(gunzip_chunks(chunks)) == data
+    # assert uncompressed chunks pass through
+    assert b"".join(gunzip_chunks([b"", data[:10], data[10:]])) == data
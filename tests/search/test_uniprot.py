@@ -1,7 +1,19 @@
+import gzip
+import json
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
 import pandas as pd
+import pytest
 from unittest.mock import Mock, patch
 
-from homolog_search_tools.search._uniprot import UniProtRequest, uniprotrecords_to_dataframe
+from homolog_search_tools.search._cache import UniProtCache
+from homolog_search_tools.search._uniprot import (
+    UniProtRequest, _split_organism_name, _subcellular_locations, read_uniprot_tsv,
+    uniprotrecords_to_dataframe
+)
 from homolog_search_tools.search._search_utils import UniProtRequestFields
 
 def test_UniProtRequest_init():
@@ -10,7 +22,7 @@ def test_UniProtRequest_init():
     assert uniprot.email == 'example@email.com'
     assert uniprot.fields == UniProtRequestFields
 
-@patch("requests.get")
+@patch("requests.Session.get")
 def test_UniProtRequest_fetch_records(mocker):
     fake_records = [
         {
@@ -41,91 +53,395 @@ def test_UniProtRequest_fetch_records(mocker):
     # assert results
     assert records == fake_records
 
+EXAMPLE_RECORD = [{
+    'entryType': 'UniProtKB reviewed (Swiss-Prot)',
+    'primaryAccession': 'Q8PZ49',
+    'uniProtkbId': 'HACB_METMA',
+    'entryAudit': {'sequenceVersion': 1},
+    'annotationScore': 3.0,
+    'organism': {
+        'scientificName': 'Methanosarcina mazei',
+        'commonName': 'Methanosarcina frisia',
+        'taxonId': 192952},
+    'proteinExistence': '3: Inferred from homology',
+    'proteinDescription': {
+        'recommendedName': {
+            'fullName': {'value': 'Methanogen homoaconitase small subunit'},
+            'shortNames': [{'value': 'HACN'}],
+            'ecNumbers': [{
+                'evidences': [{'evidenceCode': 'ECO:0000250', 'source': 'UniProtKB', 'id': 'Q58667'}], 
+                'value': '4.2.1.114'}]},
+        'alternativeNames': [{'fullName': {'value': 'Homoaconitate hydratase'}}]},
+    'genes': [{
+        'geneName': {'value': 'hacB'},
+        'orderedLocusNames': [{'value': 'MM_0645'}]}],
+    'comments': [
+        {'texts': [{
+            'evidences': [{'evidenceCode': 'ECO:0000250', 'source': 'UniProtKB','id': 'Q58667'}],
+            'value': 'Heterotetramer of 2 HacA and 2 HacB proteins'}],
+        'commentType': 'SUBUNIT'}],
+    'features': [],
+    'uniProtKBCrossReferences': [
+        {'database': 'GO', 'id': 'GO:0004409'},
+        {'database': 'GO', 'id': 'GO:0019298'},
+        {'database': 'CDD', 'id': 'cd01577'},
+        {'database': 'Gene3D', 'id': '3.20.19.10'},
+        {'database': 'HAMAP','id': 'MF_01032'},
+        {'database': 'InterPro', 'id': 'IPR015928'},
+        {'database': 'InterPro', 'id': 'IPR000573'},
+        {'database': 'InterPro', 'id': 'IPR033940'},
+        {'database': 'InterPro', 'id': 'IPR050075'},
+        {'database': 'InterPro', 'id': 'IPR011827'},
+        {'database': 'NCBIfam', 'id': 'TIGR02087'},
+        {'database': 'PANTHER', 'id': 'PTHR43345:SF2'},
+        {'database': 'PANTHER', 'id': 'PTHR43345'},
+        {'database': 'Pfam', 'id': 'PF00694'},
+        {'database': 'SUPFAM', 'id': 'SSF52016'}],
+    'sequence': {
+        'value': 'MMENPIKGRVWKFGNDIDTDVIIPGKYLRTKDMQVFAAHAMEGIDPGFSKKAKPGDIIVAGDNFGCGSSREQAPLALKHAGIACIVAKSFARIFFRNAINIGLPLMEADIECEEGDQIEVDLLKGEVKVSGKGVFRGNKLPDFLLDMLTDGGLVAHRKKVRDQEKEESA',
+        'length': 169,
+        'molWeight': 18489,
+        'crc64': '3E1AFAEE5EDD0CBE',
+        'md5': '8A3D5F192D1BFCB786C9D44C308E70B3'},
+    'extraAttributes': {'uniParcId': 'UPI000012E400'}}]
+
+EXAMPLE_DF = {
+    'primaryAccession': {0: 'Q8PZ49'},
+    'uniProtkbId': {0: 'HACB_METMA'},
+    'genes': {0: ['hacB']},
+    'organism_scientificName': {0: 'Methanosarcina mazei'},
+    'organism_commonName': {0: 'Methanosarcina frisia'},
+    'taxonId': {0: 192952},
+    'proteinDescription': {0: 'Methanogen homoaconitase small subunit'},
+    'sequence': {0: 'MMENPIKGRVWKFGNDIDTDVIIPGKYLRTKDMQVFAAHAMEGIDPGFSKKAKPGDIIVAGDNFGCGSSREQAPLALKHAGIACIVAKSFARIFFRNAINIGLPLMEADIECEEGDQIEVDLLKGEVKVSGKGVFRGNKLPDFLLDMLTDGGLVAHRKKVRDQEKEESA'},
+    'sequenceLength': {0: 169},
+    'sequencemolWeight': {0: 18489},
+    'sequenceVersion': {0: 1},
+    'annotationScore': {0: 3.0},
+    'proteinExistence': {0: '3: Inferred from homology'},
+    'uniParcId': {0: 'UPI000012E400'},
+    'Interaction': {0: []},
+    'Subunit': {0: ['Heterotetramer of 2 HacA and 2 HacB proteins']},
+    'GO': {0: ['GO:0004409', 'GO:0019298']},
+    'SubcellularLocation': {0: []},
+    'PDBAccession': {0: []},
+    'CDD': {0: ['cd01577']},
+    'DisProt': {0: []},
+    'Gene3D': {0: ['3.20.19.10']},
+    'HAMAP': {0: ['MF_01032']},
+    'InterPro': {0: ['IPR015928', 'IPR000573', 'IPR033940', 'IPR050075', 'IPR011827']},
+    'NCBIfam': {0: ['TIGR02087']},
+    'PANTHER': {0: ['PTHR43345:SF2', 'PTHR43345']},
+    'Pfam': {0: ['PF00694']},
+    'PRINTS': {0: []},
+    'PROSITE': {0: []},
+    'SFLD': {0: []},
+    'SMART': {0: []},
+    'SUPFAM': {0: ['SSF52016']}}
+
 def test_uniprotrecords_to_dataframe():
-    example_record = [{
-        'entryType': 'UniProtKB reviewed (Swiss-Prot)',
-        'primaryAccession': 'Q8PZ49',
-        'uniProtkbId': 'HACB_METMA',
-        'entryAudit': {'sequenceVersion': 1},
-        'annotationScore': 3.0,
-        'organism': {
-            'scientificName': 'Methanosarcina mazei',
-            'commonName': 'Methanosarcina frisia',
-            'taxonId': 192952},
-        'proteinExistence': '3: Inferred from homology',
-        'proteinDescription': {
-            'recommendedName': {
-                'fullName': {'value': 'Methanogen homoaconitase small subunit'},
-                'shortNames': [{'value': 'HACN'}],
-                'ecNumbers': [{
-                    'evidences': [{'evidenceCode': 'ECO:0000250', 'source': 'UniProtKB', 'id': 'Q58667'}], 
-                    'value': '4.2.1.114'}]},
-            'alternativeNames': [{'fullName': {'value': 'Homoaconitate hydratase'}}]},
-        'genes': [{
-            'geneName': {'value': 'hacB'},
-            'orderedLocusNames': [{'value': 'MM_0645'}]}],
-        'comments': [
-            {'texts': [{
-                'evidences': [{'evidenceCode': 'ECO:0000250', 'source': 'UniProtKB','id': 'Q58667'}],
-                'value': 'Heterotetramer of 2 HacA and 2 HacB proteins'}],
-            'commentType': 'SUBUNIT'}],
-        'features': [],
-        'uniProtKBCrossReferences': [
-            {'database': 'GO', 'id': 'GO:0004409'},
-            {'database': 'GO', 'id': 'GO:0019298'},
-            {'database': 'CDD', 'id': 'cd01577'},
-            {'database': 'Gene3D', 'id': '3.20.19.10'},
-            {'database': 'HAMAP','id': 'MF_01032'},
-            {'database': 'InterPro', 'id': 'IPR015928'},
-            {'database': 'InterPro', 'id': 'IPR000573'},
-            {'database': 'InterPro', 'id': 'IPR033940'},
-            {'database': 'InterPro', 'id': 'IPR050075'},
-            {'database': 'InterPro', 'id': 'IPR011827'},
-            {'database': 'NCBIfam', 'id': 'TIGR02087'},
-            {'database': 'PANTHER', 'id': 'PTHR43345:SF2'},
-            {'database': 'PANTHER', 'id': 'PTHR43345'},
-            {'database': 'Pfam', 'id': 'PF00694'},
-            {'database': 'SUPFAM', 'id': 'SSF52016'}],
-        'sequence': {
-            'value': 'MMENPIKGRVWKFGNDIDTDVIIPGKYLRTKDMQVFAAHAMEGIDPGFSKKAKPGDIIVAGDNFGCGSSREQAPLALKHAGIACIVAKSFARIFFRNAINIGLPLMEADIECEEGDQIEVDLLKGEVKVSGKGVFRGNKLPDFLLDMLTDGGLVAHRKKVRDQEKEESA',
-            'length': 169,
-            'molWeight': 18489,
-            'crc64': '3E1AFAEE5EDD0CBE',
-            'md5': '8A3D5F192D1BFCB786C9D44C308E70B3'},
-        'extraAttributes': {'uniParcId': 'UPI000012E400'}}]
-    
-    example_df = {
-        'primaryAccession': {0: 'Q8PZ49'},
-        'uniProtkbId': {0: 'HACB_METMA'},
-        'genes': {0: ['hacB']},
-        'organism_scientificName': {0: 'Methanosarcina mazei'},
-        'organism_commonName': {0: 'Methanosarcina frisia'},
-        'taxonId': {0: 192952},
-        'proteinDescription': {0: 'Methanogen homoaconitase small subunit'},
-        'sequence': {0: 'MMENPIKGRVWKFGNDIDTDVIIPGKYLRTKDMQVFAAHAMEGIDPGFSKKAKPGDIIVAGDNFGCGSSREQAPLALKHAGIACIVAKSFARIFFRNAINIGLPLMEADIECEEGDQIEVDLLKGEVKVSGKGVFRGNKLPDFLLDMLTDGGLVAHRKKVRDQEKEESA'},
-        'sequenceLength': {0: 169},
-        'sequencemolWeight': {0: 18489},
-        'sequenceVersion': {0: 1},
-        'annotationScore': {0: 3.0},
-        'proteinExistence': {0: '3: Inferred from homology'},
-        'uniParcId': {0: 'UPI000012E400'},
-        'Interaction': {0: []},
-        'Subunit': {0: ['Heterotetramer of 2 HacA and 2 HacB proteins']},
-        'GO': {0: ['GO:0004409', 'GO:0019298']},
-        'SubcellularLocation': {0: []},
-        'PDBAccession': {0: []},
-        'CDD': {0: ['cd01577']},
-        'DisProt': {0: []},
-        'Gene3D': {0: ['3.20.19.10']},
-        'HAPMAP': {0: []},
-        'InterPro': {0: ['IPR015928', 'IPR000573', 'IPR033940', 'IPR050075', 'IPR011827']},
-        'NCBIfam': {0: ['TIGR02087']},
-        'PANTHER': {0: ['PTHR43345:SF2', 'PTHR43345']},
-        'Pfam': {0: ['PF00694']},
-        'PRINTS': {0: []},
-        'PROSITE': {0: []},
-        'SFLD': {0: []},
-        'SMART': {0: []},
-        'SUPFAM': {0: ['SSF52016']}}
-
-    uniprotrecords_to_dataframe(example_record) == pd.DataFrame(example_df)
+    pd.testing.assert_frame_equal(uniprotrecords_to_dataframe(EXAMPLE_RECORD),
+                                  pd.DataFrame(EXAMPLE_DF))
+
+def test_uniprotrecords_to_dataframe_comments():
+    base = {
+        'primaryAccession': 'Q8PZ49', 'uniProtkbId': 'HACB_METMA', 'entryAudit': {'sequenceVersion': 1},
+        'annotationScore': 3.0, 'organism': {'scientificName': 'M. mazei', 'taxonId': 192952},
+        'proteinExistence': '3: Inferred from homology', 'proteinDescription': {},
+        'uniProtKBCrossReferences': [], 'extraAttributes': {'uniParcId': 'UPI000012E400'},
+        'sequence': {'value': 'MM', 'length': 2, 'molWeight': 200}}
+    records = [
+        base,
+        {**base, 'comments': [
+            {'commentType': 'SUBUNIT', 'texts': [{'value': 'Monomer'}]},
+            {'commentType': 'INTERACTION'},
+            {'commentType': 'SUBCELLULAR LOCATION',
+             'subcellularLocations': [{'location': {'value': 'Cytoplasm'}}]},
+            {'commentType': 'SUBUNIT', 'texts': [{'value': 'Dimer'}]}]}]
+    df = uniprotrecords_to_dataframe(records)
+
+    # assert records without comments have None, malformed comments only null their column
+    assert df[["Interaction", "Subunit", "SubcellularLocation"]].to_dict("records") == [
+        {'Interaction': None, 'Subunit': None, 'SubcellularLocation': None},
+        {'Interaction': None, 'Subunit': ['Monomer', 'Dimer'], 'SubcellularLocation': ['Cytoplasm']}]
+    assert df["proteinDescription"].isna().all()
+    assert uniprotrecords_to_dataframe([]).columns.to_list() == df.columns.to_list()
+
+class StubUniProtHandler(BaseHTTPRequestHandler):
+    "Echoes requested accessions as records, with a delay that reverses completion order."
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        accessions = query["accessions"][0].split(",")
+        time.sleep(0.05 / (1 + int(accessions[0][1:])))
+        body = json.dumps({"results": [{"primaryAccession": a} for a in accessions]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubUniProtHandler)
+    server.connections = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_UniProtRequest_fetch_records_stub_server(stub_server):
+    accessions = [f"P{i:05d}" for i in range(40)]
+    uniprot = UniProtRequest('example@email.com', max_workers=4, requests_per_second=100,
+                             base_url=f"http://127.0.0.1:{stub_server.server_port}")
+    records = uniprot.fetch_records(accessions, batch_size=3)
+
+    # assert records follow the input order
+    assert [record["primaryAccession"] for record in records] == accessions
+    # assert keep-alive connections are reused across the 14 batches
+    assert stub_server.connections <= 4
+
+class FlakyStubUniProtHandler(StubUniProtHandler):
+    "Fails the first request with 503 and rejects accession A0A000 with 400."
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        accessions = query["accessions"][0].split(",")
+        self.server.requests += 1
+        if self.server.requests == 1:
+            body, status = b"{}", 503
+        elif "A0A000" in accessions:
+            body, status = json.dumps({"messages": [
+                "Accession 'A0A000' has invalid format."]}).encode(), 400
+        else:
+            body = json.dumps({"results": [{"primaryAccession": a} for a in accessions]}).encode()
+            status = 200
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Retry-After", "0")
+        self.end_headers()
+        self.wfile.write(body)
+
+def test_UniProtRequest_fetch_records_report():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyStubUniProtHandler)
+    server.connections, server.requests = 0, 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        uniprot = UniProtRequest('example@email.com', max_workers=1, requests_per_second=100,
+                                 base_url=f"http://127.0.0.1:{server.server_port}")
+        records, report = uniprot.fetch_records(
+            ["P01308", "A0A000", "not-an-id", "P05067"], return_report=True)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert [record["primaryAccession"] for record in records] == ["P01308", "P05067"]
+    assert report.invalid == ["not-an-id", "A0A000"]
+    assert report.failed == {}
+    # one 503 retry, one rejected batch, one batch without the rejected accession.
+    assert server.requests == 3
+
+def test_UniProtRequest_fetch_records_cache(tmp_path):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubUniProtHandler)
+    server.connections = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        cache = UniProtCache(tmp_path / "uniprot.sqlite")
+        uniprot = UniProtRequest('example@email.com', max_workers=1, requests_per_second=100,
+                                 base_url=f"http://127.0.0.1:{server.server_port}", cache=cache)
+        first = uniprot.fetch_records(["P00002", "P00001"])
+        with patch("requests.Session.get") as mocker:
+            second = uniprot.fetch_records(["P00001", "P00002"])
+        mocker.assert_not_called()
+        third = uniprot.fetch_records(["P00003", "P00001"])
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert [r["primaryAccession"] for r in first] == ["P00002", "P00001"]
+    assert [r["primaryAccession"] for r in second] == ["P00001", "P00002"]
+    assert [r["primaryAccession"] for r in third] == ["P00003", "P00001"]
+    assert cache.stats()["hits"] == 3
+
+class StubMergedHandler(BaseHTTPRequestHandler):
+    "Answers the secondary accession Q00001 with the record of P00001."
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.requests += 1
+        accessions = parse_qs(urlparse(self.path).query)["accessions"][0].split(",")
+        results = [{"primaryAccession": a.replace("Q00001", "P00001"),
+                    "secondaryAccessions": ["Q00001"] if a == "Q00001" else []}
+                   for a in accessions]
+        body = json.dumps({"results": results}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def test_UniProtRequest_fetch_records_cache_secondary_accession(tmp_path):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubMergedHandler)
+    server.requests = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        uniprot = UniProtRequest('example@email.com', max_workers=1, requests_per_second=100,
+                                 base_url=f"http://127.0.0.1:{server.server_port}",
+                                 cache=UniProtCache(tmp_path / "uniprot.sqlite"))
+        first = uniprot.fetch_records(["Q00001", "P00002"])
+        second = uniprot.fetch_records(["Q00001", "P00002"])
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    # assert the record is matched to the secondary accession, not appended
+    assert [r["primaryAccession"] for r in first] == ["P00001", "P00002"]
+    assert second == first
+    assert server.requests == 1
+
+class StubQueryHandler(BaseHTTPRequestHandler):
+    """
+    Serves 7 records for any query: /search in pages with a cursor in the
+    Link header, /stream in one gzip-compressed chunked response.
+    """
+    protocol_version = "HTTP/1.1"
+    records = [{"primaryAccession": f"P{i:05d}"} for i in range(7)]
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        self.server.queries.append(query)
+        if url.path.endswith("/search"):
+            size, cursor = int(query["size"][0]), int(query.get("cursor", ["0"])[0])
+            body = json.dumps({"results": self.records[cursor: cursor+size]}).encode()
+            self.send_response(200)
+            if cursor + size < len(self.records):
+                next_query = urlencode({"query": query["query"][0], "size": size,
+                                        "cursor": cursor + size})
+                self.send_header("Link", f'<http://127.0.0.1:{self.server.server_port}'
+                                         f'{url.path}?{next_query}>; rel="next"')
+        else:
+            body = gzip.compress(json.dumps({"results": self.records}).encode())
+            self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i in range(0, len(body), 16):
+            chunk = body[i: i+16]
+            self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def query_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubQueryHandler)
+    server.queries = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_UniProtRequest_search_records(query_server):
+    uniprot = UniProtRequest('example@email.com', requests_per_second=100,
+                             base_url=f"http://127.0.0.1:{query_server.server_port}")
+    records = uniprot.search_records('family:"ADH family"', size=3, compressed=False)
+
+    assert isinstance(records, types.GeneratorType)
+    assert list(records) == StubQueryHandler.records
+    # assert the cursor is followed over 3 pages
+    assert [q.get("cursor", ["0"])[0] for q in query_server.queries] == ["0", "3", "6"]
+
+    with pytest.raises(ValueError):
+        next(uniprot.search_records("adh", size=0))
+
+def test_UniProtRequest_stream_records(query_server):
+    uniprot = UniProtRequest('example@email.com', requests_per_second=100,
+                             base_url=f"http://127.0.0.1:{query_server.server_port}")
+    records = list(uniprot.stream_records('family:"ADH family"'))
+
+    assert records == StubQueryHandler.records
+    assert query_server.queries[0]["compressed"] == ["true"]
+
+EXAMPLE_TSV_ROW = "\t".join([
+    "Q8PZ49", "HACB_METMA", "hacB", "Methanosarcina mazei (Methanosarcina frisia)", "192952",
+    "Methanogen homoaconitase small subunit (HACN) (EC 4.2.1.114) (Homoaconitate hydratase)",
+    EXAMPLE_DF["sequence"][0], "169", "18,489", "1", "3.0", "Inferred from homology",
+    "UPI000012E400", "",
+    "SUBUNIT: Heterotetramer of 2 HacA and 2 HacB proteins. {ECO:0000250|UniProtKB:Q58667}.",
+    "GO:0004409; GO:0019298", "", "", "cd01577;", "", "3.20.19.10;", "MF_01032;",
+    "IPR015928;IPR000573;IPR033940;IPR050075;IPR011827;", "TIGR02087;",
+    "PTHR43345:SF2;PTHR43345;", "PF00694;", "", "", "", "", "SSF52016;"])
+
+class StubTsvHandler(BaseHTTPRequestHandler):
+    "Serves EXAMPLE_TSV_ROW gzip-compressed for every requested accession."
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        self.server.queries.append(query)
+        header = "\t".join(query["fields"][0].split(","))
+        rows = [EXAMPLE_TSV_ROW.replace("Q8PZ49", acc) for acc in query["accessions"][0].split(",")]
+        # UniProt may omit the newline after the last row of a batch.
+        body = "\n".join([header, *rows, ""] if self.server.trailing_newline else [header, *rows])
+        body = gzip.compress(body.encode())
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain;format=tsv")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def test_read_uniprot_tsv():
+    df = read_uniprot_tsv((EXAMPLE_TSV_ROW + "\n").encode())
+    expected = pd.DataFrame(EXAMPLE_DF)
+    # TSV rows have no comments structure: missing comment values are empty lists.
+    expected["Interaction"] = [[]]
+    pd.testing.assert_frame_equal(df, expected)
+
+    assert read_uniprot_tsv(b"").columns.to_list() == expected.columns.to_list()
+    assert _split_organism_name("Escherichia coli (strain K12)") == ("Escherichia coli (strain K12)", None)
+    assert _subcellular_locations(pd.Series([
+        "SUBCELLULAR LOCATION: [Isoform 1]: Cell membrane {ECO:0000269}; Single-pass membrane "
+        "protein. Cytoplasm. Note=Shuttles to the nucleus."])) == [["Cell membrane", "Cytoplasm"]]
+
+@pytest.mark.parametrize("trailing_newline", [True, False])
+def test_UniProtRequest_fetch_records_tsv(trailing_newline):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubTsvHandler)
+    server.queries = []
+    server.trailing_newline = trailing_newline
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        uniprot = UniProtRequest('example@email.com', max_workers=2, requests_per_second=100,
+                                 base_url=f"http://127.0.0.1:{server.server_port}")
+        df, report = uniprot.fetch_records(["P00002", "P00001", "not-an-id", "P00003"],
+                                           output_format="tsv", batch_size=2,
+                                           return_report=True)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert df["primaryAccession"].to_list() == ["P00002", "P00001", "P00003"]
+    assert df.columns.to_list() == list(EXAMPLE_DF)
+    assert report.invalid == ["not-an-id"]
+    assert {q["format"][0] for q in server.queries} == {"tsv"}
+    assert {q["compressed"][0] for q in server.queries} == {"true"}
+
+    with pytest.raises(ValueError):
+        uniprot.fetch_records(["P00001"], output_format="xml")
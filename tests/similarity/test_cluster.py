@@ -0,0 +1,152 @@
+from unittest.mock import patch
+import numpy as np
+import pandas as pd
+import pytest
+from homolog_search_tools.similarity import ClusterResult, MMseqs2
+from homolog_search_tools.utils import read_fasta
+from homolog_search_tools.similarity._mmseqs2 import parse_mmseqs_cluster_adjacency_list
+
+CLUSTER_TSV = (
+    "P1\tP1\nP1\tP2\nP1\tP3\n"
+    "P4\tP4\n"
+    "P5\tP6\nP5\tP5\n"  # representative not listed first
+    "P7\tP7\nP7\tP8\n"
+)
+EXPECTED = {"P1": "P1", "P2": "P1", "P3": "P1", "P4": "P4",
+            "P6": "P5", "P5": "P5", "P7": "P7", "P8": "P7"}
+
+@pytest.mark.parametrize("block_size", [1, 7, 16, 1 << 20])
+def test_ClusterResult_from_tsv(tmp_path, block_size):
+    path = tmp_path / "output_cluster.tsv"
+    path.write_text(CLUSTER_TSV)
+    clusters = ClusterResult.from_tsv(path, block_size=block_size)
+
+    # assert blocks split across chunks resolve to the same representative
+    assert dict(clusters) == EXPECTED
+    assert clusters.representatives.dtype == np.int32
+    assert clusters.accessions.dtype.kind == "S"
+
+def test_ClusterResult_from_tsv_errors(tmp_path):
+    path = tmp_path / "output_cluster.tsv"
+    path.write_text("P1\tP1\r\nP1\tP2")
+    # assert CRLF and a missing final newline are accepted
+    assert dict(ClusterResult.from_tsv(path)) == {"P1": "P1", "P2": "P1"}
+
+    path.write_text("P1\tP1\nP1 P2\n")
+    with pytest.raises(ValueError, match="Invalid cluster TSV"):
+        ClusterResult.from_tsv(path)
+    path.write_text("P1\tP2\n")
+    with pytest.raises(ValueError, match="missing"):
+        ClusterResult.from_tsv(path)
+
+def test_ClusterResult_queries(tmp_path):
+    path = tmp_path / "output_cluster.tsv"
+    path.write_text(CLUSTER_TSV)
+    clusters = parse_mmseqs_cluster_adjacency_list(path)
+
+    assert len(clusters) == 8 and clusters.n_clusters == 4
+    assert clusters["P8"] == "P7" and "P9" not in clusters
+    assert clusters.name(clusters.representatives[clusters.id_of("P3")]) == "P1"
+    assert clusters.members("P2") == ["P1", "P2", "P3"]
+    assert clusters.members("P5") == ["P6", "P5"]
+    assert clusters.sizes().to_dict() == {"P1": 3, "P5": 2, "P7": 2, "P4": 1}
+    assert clusters.to_dataframe().set_index("Member")["Representative"].to_dict() == EXPECTED
+    with pytest.raises(KeyError):
+        clusters["P9"]
+
+@pytest.mark.parametrize("name", ["clusters", "clusters.npz"])
+def test_ClusterResult_save_load(tmp_path, name):
+    clusters = ClusterResult.from_mapping(EXPECTED)
+    loaded = ClusterResult.load(clusters.save(tmp_path / name))
+    assert dict(loaded) == EXPECTED
+    if name == "clusters":
+        # assert arrays are memory-mapped
+        assert isinstance(loaded.representatives, np.memmap)
+
+def test_ClusterResult_empty(tmp_path):
+    path = tmp_path / "output_cluster.tsv"
+    path.write_text("")
+    clusters = ClusterResult.from_tsv(path)
+    assert len(clusters) == 0 and clusters.n_clusters == 0
+
+def fake_mmseqs_cluster(cmd):
+    with open(f"{cmd[3]}_cluster.tsv", "w", encoding="utf-8") as f:
+        f.write(CLUSTER_TSV)
+    return ""
+
+@patch("homolog_search_tools.similarity._mmseqs2.cmd_run", side_effect=fake_mmseqs_cluster)
+def test_MMseqs2_run_cluster(mocker):
+    clusters = MMseqs2().run_cluster("sequences.fasta", algorithm="easy-linclust")
+    assert mocker.call_args.args[0][:2] == ["mmseqs", "easy-linclust"]
+    assert dict(clusters) == EXPECTED
+
+CASCADE_SEQUENCES = pd.DataFrame({
+    "Header": [f"S{i} protein {i}" for i in range(8)],
+    "Sequence": ["MKVLAA", "MKVLAW", "MKVIAA", "MKAAAA", "MSTNPK", "MSTNPW", "MSAAAA", "WWWWWW"]})
+
+def fake_mmseqs(cmd):
+    "easy-cluster/easy-linclust grouping by a sequence prefix, and all-pairs searches."
+    if cmd[1] in ["easy-cluster", "easy-linclust"]:
+        fasta, prefix = cmd[2], cmd[3]
+        fake_mmseqs.levels.append((cmd[1], fasta))
+        width = round(float(cmd[cmd.index("--min-seq-id") + 1]) * 5)
+        headers, seqs = read_fasta(fasta)
+        groups = {}
+        for header, seq in zip(headers, seqs):
+            groups.setdefault(seq[:width], []).append((header, seq))
+        with open(f"{prefix}_cluster.tsv", "w") as tsv, open(f"{prefix}_rep_seq.fasta", "w") as rep:
+            for members in groups.values():
+                accession = members[0][0].split()[0]
+                tsv.writelines(f"{accession}\t{h.split()[0]}\n" for h, _ in members)
+                rep.write(f">{members[0][0]}\n{members[0][1]}\n")
+    elif cmd[1] == "createdb":
+        with open(cmd[3], "w") as f:
+            f.write(cmd[2])
+    elif cmd[1] == "convertalis":
+        with open(cmd[2]) as q, open(cmd[3]) as t:
+            queries, targets = read_fasta(q.read()), read_fasta(t.read())
+        fake_mmseqs.n_queries.append(len(queries[0]))
+        with open(cmd[5], "w") as f:
+            for query in queries[0]:
+                for target in targets[0]:
+                    f.write(f"{query.split()[0]}\t{target.split()[0]}\t100.0\t10\t0\t0\t1\t10\t1\t10\t"
+                            f"1e-10\t50\n")
+    return ""
+fake_mmseqs.levels, fake_mmseqs.n_queries = [], []
+
+@patch("homolog_search_tools.similarity._mmseqs2.cmd_run", side_effect=fake_mmseqs)
+def test_MMseqs2_run_cascaded_cluster(mocker):
+    fake_mmseqs.levels.clear()
+    hierarchy, representatives = MMseqs2().run_cascaded_cluster(CASCADE_SEQUENCES,
+                                                                identities=[0.8, 0.4])
+
+    # assert linclust runs on all sequences, then easy-cluster on the representatives
+    assert [algorithm for algorithm, _ in fake_mmseqs.levels] == ["easy-linclust", "easy-cluster"]
+    assert fake_mmseqs.levels[1][1].endswith("level_0_rep_seq.fasta")
+    assert [len(level) for level in hierarchy.levels] == [8, 6]
+    assert representatives["Header"].to_list() == ["S0 protein 0", "S4 protein 4", "S7 protein 7"]
+
+    flat = hierarchy.flatten()
+    assert dict(flat) == {"S0": "S0", "S1": "S0", "S2": "S0", "S3": "S0",
+                          "S4": "S4", "S5": "S4", "S6": "S4", "S7": "S7"}
+    assert dict(hierarchy.flatten(0))["S2"] == "S2"
+    assert hierarchy.representatives() == ["S0", "S4", "S7"]
+
+    with pytest.raises(ValueError):
+        MMseqs2().run_cascaded_cluster(CASCADE_SEQUENCES, identities=[0.4, 0.8])
+
+@patch("homolog_search_tools.similarity._mmseqs2.cmd_run", side_effect=fake_mmseqs)
+def test_MMseqs2_run_cluster_search(mocker):
+    fake_mmseqs.n_queries.clear()
+    hits, hierarchy = MMseqs2().run_cluster_search(CASCADE_SEQUENCES, identities=[0.8, 0.4])
+
+    # assert only the 3 final representatives are aligned
+    assert fake_mmseqs.n_queries == [3]
+    assert len(hits) == 9
+
+    expanded, _ = MMseqs2().run_cluster_search(CASCADE_SEQUENCES, identities=[0.8, 0.4],
+                                               expand=True)
+    # assert hits are projected onto every pair of members: cluster sizes 4, 3, 1
+    assert len(expanded) == (4 + 3 + 1) ** 2
+    assert {"S1", "S6"} <= set(expanded["Accession_1"].astype(str)) | set(
+        expanded["Accession_2"].astype(str))
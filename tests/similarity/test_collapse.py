@@ -0,0 +1,53 @@
+import pandas as pd
+from homolog_search_tools.similarity._collapse import (
+    collapse_identical_sequences, expand_hits, expand_tblastout
+)
+from homolog_search_tools.similarity._similarity_utils import read_transform_tblastout
+
+FAKE_SEQUENCES = pd.DataFrame({
+    "Header": ["P1 first", "P2", "P3", "P4", "P5"],
+    "Sequence": ["MKV", "MSTN", "MKV", "MKV", "MSTN"]
+})
+
+def test_collapse_identical_sequences(tmp_path):
+    representatives, members = collapse_identical_sequences(FAKE_SEQUENCES)
+
+    assert representatives["Header"].to_list() == ["P1 first", "P2"]
+    assert members.to_dict("list") == {
+        "Representative": ["P1", "P2", "P1", "P1", "P2"],
+        "Member": ["P1", "P2", "P3", "P4", "P5"]}
+
+    # assert FASTA input is collapsed the same way
+    path = tmp_path / "test.fasta"
+    path.write_text("".join(f">{h}\n{s}\n" for h, s in FAKE_SEQUENCES.itertuples(index=False)))
+    fasta_representatives, fasta_members = collapse_identical_sequences(path)
+    assert fasta_representatives["Sequence"].to_list() == ["MKV", "MSTN"]
+    pd.testing.assert_frame_equal(fasta_members, members)
+
+def test_expand_hits(tmp_path):
+    _, members = collapse_identical_sequences(FAKE_SEQUENCES)
+    tblastout = tmp_path / "output_file"
+    tblastout.write_text("P1\tP1\t100.0\t3\t0\t0\t1\t3\t1\t3\t1e-5\t20\n"
+                         "P2\tP1\t50.0\t3\t1\t0\t1\t3\t1\t3\t1e-2\t10\n"
+                         "P2\tQ9\t40.0\t3\t1\t0\t1\t3\t1\t3\t1e-1\t5\n")
+    hits = read_transform_tblastout(tblastout)
+    expanded = expand_hits(hits, members)
+
+    # 3 x 3 P1 group pairs, 2 x 3 P2-P1 pairs, 2 x 1 P2-Q9 pairs (Q9 has no members).
+    assert len(expanded) == 9 + 6 + 2
+    assert expanded.columns.to_list() == hits.columns.to_list()
+    assert set(zip(expanded["Accession_1"], expanded["Accession_2"])) >= {
+        ("P3", "P4"), ("P1", "P5"), ("P5", "Q9")}
+    assert (expanded["Accession_1"].astype(str) <= expanded["Accession_2"].astype(str)).all()
+    # assert hits keep their order
+    assert expanded["Log_E_Value"].is_monotonic_decreasing
+
+    # assert expanding the tabular output gives the same hits
+    expanded_file = tmp_path / "expanded_output_file"
+    expand_tblastout(tblastout, expanded_file, members, chunksize=2)
+    key = ["Log_E_Value", "Accession_1", "Accession_2"]
+    pd.testing.assert_frame_equal(
+        read_transform_tblastout(expanded_file).astype({"Accession_1": str, "Accession_2": str})
+        .sort_values(key).reset_index(drop=True),
+        expanded.astype({"Accession_1": str, "Accession_2": str})
+        .sort_values(key).reset_index(drop=True))
@@ -0,0 +1,54 @@
+import os
+from homolog_search_tools.similarity._database import DatabaseCache
+
+def fake_build(prefix, calls):
+    calls.append(prefix)
+    with open(f"{prefix}.pin", "w", encoding="utf-8") as f:
+        f.write("x" * 100)
+
+def write(path, content):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+    return path
+
+def test_DatabaseCache_get_or_build(tmp_path):
+    calls = []
+    cache = DatabaseCache(tmp_path / "cache")
+    fasta = write(tmp_path / "target.fasta", ">A\nMKV\n")
+
+    prefix = cache.get_or_build("blastp", fasta, lambda p: fake_build(p, calls))
+    assert os.path.exists(f"{prefix}.pin")
+    assert cache.get_or_build("blastp", fasta, lambda p: fake_build(p, calls)) == prefix
+    assert len(calls) == 1
+
+    # same content under another name hits the cache, another engine does not.
+    copy = write(tmp_path / "copy.fasta", ">A\nMKV\n")
+    assert cache.get_or_build("blastp", copy, lambda p: fake_build(p, calls)) == prefix
+    assert cache.get_or_build("diamond", copy, lambda p: fake_build(p, calls)) != prefix
+    assert len(calls) == 2
+
+def test_DatabaseCache_evict(tmp_path):
+    calls = []
+    cache = DatabaseCache(tmp_path / "cache", max_size=250)
+    prefixes = []
+    for i in range(3):
+        fasta = write(tmp_path / f"target_{i}.fasta", f">A\nMKV{i}\n")
+        prefixes.append(cache.get_or_build("blastp", fasta, lambda p: fake_build(p, calls)))
+    assert not os.path.exists(f"{prefixes[0]}.pin")
+    assert os.path.exists(f"{prefixes[2]}.pin")
+    assert cache.size() <= 250
+
+def test_DatabaseCache_use(tmp_path):
+    calls = []
+    cache = DatabaseCache(tmp_path / "cache", max_size=250)
+    fastas = [write(tmp_path / f"target_{i}.fasta", f">A\nMKV{i}\n") for i in range(3)]
+    with cache.use("blastp", fastas[0], lambda p: fake_build(p, calls)) as searched:
+        # assert the least recently used database is skipped while it is searched
+        prefixes = [cache.get_or_build("blastp", fasta, lambda p: fake_build(p, calls))
+                    for fasta in fastas[1:]]
+        assert os.path.exists(f"{searched}.pin")
+        assert not os.path.exists(f"{prefixes[0]}.pin")
+        cache.clear()
+        assert [entry for entry, _, _ in cache.entries()] == [os.path.dirname(searched)]
+    cache.clear()
+    assert cache.entries() == []
@@ -0,0 +1,43 @@
+from io import StringIO
+import numpy as np
+import pandas as pd
+import pytest
+
+from homolog_search_tools.similarity._hit_store import collect_tblastout, read_hit_table, write_hit_table
+from homolog_search_tools.similarity._similarity_utils import iter_tblastout, read_transform_tblastout
+
+pytest.importorskip("pyarrow")
+
+FAKE_TBLASTOUT = (
+    "P42212	P42212	100.000	238	0	0	1	238	1	238	0.00	494\n"
+    "P42212	Q8GHE4	99.160	238	2	0	1	238	1	238	1e-50	491\n"
+    "Q8GHE4	P42212	99.160	238	2	0	1	238	1	238	1e-300	480\n"
+)
+
+@pytest.mark.parametrize("output_format", ["parquet", "arrow"])
+def test_write_read_hit_table(tmp_path, output_format):
+    path = write_hit_table(iter_tblastout(StringIO(FAKE_TBLASTOUT), chunksize=2),
+                           tmp_path / "hits", output_format=output_format)
+    df = read_hit_table(path)
+    expected = read_transform_tblastout(StringIO(FAKE_TBLASTOUT))
+
+    assert len(list((tmp_path / "hits").iterdir())) == 2
+    assert list(df.columns) == list(expected.columns)
+    assert isinstance(df["Accession_1"].dtype, pd.CategoricalDtype)
+    assert df["Bit_Score"].dtype == np.float32
+    assert df["Query_Start"].dtype == np.int32
+    # E-values below the float32 range survive the round trip.
+    np.testing.assert_array_equal(np.sort(df["E_Value"]), np.sort(expected["E_Value"]))
+    assert sorted(df["Accession_2"].astype(str)) == sorted(expected["Accession_2"].astype(str))
+
+def test_write_hit_table_overwrite(tmp_path):
+    write_hit_table(read_transform_tblastout(StringIO(FAKE_TBLASTOUT)), tmp_path / "hits")
+    with pytest.raises(FileExistsError):
+        write_hit_table(read_transform_tblastout(StringIO(FAKE_TBLASTOUT)), tmp_path / "hits")
+    write_hit_table([], tmp_path / "hits", overwrite=True)
+    assert read_hit_table(tmp_path / "hits").empty
+
+def test_collect_tblastout(tmp_path):
+    assert isinstance(collect_tblastout(StringIO(FAKE_TBLASTOUT)), pd.DataFrame)
+    path = collect_tblastout(StringIO(FAKE_TBLASTOUT), output=tmp_path / "hits", output_format="arrow")
+    assert len(read_hit_table(path, columns=["Accession_1", "Log_E_Value"]).columns) == 2
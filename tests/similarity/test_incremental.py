@@ -0,0 +1,60 @@
+import pandas as pd
+from homolog_search_tools.similarity import (
+    diff_sequences, read_hit_table, update_hit_table, write_hit_table
+)
+
+OLD = pd.DataFrame({"Header": ["P1 kept", "P2 changed", "P3 removed"],
+                    "Sequence": ["MKV", "MKVW", "MST"],
+                    "Version": [1, 1, 1]})
+NEW = pd.DataFrame({"Header": ["P1 kept", "P2 changed", "P4 added"],
+                    "Sequence": ["MKV", "MKVA", "MSTW"],
+                    "Version": [1, 2, 1]})
+
+def hits(pairs):
+    return pd.DataFrame({
+        "Accession_1": [a for a, _ in pairs], "Accession_2": [b for _, b in pairs],
+        "Percent_Identity": 100.0, "Alignment_Length": 10, "Mismatches": 0,
+        "Gap_Openings": 0, "Query_Start": 1, "Query_End": 10, "Target_Start": 1,
+        "Target_End": 10, "E_Value": 1E-10, "Bit_Score": 50.0,
+        "Log_E_Value": [float(i) for i in range(len(pairs))]})
+
+def test_diff_sequences(tmp_path):
+    diff = diff_sequences(OLD, NEW)
+    assert (diff.added, diff.changed, diff.removed, diff.unchanged) == (
+        ["P4"], ["P2"], ["P3"], ["P1"])
+    assert diff.stale == {"P2", "P3"}
+    assert diff.fresh == ["P2", "P4"]
+
+    # assert versions are compared instead of sequences
+    new = NEW.assign(Version=[1, 1, 1])
+    assert diff_sequences(OLD, new, version_col="Version").changed == []
+
+    # assert FASTA files are read
+    path = tmp_path / "old.fasta"
+    path.write_text("".join(f">{h}\n{s}\n" for h, s in zip(OLD["Header"], OLD["Sequence"])))
+    assert diff_sequences(path, NEW) == diff
+
+def test_update_hit_table(tmp_path):
+    stored = [hits([("P1", "P1"), ("P1", "P2")]), hits([("P1", "P3"), ("P1", "P1")])]
+    path = write_hit_table(iter(stored), tmp_path / "hits")
+    partition = tmp_path / "hits" / "part-00000.parquet"
+    mtime = (tmp_path / "hits" / "part-00001.parquet").stat().st_mtime_ns
+
+    delta = hits([("P2", "P4"), ("P1", "P4")])
+    assert update_hit_table(path, delta, {"P2"}) == str(path)
+
+    # assert only the partition holding stale hits is rewritten
+    assert (tmp_path / "hits" / "part-00001.parquet").stat().st_mtime_ns == mtime
+    assert partition.exists() and (tmp_path / "hits" / "part-00002.parquet").exists()
+    pairs = read_hit_table(path)[["Accession_1", "Accession_2"]].astype(str)
+    assert list(pairs.itertuples(index=False, name=None)) == [
+        ("P1", "P1"), ("P1", "P3"), ("P1", "P1"), ("P2", "P4"), ("P1", "P4")]
+
+def test_update_hit_table_dataframe():
+    merged = update_hit_table(hits([("P1", "P2"), ("P1", "P3")]), hits([("P1", "P4")]), {"P3"})
+    assert merged["Accession_2"].astype(str).to_list() == ["P2", "P4"]
+    assert isinstance(merged["Accession_1"].dtype, pd.CategoricalDtype)
+
+    # assert removals alone are applied
+    merged = update_hit_table(hits([("P1", "P2"), ("P1", "P3")]), hits([]), {"P3"})
+    assert merged["Accession_2"].astype(str).to_list() == ["P2"]
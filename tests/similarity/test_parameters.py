@@ -0,0 +1,54 @@
+import pytest
+
+from homolog_search_tools.similarity._parameters import (
+    BlastPParameters, DiamondParameters, MMseqs2Parameters, SmithWatermanParameters
+)
+
+def test_BlastPParameters():
+    params = BlastPParameters(threads=8, evalue=1e-5)
+    assert params.search_args() == ["-num_threads", "8", "-evalue", "1e-05"]
+    assert BlastPParameters().threads >= 1
+    assert BlastPParameters(dbsize=1000).search_args()[-2:] == ["-dbsize", "1000"]
+    assert BlastPParameters().outfmt_args() == ["-outfmt", "6"]
+    assert BlastPParameters(extended_output=True).outfmt_args()[1].endswith(
+        "evalue bitscore qlen slen")
+
+def test_DiamondParameters():
+    params = DiamondParameters(threads=64, sensitivity="very-sensitive", block_size=4.0,
+                               index_chunks=1)
+    assert params.search_args() == [
+        "--threads", "64", "--block-size", "4.0", "--index-chunks", "1", "--very-sensitive"]
+    assert params.makedb_args() == ["--threads", "64"]
+    assert DiamondParameters(dbsize=1000).search_args()[-2:] == ["--dbsize", "1000"]
+    assert 0.5 <= DiamondParameters().block_size <= 2.0
+    assert DiamondParameters().outfmt_args() == []
+    assert DiamondParameters(extended_output=True).outfmt_args()[-3:] == [
+        "bitscore", "qlen", "slen"]
+
+def test_MMseqs2Parameters():
+    params = MMseqs2Parameters(threads=4, sensitivity=7.5, max_seqs=1000,
+                               split_memory_limit="12G", evalue=1e-3)
+    assert params.prefilter_args() == [
+        "--threads", "4", "-s", "7.5", "--max-seqs", "1000", "--split-memory-limit", "12G"]
+    assert params.align_args() == ["--threads", "4", "-e", "0.001"]
+    assert params.convertalis_args() == ["--threads", "4"]
+    assert MMseqs2Parameters(threads=4, extended_output=True).convertalis_args()[2:] == [
+        "--format-output",
+        "query,target,fident,alnlen,mismatch,gapopen,qstart,qend,tstart,tend,evalue,bits,qlen,tlen"]
+    assert params.cluster_args("easy-linclust") == ["--threads", "4"]
+    assert params.cluster_args()[:4] == ["--threads", "4", "-s", "7.5"]
+
+@pytest.mark.parametrize("params, kwarg", [
+    (BlastPParameters, {"threads": 0}),
+    (BlastPParameters, {"threads": 2.5}),
+    (DiamondParameters, {"sensitivity": "faster"}),
+    (DiamondParameters, {"block_size": -1.0}),
+    (DiamondParameters, {"dbsize": 0}),
+    (MMseqs2Parameters, {"sensitivity": 9.0}),
+    (MMseqs2Parameters, {"max_seqs": 0}),
+    (MMseqs2Parameters, {"db_load_mode": 5}),
+    (SmithWatermanParameters, {"gap_open": 5}),
+])
+def test_parameters_validation(params, kwarg):
+    with pytest.raises(ValueError, match="Invalid"):
+        params(**kwarg)
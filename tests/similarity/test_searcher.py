@@ -0,0 +1,97 @@
+import threading
+from unittest.mock import patch
+import pandas as pd
+import pytest
+from homolog_search_tools.similarity import MMseqs2, MMseqs2Parameters, MMseqs2Searcher
+from homolog_search_tools.utils import CommandLimits, read_fasta
+from homolog_search_tools.utils._process import CommandFailedError
+
+TARGETS = pd.DataFrame({"Header": ["T1 target", "T2 target"], "Sequence": ["MKVLA", "MSTNP"]})
+
+def fake_mmseqs(cmd, **kwarg):
+    "createdb records its input; convertalis writes a hit for every query-target pair."
+    fake_mmseqs.commands.append(cmd)
+    fake_mmseqs.kwargs.append(kwarg)
+    if cmd[1] == "createdb":
+        with open(cmd[3], "w") as f:
+            f.write(cmd[2])
+    elif cmd[1] == "convertalis":
+        fake_mmseqs.searched.wait(timeout=5)
+        with open(cmd[2]) as q, open(cmd[3]) as t:
+            (queries, query_seqs), targets = read_fasta(q.read()), read_fasta(t.read())[0]
+        if "FAIL" in query_seqs:
+            raise CommandFailedError("Command failed with exit status 1: mmseqs convertalis")
+        with open(cmd[5], "w") as f:
+            for query in queries:
+                for target in targets:
+                    f.write(f"{query}\t{target.split()[0]}\t100.0\t5\t0\t0\t1\t5\t1\t5\t1e-5\t20\n")
+    return ""
+
+@pytest.fixture
+def mmseqs():
+    fake_mmseqs.commands = []
+    fake_mmseqs.kwargs = []
+    fake_mmseqs.searched = threading.Event()
+    with patch("homolog_search_tools.similarity._mmseqs2.cmd_run", side_effect=fake_mmseqs), \
+            patch("homolog_search_tools.similarity._searcher.cmd_run", side_effect=fake_mmseqs):
+        yield MMseqs2(params=MMseqs2Parameters(threads=2))
+
+def subcommands():
+    return [cmd[1] for cmd in fake_mmseqs.commands]
+
+def test_MMseqs2Searcher_micro_batching(mmseqs):
+    with MMseqs2Searcher(TARGETS, mmseqs, max_wait=1.0) as searcher:
+        # assert the target is indexed and preloaded once
+        assert subcommands() == ["createdb", "createindex", "touchdb"]
+
+        # Requests queued while a batch waits are searched together.
+        first = searcher.submit(pd.DataFrame({"Header": ["A1 x"], "Sequence": ["MKV"]}))
+        second = searcher.submit(pd.DataFrame({"Header": ["A1 y", "B2"], "Sequence": ["MK", "MS"]}))
+        fake_mmseqs.searched.set()
+        hits = [first.result(timeout=5), second.result(timeout=5)]
+
+        assert subcommands().count("convertalis") == 1
+        # assert every request gets the hits of its own queries, accessions restored
+        assert len(hits[0]) == 2 and len(hits[1]) == 4
+        assert set(hits[0]["Accession_1"].astype(str)) == {"A1"}
+        assert set(hits[1]["Accession_1"].astype(str)) == {"A1", "B2"}
+        assert searcher.stats["batches"] == 1 and searcher.stats["requests"] == 2
+
+        prefilter = next(cmd for cmd in fake_mmseqs.commands if cmd[1] == "prefilter")
+        assert prefilter[prefilter.index("--db-load-mode") + 1] == "2"
+        # assert later batches reuse the target
+        searcher.search(pd.DataFrame({"Header": ["C3"], "Sequence": ["MKVL"]}), timeout=5)
+        assert subcommands().count("createindex") == 1
+        assert subcommands().count("convertalis") == 2
+
+def test_MMseqs2Searcher_max_batch_size(mmseqs):
+    fake_mmseqs.searched.set()
+    with MMseqs2Searcher(TARGETS, mmseqs, max_batch_size=2, max_wait=1.0, touch=False) as searcher:
+        futures = [searcher.submit(pd.DataFrame({"Header": [f"Q{i}"], "Sequence": ["MKV"]}))
+                   for i in range(4)]
+        assert [len(future.result(timeout=5)) for future in futures] == [2, 2, 2, 2]
+    assert "touchdb" not in subcommands()
+    assert subcommands().count("convertalis") == 2
+
+def test_MMseqs2Searcher_errors(mmseqs):
+    fake_mmseqs.searched.set()
+    searcher = MMseqs2Searcher(TARGETS, mmseqs, max_wait=0)
+    # assert failed searches fail their requests, not the searcher
+    with pytest.raises(CommandFailedError):
+        searcher.search(pd.DataFrame({"Header": ["bad"], "Sequence": ["FAIL"]}), timeout=5)
+    assert len(searcher.search(pd.DataFrame({"Header": ["ok"], "Sequence": ["MKV"]}), timeout=5)) == 2
+    searcher.close()
+    with pytest.raises(RuntimeError):
+        searcher.submit(TARGETS)
+
+    with pytest.raises(ValueError):
+        MMseqs2Searcher(TARGETS, mmseqs, max_batch_size=0)
+
+def test_MMseqs2Searcher_limits(mmseqs):
+    fake_mmseqs.searched.set()
+    mmseqs = MMseqs2(params=MMseqs2Parameters(threads=2), limits=CommandLimits(timeout=60))
+    with MMseqs2Searcher(TARGETS, mmseqs, max_wait=0) as searcher:
+        searcher.search(pd.DataFrame({"Header": ["Q1"], "Sequence": ["MKV"]}), timeout=5)
+    # assert the limits survive the db_load_mode default, touchdb included
+    assert "touchdb" in subcommands()
+    assert fake_mmseqs.kwargs == [{"timeout": 60}] * len(fake_mmseqs.commands)
@@ -0,0 +1,37 @@
+import pytest
+
+from homolog_search_tools.similarity._sharding import concatenate_files, run_shards, split_fasta
+
+def test_split_fasta(tmp_path):
+    fasta = tmp_path / "query.fasta"
+    fasta.write_text(">s1\nAMINO\nACID\n>s2\nNEXT\n>s3\nSEQ\n", encoding="utf-8")
+    shards = split_fasta(fasta, tmp_path / "shards", shard_size=2)
+    assert [open(shard, encoding="utf-8").read() for shard in shards] == [
+        ">s1\nAMINO\nACID\n>s2\nNEXT\n", ">s3\nSEQ\n"]
+    with pytest.raises(ValueError):
+        split_fasta(fasta, tmp_path / "shards", shard_size=0)
+
+def test_concatenate_files(tmp_path):
+    paths = []
+    for i in range(3):
+        paths.append(tmp_path / f"part_{i}")
+        paths[-1].write_text(f"line {i}\n", encoding="utf-8")
+    concatenate_files(paths, tmp_path / "output")
+    assert (tmp_path / "output").read_text(encoding="utf-8") == "line 0\nline 1\nline 2\n"
+
+def test_run_shards_retry(tmp_path):
+    attempts = {}
+
+    def flaky_search(shard, output):
+        attempts[shard] = attempts.get(shard, 0) + 1
+        if shard == "b" and attempts[shard] == 1:
+            raise RuntimeError("transient failure")
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(shard)
+
+    outputs = [str(tmp_path / shard) for shard in "abc"]
+    run_shards(flaky_search, list("abc"), outputs, max_workers=2, retries=1)
+    assert attempts == {"a": 1, "b": 2, "c": 1}
+
+    with pytest.raises(RuntimeError):
+        run_shards(lambda shard, output: None, ["d"], [str(tmp_path / "d")], retries=2)
@@ -1,10 +1,14 @@
 from io import StringIO
 import numpy as np
 import pandas as pd
+import pytest
 
 from homolog_search_tools.similarity._similarity_utils import (
-    _compute_log_evalue, _alphabetized_accessions, _read_tblastout, read_transform_tblastout
+    _compute_log_evalue, _alphabetized_accessions, _alphabetized_accession_columns,
+    _read_tblastout, read_transform_tblastout, iter_tblastout
 )
+from homolog_search_tools.similarity import _streaming
+from homolog_search_tools.similarity._streaming import external_sort, hash_partition
 
 def test__compute_log_evalue():
     np.testing.assert_equal(
@@ -25,6 +29,13 @@ def test__alphabetized_accessions():
     assert _alphabetized_accessions({"Query_Accession": "BB", "Target_Accession": "AA"}) == ("AA", "BB")
     assert _alphabetized_accessions({"Query_Accession": "AA", "Target_Accession": "AA"}) == ("AA", "AA")
 
+def test__alphabetized_accession_columns():
+    accession_1, accession_2 = _alphabetized_accession_columns(
+        pd.Series(["AA", "BB", "AA", "CC"]), pd.Series(["BB", "AA", "AA", "BB"]))
+    assert list(accession_1) == ["AA", "AA", "AA", "BB"]
+    assert list(accession_2) == ["BB", "BB", "AA", "CC"]
+    assert list(accession_1.categories) == list(accession_2.categories) == ["AA", "BB", "CC"]
+
 def test__read_tblastout():
     fake_df = pd.DataFrame({
         'Query_Accession': {0: 'P42212'},
@@ -64,4 +75,110 @@ def test_read_transform_tblastout():
         "P42212	Q8GHE4	99.160	238	2	0	1	238	1	238	0.01	491"
     )
     assert all(read_transform_tblastout(fake_file) == fake_df)
-    
\ No newline at end of file
+
+FAKE_TBLASTOUT = (
+    "P42212	P42212	100.000	238	0	0	1	238	1	238	0.00	494\n"
+    "P42212	Q8GHE4	99.160	238	2	0	1	238	1	238	1e-50	491\n"
+    "Q8GHE4	P42212	99.160	238	2	0	1	238	1	238	1e-40	480\n"
+    "Q8GHE4	A0A000	35.000	120	70	3	5	125	9	130	1e-3	40\n"
+    "A0A000	Q8GHE4	35.000	120	70	3	9	130	5	125	5	21\n"
+)
+
+def test_iter_tblastout():
+    expected = read_transform_tblastout(StringIO(FAKE_TBLASTOUT))
+    chunks = list(iter_tblastout(StringIO(FAKE_TBLASTOUT), chunksize=2))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    output = pd.concat(chunks).sort_values("Log_E_Value", ascending=False)
+    np.testing.assert_array_equal(output["Log_E_Value"], expected["Log_E_Value"])
+    # zero E-values use the file-wide smallest non-zero E-value, not the chunk's.
+    assert chunks[0]["Log_E_Value"].iloc[0] == 50.0
+
+def test_iter_tblastout_filters():
+    output = pd.concat(iter_tblastout(
+        StringIO(FAKE_TBLASTOUT), chunksize=2, max_evalue=1e-2, min_bit_score=45, min_identity=90))
+    assert len(output) == 3
+    assert (output["Percent_Identity"] >= 90).all()
+
+def test_iter_tblastout_sort():
+    output = pd.concat(iter_tblastout(StringIO(FAKE_TBLASTOUT), chunksize=2, sort=True))
+    expected = read_transform_tblastout(StringIO(FAKE_TBLASTOUT))
+    np.testing.assert_array_equal(output["Log_E_Value"], expected["Log_E_Value"])
+    np.testing.assert_array_equal(output["Bit_Score"], expected["Bit_Score"])
+
+EXTENDED_TBLASTOUT = "".join(
+    f"{line}\t{lengths}\n" for line, lengths in zip(
+        FAKE_TBLASTOUT.splitlines(), ["238\t238", "238\t240", "240\t238", "240\t400", "400\t240"]))
+
+def test_read_transform_tblastout_extended():
+    output = read_transform_tblastout(StringIO(EXTENDED_TBLASTOUT))
+    assert list(output.columns[-4:]) == [
+        "Query_Length", "Target_Length", "Query_Coverage", "Target_Coverage"]
+    hit = output[output["Bit_Score"] == 40.0].iloc[0]
+    assert hit["Query_Coverage"] == pytest.approx(121 / 240)
+    assert hit["Target_Coverage"] == pytest.approx(122 / 400)
+    assert "Query_Coverage" not in read_transform_tblastout(StringIO(FAKE_TBLASTOUT))
+
+def test_tblastout_coverage_filter():
+    expected = read_transform_tblastout(StringIO(EXTENDED_TBLASTOUT), min_coverage=0.9,
+                                        chunksize=2)
+    assert list(expected["Bit_Score"]) == [494.0, 491.0, 480.0]
+    # zero E-values still use the file-wide smallest non-zero E-value.
+    assert expected["Log_E_Value"].iloc[0] == 50.0
+    output = pd.concat(iter_tblastout(StringIO(EXTENDED_TBLASTOUT), chunksize=2,
+                                      min_coverage=0.9, sort=True))
+    np.testing.assert_array_equal(output["Query_Coverage"], expected["Query_Coverage"])
+    with pytest.raises(ValueError, match="Query_Length"):
+        read_transform_tblastout(StringIO(FAKE_TBLASTOUT), min_coverage=0.9)
+    with pytest.raises(ValueError, match="13 columns"):
+        read_transform_tblastout(StringIO("P42212\t" + FAKE_TBLASTOUT.splitlines()[0]))
+
+def test_external_sort():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"Key": rng.normal(size=500), "Value": np.arange(500)})
+    df.loc[::50, "Key"] = np.nan
+    chunks = [df.iloc[i: i + 70] for i in range(0, len(df), 70)]
+    output = pd.concat(external_sort(chunks, "Key", ascending=False, block_rows=16))
+    expected = df.sort_values("Key", ascending=False)
+    np.testing.assert_array_equal(output["Key"], expected["Key"])
+
+def test_external_sort_bounded_merge(monkeypatch):
+    loaded = []
+    load_next = _streaming._SpilledRun.load_next
+    def record_load_next(self):
+        block = load_next(self)
+        loaded.append(len(block))
+        return block
+    monkeypatch.setattr(_streaming._SpilledRun, "load_next", record_load_next)
+
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"Key": rng.normal(size=40_000), "Value": np.arange(40_000)})
+    chunks = [df.iloc[i: i + 5_000] for i in range(0, len(df), 5_000)]
+    output = list(external_sort(chunks, "Key", ascending=False, block_rows=16_384))
+    np.testing.assert_array_equal(pd.concat(output)["Key"],
+                                  df.sort_values("Key", ascending=False)["Key"])
+    # 8 runs share the merge budget: 2,048 rows per block, 16,384 buffered at most.
+    assert max(loaded) == 16_384 // 8
+    assert max(len(chunk) for chunk in output) <= 16_384
+
+def test_read_transform_tblastout_collapse():
+    output = read_transform_tblastout(StringIO(FAKE_TBLASTOUT), collapse="bit_score")
+    assert list(zip(output["Accession_1"], output["Accession_2"], output["Bit_Score"])) == [
+        ("P42212", "Q8GHE4", 491.0), ("A0A000", "Q8GHE4", 40.0)]
+    output = read_transform_tblastout(StringIO(FAKE_TBLASTOUT), collapse="evalue")
+    assert list(output["Bit_Score"]) == [491.0, 40.0]
+
+def test_iter_tblastout_collapse():
+    expected = read_transform_tblastout(StringIO(FAKE_TBLASTOUT), collapse="bit_score")
+    output = pd.concat(iter_tblastout(
+        StringIO(FAKE_TBLASTOUT), chunksize=1, collapse="bit_score", num_partitions=3, sort=True))
+    assert list(output["Bit_Score"]) == list(expected["Bit_Score"])
+    assert list(output["Accession_1"].astype(str)) == list(expected["Accession_1"].astype(str))
+
+def test_hash_partition():
+    df = pd.DataFrame({"Key": ["a", "b", "c", "a", "b", "a"], "Value": range(6)})
+    chunks = [df.iloc[i: i + 2] for i in range(0, len(df), 2)]
+    partitions = list(hash_partition(chunks, ["Key"], num_partitions=4))
+    assert sum(len(partition) for partition in partitions) == len(df)
+    for partition in partitions:
+        for key in partition["Key"].unique():
+            assert (partition["Key"] == key).sum() == (df["Key"] == key).sum()
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from homolog_search_tools.similarity import SmithWaterman, SmithWatermanParameters
+from homolog_search_tools.similarity._scoring import BLOSUM62, encode_sequence
+from homolog_search_tools.similarity._similarity_utils import FINAL_COLUMNS
+from homolog_search_tools.similarity._smith_waterman import _align_pairs
+
+def gotoh_score(query, target, gap_open, gap_extend):
+    "Best local alignment score, cell by cell."
+    neg = -10**9
+    h = np.zeros((len(query) + 1, len(target) + 1), dtype=np.int64)
+    e, f = np.full_like(h, neg), np.full_like(h, neg)
+    for i in range(1, len(query) + 1):
+        for j in range(1, len(target) + 1):
+            e[i, j] = max(h[i, j - 1] - gap_open - gap_extend, e[i, j - 1] - gap_extend)
+            f[i, j] = max(h[i - 1, j] - gap_open - gap_extend, f[i - 1, j] - gap_extend)
+            h[i, j] = max(0, h[i - 1, j - 1] + BLOSUM62[query[i - 1], target[j - 1]],
+                          e[i, j], f[i, j])
+    return h.max()
+
+def mutated_pairs(n, seed=0):
+    rng = np.random.default_rng(seed)
+    residues = list("ACDEFGHIKLMNPQRSTVWY")
+    queries, targets = [], []
+    for _ in range(n):
+        query = list(rng.choice(residues, rng.integers(5, 30)))
+        target = query.copy()
+        for _ in range(rng.integers(0, 6)):
+            position = int(rng.integers(0, len(target)))
+            if rng.random() < 0.5:
+                target[position] = rng.choice(residues)
+            else:
+                target[position:position] = list(rng.choice(residues, rng.integers(1, 5)))
+        queries.append(encode_sequence("".join(query)))
+        targets.append(encode_sequence("".join(target)))
+    return queries, targets
+
+@pytest.mark.parametrize("gap_open, gap_extend", [(11, 1), (10, 2)])
+def test__align_pairs(gap_open, gap_extend):
+    queries, targets = mutated_pairs(40)
+    output = _align_pairs(queries, targets, np.arange(len(targets)), np.zeros(len(targets)),
+                          gap_open, gap_extend)
+    expected = [gotoh_score(q, t, gap_open, gap_extend) for q, t in zip(queries, targets)]
+    np.testing.assert_array_equal(output["Score"], expected)
+    # the reported coordinates delimit an alignment with the best score.
+    for k, (query, target) in enumerate(zip(queries, targets)):
+        assert gotoh_score(query[output["Query_Start"][k] - 1: output["Query_End"][k]],
+                           target[output["Target_Start"][k] - 1: output["Target_End"][k]],
+                           gap_open, gap_extend) == output["Score"][k]
+    matches = output["Identities"] + output["Mismatches"]
+    gaps = (output["Query_End"] - output["Query_Start"] + output["Target_End"]
+            - output["Target_Start"] + 2 - 2 * matches)
+    np.testing.assert_array_equal(output["Alignment_Length"], matches + gaps)
+
+SEQUENCES = pd.DataFrame({
+    "Header": ["P1 first", "P2 second", "P3 third"],
+    "Sequence": ["MKVLAAGIWHEKRTDECY", "MKVLAAGIWHPPPPPPEKRTDECY", "GSGSGSGS"]})
+
+def test_SmithWaterman_run():
+    output = SmithWaterman(SmithWatermanParameters(threads=1)).run_allvsall(SEQUENCES)
+    assert list(output.columns) == FINAL_COLUMNS
+    self_hit = output[(output["Accession_1"] == "P1") & (output["Accession_2"] == "P1")].iloc[0]
+    assert self_hit["Percent_Identity"] == 100.0
+    assert (self_hit["Query_Start"], self_hit["Query_End"], self_hit["Alignment_Length"]) == (1, 18, 18)
+    gapped = output[(output["Accession_1"] == "P1") & (output["Accession_2"] == "P2")].iloc[0]
+    assert (gapped["Gap_Openings"], gapped["Mismatches"], gapped["Alignment_Length"]) == (1, 0, 24)
+    assert (gapped["Target_Start"], gapped["Target_End"]) == (1, 24)
+    assert output["Log_E_Value"].is_monotonic_decreasing
+    assert (output["E_Value"] <= 10.0).all()
+
+def test_SmithWaterman_run_process_pool():
+    expected = SmithWaterman(SmithWatermanParameters(threads=1)).run_allvsall(SEQUENCES)
+    output = SmithWaterman(SmithWatermanParameters(threads=2, max_cells=64)).run_allvsall(SEQUENCES)
+    pd.testing.assert_frame_equal(output.sort_index(), expected.sort_index())
+
+def test_SmithWaterman_run_min_coverage():
+    params = SmithWatermanParameters(threads=1, extended_output=True)
+    output = SmithWaterman(params).run(SEQUENCES.iloc[:1], SEQUENCES.iloc[:2], min_coverage=0.9)
+    assert list(output["Target_Length"]) == [18, 24]
+    assert list(output["Query_Coverage"]) == [1.0, 1.0]
+    output = SmithWaterman(params).run(SEQUENCES.iloc[:2], SEQUENCES.iloc[:1], min_coverage=0.9)
+    assert len(output) == 2
+    with pytest.raises(ValueError, match="extended_output"):
+        SmithWaterman().run(SEQUENCES, SEQUENCES, min_coverage=0.9)
+
+def test_SmithWaterman_run_collapse_identical():
+    sequences = pd.concat([SEQUENCES, SEQUENCES.assign(Header=["P4", "P5", "P6"])],
+                          ignore_index=True)
+    key = ["Accession_1", "Accession_2"]
+    expected = SmithWaterman(SmithWatermanParameters(threads=1)).run_allvsall(sequences)
+    output = SmithWaterman(SmithWatermanParameters(threads=1)).run_allvsall(
+        sequences, collapse_identical=True)
+    # assert E-values are computed against all targets, not the representatives
+    expected = expected.astype({"Accession_1": str, "Accession_2": str}).sort_values(key)
+    output = output.astype({"Accession_1": str, "Accession_2": str}).sort_values(key)
+    assert output[key].values.tolist() == expected[key].values.tolist()
+    np.testing.assert_allclose(output["E_Value"], expected["E_Value"])
@@ -0,0 +1,254 @@
+from unittest.mock import patch
+import pandas as pd
+import pytest
+
+from homolog_search_tools.similarity import (
+    BlastP, BlastPParameters, Diamond, MMseqs2, MMseqs2Parameters, read_hit_table
+)
+from homolog_search_tools.similarity._database import DatabaseCache
+from homolog_search_tools.utils import CommandLimits, read_fasta
+
+FAKE_SEQUENCES = pd.DataFrame({
+    "Header": {0: "sequence 1", 1: "sequence 2"},
+    "Sequence": {0: "AMINOACID", 1: "NEXTSEQUENCE"}
+})
+
+def commands(mocker):
+    return [call.args[0] for call in mocker.call_args_list]
+
+@patch("homolog_search_tools.similarity._wrapper.collect_tblastout")
+@patch("homolog_search_tools.similarity._blastp.cmd_run")
+def test_BlastP_run(mocker, _):
+    BlastP().run_allvsall(FAKE_SEQUENCES)
+    makeblastdb, blastp = commands(mocker)
+    assert makeblastdb[:2] == ["makeblastdb", "-in"]
+    assert blastp[0] == "blastp"
+    assert blastp[blastp.index("-db") + 1] == makeblastdb[makeblastdb.index("-out") + 1]
+
+@patch("homolog_search_tools.similarity._wrapper.collect_tblastout")
+@patch("homolog_search_tools.similarity._mmseqs2.cmd_run")
+def test_MMseqs2_run_limits(mocker, _):
+    on_stderr = lambda line: None
+    MMseqs2(limits=CommandLimits(timeout=60, cpu_time_limit=30, on_stderr=on_stderr)).run_allvsall(
+        FAKE_SEQUENCES)
+    assert [call.kwargs for call in mocker.call_args_list] == [
+        {"timeout": 60, "cpu_time_limit": 30, "on_stderr": on_stderr}] * 5
+
+@patch("homolog_search_tools.similarity._wrapper.collect_tblastout")
+@patch("homolog_search_tools.similarity._diamond.cmd_run")
+def test_Diamond_run_database_cache(mocker, _, tmp_path):
+    diamond = Diamond(database_cache=DatabaseCache(tmp_path))
+    diamond.run_allvsall(FAKE_SEQUENCES)
+    diamond.run_allvsall(FAKE_SEQUENCES)
+    subcommands = [cmd[1] for cmd in commands(mocker)]
+    assert subcommands == ["makedb", "blastp", "blastp"]
+
+@patch("homolog_search_tools.similarity._wrapper.collect_tblastout")
+@patch("homolog_search_tools.similarity._mmseqs2.cmd_run")
+def test_MMseqs2_run_database_cache_options(mocker, _, tmp_path):
+    cache = DatabaseCache(tmp_path)
+    MMseqs2(params=MMseqs2Parameters(sensitivity=4.0), database_cache=cache).run_allvsall(FAKE_SEQUENCES)
+    # thread counts do not change the index, a new sensitivity does.
+    MMseqs2(params=MMseqs2Parameters(sensitivity=4.0, threads=8),
+            database_cache=cache).run_allvsall(FAKE_SEQUENCES)
+    MMseqs2(params=MMseqs2Parameters(sensitivity=7.5), database_cache=cache).run_allvsall(FAKE_SEQUENCES)
+    createindex = [cmd for cmd in commands(mocker) if cmd[1] == "createindex"]
+    assert [cmd[cmd.index("-s") + 1] for cmd in createindex] == ["4.0", "7.5"]
+
+@patch("homolog_search_tools.similarity._wrapper.collect_tblastout")
+@patch("homolog_search_tools.similarity._mmseqs2.cmd_run")
+def test_MMseqs2_run(mocker, _):
+    MMseqs2().run_allvsall(FAKE_SEQUENCES)
+    subcommands = [cmd[1] for cmd in commands(mocker)]
+    assert subcommands == ["createdb", "createdb", "prefilter", "align", "convertalis"]
+    # createdb converts the written FASTA, not the DataFrame.
+    assert all(isinstance(arg, str) for cmd in commands(mocker) for arg in cmd)
+
+def fake_blastp(cmd):
+    "Writes one self hit per query, as blastp -outfmt 6 would."
+    if cmd[0] == "makeblastdb":
+        open(f"{cmd[cmd.index('-out') + 1]}.pin", "w", encoding="utf-8").close()
+    if cmd[0] != "blastp":
+        return ""
+    query, output = cmd[cmd.index("-query") + 1], cmd[cmd.index("-out") + 1]
+    headers = [line[1:].strip() for line in open(query, encoding="utf-8") if line.startswith(">")]
+    with open(output, "w", encoding="utf-8") as f:
+        for header in headers:
+            f.write(f"{header}\t{header}\t100.0\t10\t0\t0\t1\t10\t1\t10\t1e-{header[1:]}\t50\n")
+    return ""
+
+@patch("homolog_search_tools.similarity._blastp.cmd_run", side_effect=fake_blastp)
+def test_BlastP_run_sharded(mocker):
+    sequences = pd.DataFrame({"Header": [f"P{i:05d}" for i in range(7)], "Sequence": ["MKV"] * 7})
+    expected = BlastP().run_allvsall(sequences)
+    output = BlastP().run_allvsall(sequences, shard_size=2, max_workers=3)
+    pd.testing.assert_frame_equal(output, expected)
+    assert sum(cmd[0] == "blastp" for cmd in commands(mocker)) == 1 + 4
+
+def fake_blastp_extended(cmd):
+    "Writes one hit per query, with the query and target lengths of -outfmt '6 ... qlen slen'."
+    if cmd[0] == "makeblastdb":
+        open(f"{cmd[cmd.index('-out') + 1]}.pin", "w", encoding="utf-8").close()
+    if cmd[0] != "blastp":
+        return ""
+    assert cmd[cmd.index("-outfmt") + 1].endswith(" qlen slen")
+    query, output = cmd[cmd.index("-query") + 1], cmd[cmd.index("-out") + 1]
+    headers = [line[1:].strip() for line in open(query, encoding="utf-8") if line.startswith(">")]
+    with open(output, "w", encoding="utf-8") as f:
+        for i, header in enumerate(headers):
+            f.write(f"{header}\t{header}\t100.0\t10\t0\t0\t1\t10\t1\t10\t1e-10\t50\t"
+                    f"{10 * (i + 1)}\t{10 * (i + 1)}\n")
+    return ""
+
+@patch("homolog_search_tools.similarity._blastp.cmd_run", side_effect=fake_blastp_extended)
+def test_BlastP_run_min_coverage(mocker, tmp_path):
+    sequences = pd.DataFrame({"Header": [f"P{i:05d}" for i in range(3)], "Sequence": ["MKV"] * 3})
+    blastp = BlastP(params=BlastPParameters(extended_output=True))
+    output = blastp.run_allvsall(sequences, min_coverage=0.5)
+    assert list(output["Accession_1"].astype(str)) == ["P00000", "P00001"]
+    assert list(output["Query_Coverage"]) == [1.0, 0.5]
+    output = read_hit_table(blastp.run_allvsall(sequences, min_coverage=0.5,
+                                                output=tmp_path / "hits"))
+    assert len(output) == 2
+    with pytest.raises(ValueError, match="extended_output"):
+        BlastP().run_allvsall(sequences, min_coverage=0.5)
+
+class FakeMMseqs2:
+    "Creates the output of every mmseqs command, failing once on `fail_on`."
+
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.calls = []
+
+    def __call__(self, cmd):
+        self.calls.append(cmd[1])
+        if cmd[1] == self.fail_on:
+            self.fail_on = None
+            raise RuntimeError("killed")
+        outputs = {"createdb": 3, "prefilter": 4, "align": 5, "convertalis": 5}
+        with open(cmd[outputs[cmd[1]]], "w", encoding="utf-8") as f:
+            if cmd[1] == "convertalis":
+                f.write("P00001\tP00002\t100.0\t10\t0\t0\t1\t10\t1\t10\t1e-10\t50\n")
+        return ""
+
+def test_MMseqs2_run_work_dir_resume(tmp_path):
+    fake = FakeMMseqs2(fail_on="align")
+    with patch("homolog_search_tools.similarity._mmseqs2.cmd_run", side_effect=fake):
+        mmseqs2 = MMseqs2()
+        try:
+            mmseqs2.run_allvsall(FAKE_SEQUENCES, work_dir=tmp_path)
+        except RuntimeError:
+            pass
+        assert fake.calls == ["createdb", "createdb", "prefilter", "align"]
+
+        fake.calls = []
+        output = mmseqs2.run_allvsall(FAKE_SEQUENCES, work_dir=tmp_path)
+        assert fake.calls == ["align", "convertalis"]
+        assert len(output) == 1
+
+        fake.calls = []
+        mmseqs2.run_allvsall(FAKE_SEQUENCES, work_dir=tmp_path)
+        assert fake.calls == []
+
+        # changed inputs invalidate the query stages and the target database.
+        fake.calls = []
+        mmseqs2.run_allvsall(FAKE_SEQUENCES.iloc[:1], work_dir=tmp_path)
+        assert fake.calls == ["createdb", "createdb", "prefilter", "align", "convertalis"]
+
+@patch("homolog_search_tools.similarity._blastp.cmd_run", side_effect=fake_blastp)
+def test_BlastP_run_sharded_work_dir_resume(mocker, tmp_path):
+    sequences = pd.DataFrame({"Header": [f"P{i:05d}" for i in range(5)], "Sequence": ["MKV"] * 5})
+    blastp = BlastP()
+    expected = blastp.run_allvsall(sequences, shard_size=2, work_dir=tmp_path)
+    mocker.reset_mock()
+    output = blastp.run_allvsall(sequences, shard_size=2, work_dir=tmp_path)
+    assert commands(mocker) == []
+    pd.testing.assert_frame_equal(output, expected)
+
+def fake_blastp_all_pairs(cmd):
+    """
+    Writes a hit for every query-target pair, scored from the sequences only,
+    with E-values proportional to the database size when scale_by_dbsize is set.
+    """
+    if cmd[0] == "makeblastdb":
+        with open(f"{cmd[cmd.index('-out') + 1]}.pin", "w", encoding="utf-8") as f:
+            f.write(cmd[cmd.index("-in") + 1])
+    if cmd[0] != "blastp":
+        return ""
+    query, output = cmd[cmd.index("-query") + 1], cmd[cmd.index("-out") + 1]
+    with open(f"{cmd[cmd.index('-db') + 1]}.pin", encoding="utf-8") as f:
+        target = f.read()
+    queries, targets = read_fasta(query), read_fasta(target)
+    fake_blastp_all_pairs.n_queries.append(len(queries[0]))
+    dbsize = 1
+    if fake_blastp_all_pairs.scale_by_dbsize:
+        dbsize = (int(cmd[cmd.index("-dbsize") + 1]) if "-dbsize" in cmd else
+                  sum(len(t_seq) for t_seq in targets[1]))
+    with open(output, "w", encoding="utf-8") as f:
+        for q, q_seq in zip(*queries):
+            for t, t_seq in zip(*targets):
+                f.write(f"{q}\t{t}\t100.0\t10\t0\t0\t1\t10\t1\t10\t"
+                        f"{dbsize}e-{len(q_seq) * len(t_seq)}\t{len(q_seq) + len(t_seq)}\n")
+    return ""
+fake_blastp_all_pairs.n_queries = []
+fake_blastp_all_pairs.scale_by_dbsize = False
+
+@patch("homolog_search_tools.similarity._blastp.cmd_run", side_effect=fake_blastp_all_pairs)
+def test_BlastP_run_collapse_identical(mocker):
+    sequences = pd.DataFrame({"Header": [f"P{i:05d}" for i in range(8)],
+                              "Sequence": ["MKV", "MKVW", "MKV", "MK", "MKVW", "MKV", "MK", "MKVWA"]})
+    key = ["Log_E_Value", "Accession_1", "Accession_2"]
+    expected = BlastP().run_allvsall(sequences).astype({"Accession_1": str, "Accession_2": str})
+    output = BlastP().run_allvsall(sequences, collapse_identical=True).astype(
+        {"Accession_1": str, "Accession_2": str})
+
+    # assert the 4 distinct sequences are aligned, and the hits of all 8 are recovered
+    assert fake_blastp_all_pairs.n_queries[-2:] == [8, 4]
+    pd.testing.assert_frame_equal(output.sort_values(key).reset_index(drop=True),
+                                  expected.sort_values(key).reset_index(drop=True))
+
+@patch("homolog_search_tools.similarity._blastp.cmd_run", side_effect=fake_blastp_all_pairs)
+def test_BlastP_run_collapse_identical_evalues(mocker, monkeypatch):
+    monkeypatch.setattr(fake_blastp_all_pairs, "scale_by_dbsize", True)
+    sequences = pd.DataFrame({"Header": [f"P{i}" for i in range(8)],
+                              "Sequence": ["MKV", "MSTN", "MKVW", "MST"] * 2})
+    key = ["Accession_1", "Accession_2"]
+    expected = BlastP().run_allvsall(sequences).astype({"Accession_1": str, "Accession_2": str})
+    output = BlastP().run_allvsall(sequences, collapse_identical=True).astype(
+        {"Accession_1": str, "Accession_2": str})
+
+    # assert the 4 representatives are searched with the size of all 8 targets
+    blastp = commands(mocker)[-1]
+    assert blastp[blastp.index("-dbsize") + 1] == "28"
+    pd.testing.assert_series_equal(
+        output.sort_values(key)["E_Value"].reset_index(drop=True),
+        expected.sort_values(key)["E_Value"].reset_index(drop=True))
+    # assert an explicit dbsize is kept
+    BlastP(params=BlastPParameters(dbsize=100)).run_allvsall(sequences, collapse_identical=True)
+    blastp = commands(mocker)[-1]
+    assert blastp[blastp.index("-dbsize") + 1] == "100"
+
+@patch("homolog_search_tools.similarity._blastp.cmd_run", side_effect=fake_blastp_all_pairs)
+def test_BlastP_run_allvsall_incremental(mocker, tmp_path):
+    old = pd.DataFrame({"Header": [f"P{i}" for i in range(6)],
+                        "Sequence": ["MKV", "MKVW", "MK", "MKVWA", "MSTV", "MST"]})
+    new = pd.concat([old.drop(index=[1, 5]).assign(Sequence=lambda df: df["Sequence"]
+                                                   .where(df["Header"] != "P2", "MKA")),
+                     pd.DataFrame({"Header": ["P6", "P7"], "Sequence": ["MKVWAS", "MSTVW"]})])
+    key = ["Accession_1", "Accession_2", "Log_E_Value"]
+    def pairs(df):
+        df = df.astype({"Accession_1": str, "Accession_2": str})
+        return df.sort_values(key).reset_index(drop=True)
+    expected = pairs(BlastP().run_allvsall(new))
+
+    store = BlastP().run_allvsall(old, output=tmp_path / "hits")
+    fake_blastp_all_pairs.n_queries.clear()
+    updated = BlastP().run_allvsall_incremental(store, old, new)
+
+    # assert only the changed (P2) and added (P6, P7) sequences are searched,
+    # then the 3 unchanged ones against them
+    assert fake_blastp_all_pairs.n_queries == [3, 3]
+    pd.testing.assert_frame_equal(pairs(read_hit_table(updated)), expected, check_dtype=False)
+    # assert DataFrame results are merged the same way
+    merged = BlastP().run_allvsall_incremental(BlastP().run_allvsall(old), old, new)
+    pd.testing.assert_frame_equal(pairs(merged), expected, check_dtype=False)
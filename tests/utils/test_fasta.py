@@ -0,0 +1,104 @@
+import gzip
+import os
+from io import BytesIO, StringIO
+import pandas as pd
+import pytest
+from homolog_search_tools.utils._fasta import (
+    FastaIndex, build_fasta_index, fasta_lengths, iter_fasta, read_fasta_index
+)
+from homolog_search_tools.utils._utils import read_fasta
+
+FAKE_FASTA = (
+    "; comment before the first record\n"
+    ">sp|P1|ONE first sequence\nMKVLA\nAGHTW\nQQ\n"
+    ">sp|P2|TWO\nMSTNP\nKPQRS\n\n"
+    ">sp|P3|THREE empty\n"
+    ">sp|P4|FOUR\nMA\n"
+)
+FAKE_RECORDS = [
+    ("sp|P1|ONE first sequence", "MKVLAAGHTWQQ"),
+    ("sp|P2|TWO", "MSTNPKPQRS"),
+    ("sp|P3|THREE empty", ""),
+    ("sp|P4|FOUR", "MA"),
+]
+
+@pytest.mark.parametrize("block_size", [1, 2, 5, 1 << 22])
+def test_iter_fasta(block_size):
+    # assert records are split correctly whatever the block boundaries
+    assert list(iter_fasta(StringIO(FAKE_FASTA), block_size=block_size)) == FAKE_RECORDS
+
+@pytest.mark.parametrize("block_size", [1, 5, 1 << 22])
+def test_iter_fasta_binary(block_size):
+    records = iter_fasta(BytesIO(FAKE_FASTA.encode("utf-8")), block_size=block_size)
+    assert list(records) == FAKE_RECORDS
+    assert list(iter_fasta(BytesIO(">a \u00e9\nMK\n".encode("utf-8")))) == [("a \u00e9", "MK")]
+
+def test_iter_fasta_gzip(tmp_path):
+    path = tmp_path / "test.fasta.gz"
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        f.write(FAKE_FASTA.replace("\n", "\r\n"))
+
+    assert list(iter_fasta(path)) == FAKE_RECORDS
+    assert read_fasta(path) == ([h for h, _ in FAKE_RECORDS], [s for _, s in FAKE_RECORDS])
+
+def test_fasta_lengths():
+    df = fasta_lengths(StringIO(FAKE_FASTA), block_size=3)
+    pd.testing.assert_frame_equal(df, pd.DataFrame({
+        "Header": [h for h, _ in FAKE_RECORDS],
+        "Length": pd.array([12, 10, 0, 2], dtype="int64")}))
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n"])
+def test_build_fasta_index(tmp_path, newline):
+    path = tmp_path / "test.fasta"
+    path.write_bytes(FAKE_FASTA.replace("\n", newline).encode())
+    index_path = build_fasta_index(path, block_size=7)
+
+    assert index_path == f"{path}.fai"
+    index = read_fasta_index(index_path)
+    width = 5 + len(newline)
+    assert index["Name"].to_list() == ["sp|P1|ONE", "sp|P2|TWO", "sp|P3|THREE", "sp|P4|FOUR"]
+    assert index["Length"].to_list() == [12, 10, 0, 2]
+    assert index[["Line_Bases", "Line_Width"]].iloc[0].to_list() == [5, width]
+    # assert offsets point to the first base of every sequence
+    data = path.read_bytes()
+    assert [data[offset:offset + 2] for offset in index["Offset"][[0, 1, 3]]] == [b"MK", b"MS", b"MA"]
+
+def test_build_fasta_index_errors(tmp_path):
+    path = tmp_path / "test.fasta"
+    path.write_text(">a\nMKV\nMK\nMKV\n")
+    with pytest.raises(ValueError, match="Different line lengths"):
+        build_fasta_index(path)
+
+    path.write_text(">a\nMKV\n>a desc\nMKV\n")
+    with pytest.raises(ValueError, match="Duplicate sequence name"):
+        build_fasta_index(path)
+
+    with pytest.raises(ValueError):
+        build_fasta_index(tmp_path / "test.fasta.gz")
+
+def test_FastaIndex(tmp_path):
+    path = tmp_path / "test.fasta"
+    path.write_text(FAKE_FASTA)
+
+    with FastaIndex(path) as index:
+        assert len(index) == 4
+        assert "sp|P2|TWO" in index
+        assert index["sp|P1|ONE"] == "MKVLAAGHTWQQ"
+        assert index["sp|P3|THREE"] == ""
+        # assert slices spanning line breaks
+        assert index.fetch("sp|P1|ONE", 3, 11) == "LAAGHTWQ"
+        assert index.fetch("sp|P1|ONE", 10) == "QQ"
+        assert index.fetch("sp|P2|TWO", 4, 4) == ""
+        assert index.lengths().to_dict() == {"sp|P1|ONE": 12, "sp|P2|TWO": 10,
+                                             "sp|P3|THREE": 0, "sp|P4|FOUR": 2}
+        with pytest.raises(KeyError):
+            index["sp|P9|NINE"]
+
+    # assert a stale index is rebuilt
+    path.write_text(">b\nMKVW\n")
+    index_path = tmp_path / "test.fasta.fai"
+    stale = index_path.stat().st_mtime - 10
+    os.utime(index_path, (stale, stale))
+    with FastaIndex(path) as index:
+        assert index.names == ["b"]
+        assert index["b"] == "MKVW"
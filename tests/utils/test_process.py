@@ -0,0 +1,70 @@
+import resource
+import pandas as pd
+import pytest
+from homolog_search_tools.utils._process import (
+    CommandFailedError, CommandLimits, CommandNotFoundError, CommandTimeoutError, cmd_stream
+)
+
+def test_cmd_stream_stdout_stderr():
+    script = "for i in 1 2 3; do echo \"$i%\" >&2; printf 'q%s\\tt\\t1e-%s\\n' $i $i; done"
+    lines = []
+    result = cmd_stream(["sh", "-c", script], on_stderr=lines.append,
+                        stdout=lambda pipe: pd.read_csv(pipe, sep="\t", header=None))
+
+    # assert progress lines are forwarded and stdout is parsed from the pipe
+    assert lines == ["1%", "2%", "3%"]
+    assert result.stdout[0].to_list() == ["q1", "q2", "q3"]
+    assert result.returncode == 0
+    assert result.wall_time > 0 and result.cpu_time >= 0 and result.max_rss > 0
+
+def test_cmd_stream_errors():
+    with pytest.raises(CommandNotFoundError):
+        cmd_stream(["no-such-binary-xyz"])
+
+    with pytest.raises(CommandFailedError) as e:
+        cmd_stream(["sh", "-c", "echo out of memory >&2; exit 137"], on_stderr=lambda _: None)
+    assert e.value.result.returncode == 137
+    assert e.value.stderr == "out of memory"
+
+    with pytest.raises(CommandTimeoutError) as e:
+        cmd_stream(["sleep", "10"], timeout=0.2)
+    assert e.value.result.wall_time < 5
+
+    with pytest.raises(ValueError):
+        cmd_stream(["true"], timeout=0)
+
+def test_cmd_stream_limits():
+    # assert allocations beyond the memory limit fail
+    allocate = "python3 -c 'bytearray(512 * 2**20)'"
+    with pytest.raises(CommandFailedError):
+        cmd_stream(["sh", "-c", allocate], memory_limit=256 * 2**20, on_stderr=lambda _: None)
+
+    with pytest.raises(CommandTimeoutError, match="CPU time limit"):
+        cmd_stream(["sh", "-c", "while :; do :; done"], cpu_time_limit=1)
+
+def test_cmd_stream_limits_without_prlimit(monkeypatch):
+    # assert the exec wrapper applies the limits where prlimit is missing
+    monkeypatch.delattr(resource, "prlimit", raising=False)
+    with pytest.raises(CommandTimeoutError, match="CPU time limit"):
+        cmd_stream(["sh", "-c", "while :; do :; done"], cpu_time_limit=1)
+    result = cmd_stream(["sh", "-c", "ulimit -t"], cpu_time_limit=5,
+                        stdout=lambda pipe: pipe.read().strip())
+    assert result.stdout == b"5"
+    with pytest.raises(CommandNotFoundError):
+        cmd_stream(["no-such-command"], cpu_time_limit=5)
+
+def test_CommandLimits():
+    assert CommandLimits().kwargs() == {}
+    assert CommandLimits(timeout=1.5, memory_limit=2**30).kwargs() == {
+        "timeout": 1.5, "memory_limit": 2**30}
+    with pytest.raises(ValueError, match="cpu_time_limit"):
+        CommandLimits(cpu_time_limit=0)
+
+def test_cmd_stream_consumer_error():
+    def consumer(pipe):
+        pipe.readline()
+        raise KeyError("parser failed")
+
+    # assert consumer errors propagate and the command is stopped
+    with pytest.raises(KeyError):
+        cmd_stream(["sh", "-c", "while :; do echo line; done"], stdout=consumer, timeout=10)
@@ -0,0 +1,26 @@
+from unittest.mock import patch
+
+from homolog_search_tools.utils._resources import available_cpus, available_memory
+
+def write(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content, encoding="utf-8")
+
+@patch("os.sched_getaffinity", return_value=set(range(64)))
+def test_available_cpus_cgroup_v2(_, tmp_path):
+    write(tmp_path / "cpu.max", "800000 100000\n")
+    assert available_cpus(str(tmp_path)) == 8
+    write(tmp_path / "cpu.max", "max 100000\n")
+    assert available_cpus(str(tmp_path)) == 64
+
+@patch("os.sched_getaffinity", return_value=set(range(4)))
+def test_available_cpus_cgroup_v1(_, tmp_path):
+    write(tmp_path / "cpu" / "cpu.cfs_quota_us", "1600000\n")
+    write(tmp_path / "cpu" / "cpu.cfs_period_us", "100000\n")
+    assert available_cpus(str(tmp_path)) == 4
+
+@patch("homolog_search_tools.utils._resources._physical_memory", return_value=64 * 2**30)
+def test_available_memory(_, tmp_path):
+    assert available_memory(str(tmp_path)) == 64 * 2**30
+    write(tmp_path / "memory.max", f"{8 * 2**30}\n")
+    assert available_memory(str(tmp_path)) == 8 * 2**30
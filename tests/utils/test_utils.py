@@ -1,29 +1,20 @@
+import gzip
 from io import StringIO
 from unittest.mock import call, patch, Mock, MagicMock, mock_open
 import pandas as pd
 import pytest
-import subprocess  
-from homolog_search_tools.utils._utils import cmd_run, handle_sequence_data, read_fasta, write_fasta
+from homolog_search_tools.utils._process import CommandFailedError
+from homolog_search_tools.utils._utils import (
+    cmd_run, fasta_pipe, handle_sequence_data, read_fasta, write_fasta
+)
 
-@patch("subprocess.run")
-def test_cmd_run(mocker):
-    fake_cmd = ["blastp", "-query", "test.fasta", "-subject", "test.fasta", "-outfmt", "6", "-out", "blaspt.out"]
-    fake_stdout = ""
+def test_cmd_run():
+    # assert stdout is returned
+    assert cmd_run(["printf", "hit\\tline\\n"]) == "hit\tline\n"
 
-    mocker.return_value = MagicMock(
-        args = fake_cmd,
-        stdout="",
-        stderr="",
-        returncode=0
-    )
-
-    output = cmd_run(fake_cmd)
-
-    # assert subprocess.run(...) is called with the correct parameters
-    mocker.assert_called_once_with(fake_cmd, capture_output=True, text=True, check=True)
-    
-    # assert output
-    assert output == fake_stdout
+    # assert failures raise rather than returning the partial output
+    with pytest.raises(CommandFailedError, match="exit status 3"):
+        cmd_run(["sh", "-c", "echo progress >&2; exit 3"])
 
 @patch("homolog_search_tools.utils._utils.write_fasta")
 def test_handle_sequence_data_dataframe(mocker):
@@ -91,17 +82,54 @@ def test_write_fasta(mock_file):
         "Sequence": {0: "AMINOACID", 1: "NEXTSEQUENCE"}
     })
     fake_file_name = "test.fasta"
-    fake_calls = [call(">sequence 1\nAMINOACID\n"), call(">sequence 2\nNEXTSEQUENCE\n")]
+    fake_calls = [call(">sequence 1\nAMINOACID\n>sequence 2\nNEXTSEQUENCE\n")]
 
     write_fasta(fake_df, fake_file_name)
 
     # assert open(...) with correct parameters
     mock_file.assert_called_once_with(fake_file_name, "w+", encoding="utf-8")
     
-    # assert number of write(...) calls
-    assert mock_file().write.call_count == 2
+    # assert records are written in one buffered write(...) call
+    assert mock_file().write.call_count == 1
 
     # assert contents of write(...) calls
     calls = mock_file().write.mock_calls
     assert calls == fake_calls
-    
\ No newline at end of file
+
+def test_write_fasta_buffers():
+    fake_df = pd.DataFrame({
+        "Header": ["sequence 1", "sequence 2", "sequence 3"],
+        "Sequence": ["AMINOACID", "NEXTSEQUENCE", "MKV"]
+    })
+
+    # assert writing to a StringIO in chunks, with wrapping
+    buffer = StringIO()
+    write_fasta(fake_df, buffer, line_width=4, chunksize=2)
+    assert buffer.getvalue() == (
+        ">sequence 1\nAMIN\nOACI\nD\n>sequence 2\nNEXT\nSEQU\nENCE\n>sequence 3\nMKV\n")
+
+    with pytest.raises(ValueError):
+        write_fasta(fake_df, StringIO(), line_width=0)
+
+def test_write_fasta_gzip(tmp_path):
+    fake_df = pd.DataFrame({"Header": ["sequence 1"], "Sequence": ["AMINOACID"]})
+    path = tmp_path / "test.fasta.gz"
+    write_fasta(fake_df, path)
+
+    assert gzip.decompress(path.read_bytes()) == b">sequence 1\nAMINOACID\n"
+
+def test_fasta_pipe():
+    fake_df = pd.DataFrame({
+        "Header": [f"sequence {i}" for i in range(10_000)],
+        "Sequence": ["AMINOACID" * 10] * 10_000
+    })
+
+    with fasta_pipe(fake_df, chunksize=1000) as path:
+        assert read_fasta(path) == (fake_df["Header"].to_list(), fake_df["Sequence"].to_list())
+
+    # assert exiting without a reader, or after a partial read, does not hang
+    with fasta_pipe(fake_df) as path:
+        pass
+    with fasta_pipe(fake_df) as path:
+        with open(path, "r", encoding="utf-8") as pipe:
+            pipe.read(10)